@@ -0,0 +1,140 @@
+"""
+Benchmark per-request memory allocations of the audit middleware with tracemalloc.
+
+Reports the transient allocation high-water mark of each request, and the memory
+retained per audited request by its `RequestInfo` and the record built from it (as
+held by a queued audit sink with a backlog).
+
+    python benchmarks/audit_allocations.py --requests 2000
+    python benchmarks/audit_allocations.py --bare
+
+"""
+import asyncio
+import gc
+import tracemalloc
+from logging import INFO, NullHandler, getLogger
+
+from click import command, option
+from microcosm.api import create_object_graph
+from microcosm.loaders import load_from_dict
+
+from microcosm_fastapi.audit import AUDIT_LOGGER_NAME
+from microcosm_fastapi.logging_data_map import LoggingInfo
+
+
+HEADERS = [
+    (b"host", b"localhost"),
+    (b"user-agent", b"benchmark/1.0"),
+    (b"accept", b"application/json"),
+    (b"x-request-id", b"1234"),
+    (b"x-request-user", b"e7c0c0b8-2a58-4a3c-9b35-3c4f8b1f5a9e"),
+    (b"x-request-started-at", b"2024-01-01T00:00:00"),
+]
+
+
+def create_app(bare):
+    graph = create_object_graph(
+        "benchmark",
+        testing=True,
+        loader=load_from_dict(audit_middleware=dict(include_query_string=True)),
+    )
+    graph.use("logging_data_map")
+    if not bare:
+        graph.use("audit_middleware")
+
+    @graph.app.get("/api/v1/ping/{ping_id}")
+    async def ping_retrieve(ping_id: str):
+        return dict(id=ping_id)
+
+    graph.logging_data_map.add_path(
+        "/api/v1/ping/{ping_id}",
+        "GET",
+        LoggingInfo("ping.retrieve", "ping_retrieve"),
+    )
+    graph.lock()
+    return graph
+
+
+async def request(app, index):
+    path = f"/api/v1/ping/{index}"
+    scope = dict(
+        type="http",
+        asgi=dict(version="3.0", spec_version="2.4"),
+        http_version="1.1",
+        method="GET",
+        scheme="http",
+        path=path,
+        raw_path=path.encode(),
+        root_path="",
+        query_string=b"a=1&b=2",
+        headers=HEADERS,
+        client=("127.0.0.1", 1234),
+        server=("localhost", 80),
+    )
+
+    async def receive():
+        return dict(type="http.request", body=b"", more_body=False)
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(graph, requests, retained):
+    for index in range(100):
+        await request(graph.app, index)
+    retained.clear()
+
+    tracemalloc.start()
+
+    peaks = []
+    for index in range(requests):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        await request(graph.app, index)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+
+    retained.clear()
+    gc.collect()
+    baseline = tracemalloc.take_snapshot()
+    for index in range(requests):
+        await request(graph.app, index)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # only count what the audit path allocates, not the retained request scope
+    filters = [tracemalloc.Filter(True, "*/microcosm_fastapi/*")]
+    stats = snapshot.filter_traces(filters).compare_to(baseline.filter_traces(filters), "filename")
+    size = sum(stat.size_diff for stat in stats)
+    count = sum(stat.count_diff for stat in stats)
+    return sum(peaks) / requests, size / requests, count / requests
+
+
+@command()
+@option("--requests", default=2000)
+@option("--bare", is_flag=True, help="Benchmark without the audit middleware")
+def main(requests, bare):
+    logger = getLogger(AUDIT_LOGGER_NAME)
+    logger.setLevel(INFO)
+    logger.addHandler(NullHandler())
+    logger.propagate = False
+
+    graph = create_app(bare)
+
+    # hold on to what a queued sink would retain
+    retained: list = []
+    if not bare:
+        graph.audit_middleware.emit = lambda level, request_info: retained.append(
+            (request_info, request_info.to_dict()),
+        )
+
+    peak, size, count = asyncio.run(run(graph, requests, retained))
+    print(  # noqa: T201
+        f"{'bare' if bare else 'audit'}: peak {peak:,.0f} B/request, "
+        f"retained {size:,.0f} B in {count:,.1f} blocks/request",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark event loop lag caused by audit logging, with records written inline on the
+request path versus queued for the background writer.
+
+Audit records are JSON encoded to a file with a fixed blocking I/O latency per record,
+as with a structured log handler writing to a pipe or socket, while concurrent requests
+are driven through the ASGI interface and a ticker task measures how late the event
+loop wakes it up.
+
+    python benchmarks/audit_sink_lag.py --requests 5000
+    python benchmarks/audit_sink_lag.py --requests 5000 --queue-size 10000
+
+"""
+import asyncio
+import json
+from logging import (
+    INFO,
+    FileHandler,
+    Formatter,
+    getLogger,
+)
+from tempfile import NamedTemporaryFile
+from time import perf_counter, sleep
+
+from click import command, option
+from microcosm.api import create_object_graph
+from microcosm.loaders import load_from_dict
+
+from microcosm_fastapi.audit import AUDIT_LOGGER_NAME
+from microcosm_fastapi.logging_data_map import LoggingInfo
+
+
+TICK = 0.001
+
+
+class JSONFormatter(Formatter):
+    def format(self, record):
+        return json.dumps(dict(level=record.levelname, **record.msg), default=str, indent=2)
+
+
+class BlockingFileHandler(FileHandler):
+    """
+    File handler with a fixed per-record I/O latency, e.g. a pipe or socket under backpressure.
+
+    """
+
+    def __init__(self, filename, latency):
+        super().__init__(filename)
+        self.latency = latency
+
+    def emit(self, record):
+        super().emit(record)
+        sleep(self.latency)
+
+
+def create_app(queue_size, overflow_policy):
+    graph = create_object_graph(
+        "benchmark",
+        testing=True,
+        loader=load_from_dict(
+            audit_middleware=dict(
+                queue_size=queue_size,
+                queue_overflow_policy=overflow_policy,
+                include_query_string=True,
+            ),
+        ),
+    )
+    graph.use("logging_data_map", "audit_middleware")
+
+    @graph.app.get("/api/v1/ping/{ping_id}")
+    async def ping_retrieve(ping_id: str):
+        # stand in for a database round trip
+        await asyncio.sleep(TICK)
+        return dict(id=ping_id)
+
+    graph.logging_data_map.add_path(
+        "/api/v1/ping/{ping_id}",
+        "GET",
+        LoggingInfo("ping.retrieve", "ping_retrieve"),
+    )
+    graph.lock()
+    return graph
+
+
+async def request(app, index):
+    path = f"/api/v1/ping/{index}"
+    scope = dict(
+        type="http",
+        asgi=dict(version="3.0", spec_version="2.4"),
+        http_version="1.1",
+        method="GET",
+        scheme="http",
+        path=path,
+        raw_path=path.encode(),
+        root_path="",
+        query_string=b"a=1&b=2&c=3",
+        headers=[(b"host", b"localhost"), (b"x-request-id", str(index).encode())],
+        client=("127.0.0.1", 1234),
+        server=("localhost", 80),
+    )
+
+    async def receive():
+        return dict(type="http.request", body=b"", more_body=False)
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def measure_lag(lags, done):
+    while not done.is_set():
+        start = perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(perf_counter() - start - TICK)
+
+
+async def run(app, requests, concurrency):
+    lags: list = []
+    done = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(lags, done))
+
+    indexes = iter(range(requests))
+
+    async def client():
+        for index in indexes:
+            await request(app, index)
+
+    start = perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+
+    done.set()
+    await ticker
+
+    lags.sort()
+    return requests / elapsed, lags[len(lags) // 2], lags[int(len(lags) * 0.99) - 1], max(lags)
+
+
+@command()
+@option("--requests", default=5000)
+@option("--concurrency", default=50)
+@option("--queue-size", default=0, help="0 logs inline")
+@option("--overflow-policy", default="block")
+@option("--handler-latency", default=0.0002, help="Seconds of blocking I/O per record")
+def main(requests, concurrency, queue_size, overflow_policy, handler_latency):
+    with NamedTemporaryFile(suffix=".log") as log_file:
+        handler = BlockingFileHandler(log_file.name, handler_latency)
+        handler.setFormatter(JSONFormatter())
+        logger = getLogger(AUDIT_LOGGER_NAME)
+        logger.setLevel(INFO)
+        logger.addHandler(handler)
+        logger.propagate = False
+
+        graph = create_app(queue_size, overflow_policy)
+        throughput, p50, p99, worst = asyncio.run(run(graph.app, requests, concurrency))
+        graph.audit_middleware.close()
+
+    print(  # noqa: T201
+        f"{'queued' if queue_size else 'inline'}: {throughput:,.0f} req/s, "
+        f"loop lag p50 {p50 * 1e3:.2f}ms p99 {p99 * 1e3:.2f}ms max {worst * 1e3:.2f}ms",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark async message dispatcher throughput as handler concurrency grows.
+
+Messages are consumed from an in-memory SQS stand-in (each API call taking
+`--latency` seconds) by handlers waiting `--io-time` seconds, as for a call to another
+service. Throughput should grow with concurrency up to the batch size, or beyond it
+with `--pipeline`, which receives ahead of handling and acknowledges in the background.
+
+    python benchmarks/dispatcher_concurrency.py --messages 200
+    python benchmarks/dispatcher_concurrency.py --concurrency 1,2,5,10 --io-time 0.05
+    python benchmarks/dispatcher_concurrency.py --concurrency 5,10,20 --pipeline
+
+"""
+from asyncio import sleep
+from logging import WARNING, getLogger
+from time import perf_counter
+
+from click import command, option
+from microcosm.api import create_object_graph
+from microcosm.loaders import load_from_dict
+
+from microcosm_fastapi.pubsub.local import LocalSQSClient
+
+
+MEDIA_TYPE = "application/vnd.globality.pubsub._.created.benchmark"
+
+
+class IOBoundHandler:
+    logger = getLogger("benchmark")
+
+    def __init__(self, io_time):
+        self.io_time = io_time
+
+    async def __call__(self, message):
+        await sleep(self.io_time)
+        return True
+
+
+def create_dispatcher(concurrency, latency, pipeline):
+    graph = create_object_graph(
+        "benchmark",
+        testing=True,
+        loader=load_from_dict(
+            sqs_consumer=dict(
+                sqs_queue_url="test",
+                sqs_event=None,
+            ),
+            sqs_message_dispatcher_async=dict(
+                message_max_concurrent_operations=concurrency,
+                message_pipeline=pipeline,
+            ),
+        ),
+    )
+    graph.use(
+        "opaque",
+        "sqs_message_handler_registry",
+        "sqs_consumer",
+        "sqs_message_dispatcher_async",
+    )
+    graph.sqs_consumer.sqs_client = LocalSQSClient(latency=latency)
+    return graph.sqs_message_dispatcher_async
+
+
+def run(concurrency, messages, io_time, latency, pipeline):
+    dispatcher = create_dispatcher(concurrency, latency, pipeline)
+    sqs_client = dispatcher.sqs_consumer.sqs_client
+    for index in range(messages):
+        sqs_client.publish(MEDIA_TYPE, uri=f"http://benchmark/{index}")
+
+    bound_handlers = {MEDIA_TYPE: IOBoundHandler(io_time)}
+
+    start = perf_counter()
+    if pipeline:
+        dispatcher.run_pipeline(bound_handlers, should_stop=lambda: not sqs_client.messages)
+    while sqs_client.messages:
+        dispatcher.handle_batch(bound_handlers)
+    elapsed = perf_counter() - start
+
+    dispatcher.close()
+    return messages / elapsed
+
+
+@command()
+@option("--messages", default=200)
+@option("--concurrency", default="1,2,5,10", help="Comma separated maximum concurrent operations")
+@option("--io-time", default=0.02, help="Seconds each handler waits on I/O")
+@option("--latency", default=0.005, help="Seconds each SQS API call takes")
+@option("--pipeline", is_flag=True, help="Consume with a pipeline rather than batch by batch")
+def main(messages, concurrency, io_time, latency, pipeline):
+    # results are logged per message
+    getLogger().setLevel(WARNING)
+
+    for value in concurrency.split(","):
+        throughput = run(int(value), messages, io_time, latency, pipeline)
+        print(f"concurrency {value}: {throughput:,.0f} messages/s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark async message dispatcher throughput with a mix of sync and async handlers.
+
+Half of the messages are handled by a synchronous handler blocking for `--io-time`
+seconds (as legacy code calling another service with a blocking client), the other
+half by an asynchronous handler waiting as long. Synchronous handlers run in a thread
+pool of `--threads` threads, so that they do not hold up asynchronous ones.
+
+    python benchmarks/dispatcher_sync_handlers.py --messages 200
+    python benchmarks/dispatcher_sync_handlers.py --threads 1,5,10 --concurrency 10
+
+"""
+from asyncio import sleep
+from logging import WARNING, getLogger
+from time import perf_counter, sleep as blocking_sleep
+
+from click import command, option
+from microcosm.api import create_object_graph
+from microcosm.loaders import load_from_dict
+
+from microcosm_fastapi.pubsub.local import LocalSQSClient
+
+
+ASYNC_MEDIA_TYPE = "application/vnd.globality.pubsub._.created.async_benchmark"
+SYNC_MEDIA_TYPE = "application/vnd.globality.pubsub._.created.sync_benchmark"
+
+
+class AsyncHandler:
+    logger = getLogger("benchmark")
+
+    def __init__(self, io_time):
+        self.io_time = io_time
+
+    async def __call__(self, message):
+        await sleep(self.io_time)
+        return True
+
+
+class SyncHandler:
+    logger = getLogger("benchmark")
+
+    def __init__(self, io_time):
+        self.io_time = io_time
+
+    def __call__(self, message):
+        blocking_sleep(self.io_time)
+        return True
+
+
+def create_dispatcher(concurrency, threads):
+    graph = create_object_graph(
+        "benchmark",
+        testing=True,
+        loader=load_from_dict(
+            sqs_consumer=dict(
+                sqs_queue_url="test",
+                sqs_event=None,
+            ),
+            sqs_message_dispatcher_async=dict(
+                message_max_concurrent_operations=concurrency,
+                message_thread_pool_size=threads,
+            ),
+        ),
+    )
+    graph.use(
+        "opaque",
+        "sqs_message_handler_registry",
+        "sqs_consumer",
+        "sqs_message_dispatcher_async",
+    )
+    graph.sqs_consumer.sqs_client = LocalSQSClient()
+    return graph.sqs_message_dispatcher_async
+
+
+def run(concurrency, threads, messages, io_time):
+    dispatcher = create_dispatcher(concurrency, threads)
+    sqs_client = dispatcher.sqs_consumer.sqs_client
+    for index in range(messages):
+        media_type = SYNC_MEDIA_TYPE if index % 2 else ASYNC_MEDIA_TYPE
+        sqs_client.publish(media_type, uri=f"http://benchmark/{index}")
+
+    bound_handlers = {
+        ASYNC_MEDIA_TYPE: AsyncHandler(io_time),
+        SYNC_MEDIA_TYPE: SyncHandler(io_time),
+    }
+
+    start = perf_counter()
+    while sqs_client.messages:
+        dispatcher.handle_batch(bound_handlers)
+    elapsed = perf_counter() - start
+
+    dispatcher.close()
+    return messages / elapsed
+
+
+@command()
+@option("--messages", default=200)
+@option("--concurrency", default=10, help="Maximum concurrent operations")
+@option("--threads", default="1,2,5,10", help="Comma separated thread pool sizes")
+@option("--io-time", default=0.02, help="Seconds each handler waits on I/O")
+def main(messages, concurrency, threads, io_time):
+    # results are logged per message
+    getLogger().setLevel(WARNING)
+
+    for value in threads.split(","):
+        throughput = run(concurrency, int(value), messages, io_time)
+        print(f"threads {value}: {throughput:,.0f} messages/s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark requests/sec and p99 latency of a trivial route with the audit, route
+metrics and global exception middlewares enabled.
+
+Requests are driven directly through the ASGI interface so that the numbers reflect
+middleware and routing overhead rather than an HTTP client; no server is needed.
+
+    python benchmarks/middleware_throughput.py --requests 20000
+    python benchmarks/middleware_throughput.py --bare
+    python benchmarks/middleware_throughput.py --flush-interval 10
+
+"""
+import asyncio
+from logging import INFO, NullHandler, getLogger
+from time import perf_counter
+
+from click import command, option
+from microcosm.api import create_object_graph
+from microcosm.loaders import load_from_dict
+
+from microcosm_fastapi.audit import AUDIT_LOGGER_NAME
+from microcosm_fastapi.logging_data_map import LoggingInfo
+
+
+def create_app(bare, flush_interval):
+    graph = create_object_graph(
+        "benchmark",
+        testing=True,
+        # route metrics are disabled when sending to localhost; testing uses a mock client
+        loader=load_from_dict(
+            metrics=dict(host="statsd"),
+            route_metrics=dict(flush_interval=flush_interval),
+        ),
+    )
+    graph.use("logging_data_map")
+    if not bare:
+        graph.use(
+            "audit_middleware",
+            "route_metrics",
+            "global_exception_handler",
+        )
+
+    @graph.app.get("/api/v1/ping/{ping_id}")
+    async def ping_retrieve(ping_id: str):
+        return dict(id=ping_id)
+
+    graph.logging_data_map.add_path(
+        "/api/v1/ping/{ping_id}",
+        "GET",
+        LoggingInfo("ping.retrieve", "ping_retrieve"),
+    )
+    graph.lock()
+    return graph.app
+
+
+def scope_for(path):
+    return dict(
+        type="http",
+        asgi=dict(version="3.0", spec_version="2.4"),
+        http_version="1.1",
+        method="GET",
+        scheme="http",
+        path=path,
+        raw_path=path.encode(),
+        root_path="",
+        query_string=b"",
+        headers=[(b"host", b"localhost"), (b"x-request-id", b"1234")],
+        client=("127.0.0.1", 1234),
+        server=("localhost", 80),
+    )
+
+
+async def request(app, path):
+    async def receive():
+        return dict(type="http.request", body=b"", more_body=False)
+
+    async def send(message):
+        pass
+
+    await app(scope_for(path), receive, send)
+
+
+async def run(app, requests):
+    for index in range(min(requests, 1000)):
+        await request(app, f"/api/v1/ping/{index}")
+
+    latencies = []
+    start = perf_counter()
+    for index in range(requests):
+        request_start = perf_counter()
+        await request(app, f"/api/v1/ping/{index}")
+        latencies.append(perf_counter() - request_start)
+    elapsed = perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    return requests / elapsed, p99
+
+
+@command()
+@option("--requests", default=10000)
+@option("--bare", is_flag=True, help="Benchmark without the middlewares")
+@option("--flush-interval", default=0.0, help="Buffer route metrics; 0 sends per request")
+def main(requests, bare, flush_interval):
+    logger = getLogger(AUDIT_LOGGER_NAME)
+    logger.setLevel(INFO)
+    logger.addHandler(NullHandler())
+    logger.propagate = False
+
+    app = create_app(bare, flush_interval)
+    throughput, p99 = asyncio.run(run(app, requests))
+    print(f"{'bare' if bare else 'middlewares'}: {throughput:,.0f} req/s, p99 {p99 * 1e6:,.0f}us")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
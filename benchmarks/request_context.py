@@ -0,0 +1,58 @@
+"""
+Benchmark request context extraction over requests with many headers.
+
+Each iteration wraps a fresh ASGI scope in a request, as the audit middleware does,
+and extracts the request context from it.
+
+    python benchmarks/request_context.py --headers 40 --iterations 100000
+
+"""
+from time import perf_counter
+
+from click import command, option
+from fastapi import Request
+from microcosm.api import create_object_graph
+
+
+def scope_for(headers):
+    return dict(
+        type="http",
+        method="GET",
+        path="/api/v1/ping",
+        query_string=b"",
+        headers=[
+            (b"host", b"localhost"),
+            (b"x-request-id", b"1234"),
+            (b"x-request-user", b"e7c0c0b8-2a58-4a3c-9b35-3c4f8b1f5a9e"),
+            *(
+                (f"x-custom-header-{index}".encode(), f"value-{index}".encode())
+                for index in range(headers)
+            ),
+        ],
+    )
+
+
+@command()
+@option("--headers", default=40, help="Number of headers besides the request context ones")
+@option("--iterations", default=100000)
+def main(headers, iterations):
+    graph = create_object_graph("benchmark", testing=True)
+    graph.use("request_context")
+    graph.lock()
+
+    scope = scope_for(headers)
+    context = graph.request_context(Request(scope))
+
+    start = perf_counter()
+    for _ in range(iterations):
+        graph.request_context(Request(scope))
+    elapsed = perf_counter() - start
+
+    print(  # noqa: T201
+        f"{len(scope['headers'])} headers, {len(context)} in context: "
+        f"{elapsed / iterations * 1e6:.2f}us/request",
+    )
+
+
+if __name__ == "__main__":
+    main()
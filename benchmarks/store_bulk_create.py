@@ -0,0 +1,56 @@
+"""
+Benchmark row-at-a-time `StoreAsync.create` against the bulk `create_many` path.
+
+Requires a local Postgres provisioned for the test project:
+
+    createdb -U test_project -O test_project test_project_test_db
+    python benchmarks/store_bulk_create.py --count 10000
+
+"""
+from asyncio import run
+from time import perf_counter
+
+from click import command, option
+from microcosm_postgres.operations import recreate_all
+from test_project.app import create_app
+from test_project.pizza_model import Pizza
+
+
+async def run_create(store, count):
+    for index in range(count):
+        await store.create(Pizza(toppings=f"topping-{index}"))
+
+
+async def run_create_many(store, count):
+    await store.create_many([
+        Pizza(toppings=f"topping-{index}")
+        for index in range(count)
+    ])
+
+
+async def measure(graph, func, count):
+    recreate_all(graph)
+    start_time = perf_counter()
+    await func(graph.pizza_store, count)
+    return perf_counter() - start_time
+
+
+async def compare(count):
+    graph = create_app(testing=True)
+
+    for name, func in (
+        ("create", run_create),
+        ("create_many", run_create_many),
+    ):
+        elapsed = await measure(graph, func, count)
+        print(f"{name:>12}: {count} rows in {elapsed:.2f}s ({count / elapsed:.0f} rows/s)")  # noqa: T201
+
+
+@command()
+@option("--count", default=10000)
+def main(count):
+    run(compare(count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark deep page latency for offset pagination against keyset pagination.
+
+Requires a local Postgres provisioned for the test project:
+
+    createdb -U test_project -O test_project test_project_test_db
+    python benchmarks/store_keyset_pagination.py --rows 200000 --limit 20
+
+"""
+from asyncio import run
+from time import perf_counter
+
+from click import command, option
+from microcosm_postgres.operations import recreate_all
+from sqlalchemy import select
+from test_project.app import create_app
+from test_project.pizza_model import Pizza
+
+
+PAGES = (1, 100, 1000, 10000)
+
+
+async def seed(store, rows):
+    await store.create_many([
+        Pizza(toppings=f"topping-{index}")
+        for index in range(rows)
+    ])
+
+
+async def time_call(coroutine):
+    start_time = perf_counter()
+    await coroutine
+    return (perf_counter() - start_time) * 1000
+
+
+async def compare(rows, limit):
+    graph = create_app(testing=True)
+    recreate_all(graph)
+    await seed(graph.pizza_store, rows)
+
+    async with graph.postgres_async.begin() as connection:
+        await connection.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS pizza_created_at_id ON pizza (created_at, id)",
+        )
+        await connection.exec_driver_sql("ANALYZE pizza")
+
+    store = graph.pizza_store
+    for page in PAGES:
+        offset = (page - 1) * limit
+        if offset >= rows:
+            break
+
+        # Position a cursor at the start of the page, outside of the timed section
+        previous = await store.search(cursor=None, offset=0, limit=offset) if offset else []
+        cursor = store.cursor_for(previous[-1]) if previous else None
+
+        offset_query = select(Pizza).order_by(*store.keyset_columns).offset(offset).limit(limit)
+        offset_ms = await time_call(store.get_all(offset_query))
+        keyset_ms = await time_call(store.search_after(cursor=cursor, limit=limit))
+        print(f"page {page:>6}: offset {offset_ms:8.2f}ms, keyset {keyset_ms:8.2f}ms")  # noqa: T201
+
+
+@command()
+@option("--rows", default=200000)
+@option("--limit", default=20)
+def main(rows, limit):
+    run(compare(rows, limit))
+
+
+if __name__ == "__main__":
+    main()
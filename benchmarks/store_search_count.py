@@ -0,0 +1,64 @@
+"""
+Benchmark paginated search latency for each `CountMode` of `StoreAsync.search_with_count`.
+
+Requires a local Postgres provisioned for the test project:
+
+    createdb -U test_project -O test_project test_project_test_db
+    python benchmarks/store_search_count.py --rows 100000 --iterations 200
+
+"""
+from asyncio import run
+from statistics import median, quantiles
+from time import perf_counter
+
+from click import command, option
+from microcosm_postgres.operations import recreate_all
+from test_project.app import create_app
+from test_project.pizza_model import Pizza
+
+from microcosm_fastapi.database.store import CountMode
+
+
+async def seed(store, rows):
+    await store.create_many([
+        Pizza(toppings=f"topping-{index % 10}")
+        for index in range(rows)
+    ])
+
+
+async def measure(store, count_mode, iterations, offset, limit):
+    timings = []
+    for _ in range(iterations):
+        start_time = perf_counter()
+        await store.search_with_count(offset=offset, limit=limit, count_mode=count_mode)
+        timings.append((perf_counter() - start_time) * 1000)
+    return timings
+
+
+async def compare(rows, iterations, offset, limit):
+    graph = create_app(testing=True)
+    recreate_all(graph)
+    await seed(graph.pizza_store, rows)
+
+    async with graph.postgres_async.begin() as connection:
+        await connection.exec_driver_sql("ANALYZE pizza")
+
+    for count_mode in CountMode:
+        timings = await measure(graph.pizza_store, count_mode, iterations, offset, limit)
+        p99 = quantiles(timings, n=100)[-1]
+        print(  # noqa: T201
+            f"{count_mode.name:>10}: median {median(timings):.2f}ms, p99 {p99:.2f}ms",
+        )
+
+
+@command()
+@option("--rows", default=100000)
+@option("--iterations", default=200)
+@option("--offset", default=0)
+@option("--limit", default=20)
+def main(rows, iterations, offset, limit):
+    run(compare(rows, iterations, offset, limit))
+
+
+if __name__ == "__main__":
+    main()
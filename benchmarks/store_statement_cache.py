@@ -0,0 +1,63 @@
+"""
+Microbenchmark the per-call Python overhead of building search statements,
+with and without the `StoreAsync` statement cache.
+
+Measures statement construction plus SQLAlchemy cache key generation, which is
+the work done before every execution; no database is needed.
+
+    python benchmarks/store_statement_cache.py --iterations 20000
+
+"""
+from timeit import timeit
+
+from click import command, option
+from microcosm_postgres.models import EntityMixin, Model
+from sqlalchemy import Column, String
+
+from microcosm_fastapi.database.store import StoreAsync
+
+
+class Topping(EntityMixin, Model):
+    __tablename__ = "benchmark_topping"
+
+    name = Column(String(), nullable=False)
+    category = Column(String(), nullable=True)
+
+
+CALLS = dict(
+    retrieve=dict(identifier="00000000-0000-0000-0000-000000000000"),
+    search=dict(name="cheese", category="dairy", offset=40, limit=20),
+    count=dict(name="cheese", category="dairy"),
+)
+
+
+def prepare(store, action, kwargs):
+    statement, _ = store._statement_for(action, **kwargs)
+    return statement._generate_cache_key()
+
+
+def uncached_retrieve(store, action, kwargs):
+    statement = store._query(Topping.id == kwargs["identifier"])
+    return statement._generate_cache_key()
+
+
+@command()
+@option("--iterations", default=20000)
+def main(iterations):
+    auto_filter_fields = (Topping.name, Topping.category)
+    uncached = StoreAsync(None, Topping, auto_filter_fields, cache_statements=False)
+    cached = StoreAsync(None, Topping, auto_filter_fields)
+
+    for action, kwargs in CALLS.items():
+        before = uncached_retrieve if action == "retrieve" else prepare
+        before_us = timeit(lambda: before(uncached, action, kwargs), number=iterations)
+        after_us = timeit(lambda: prepare(cached, action, kwargs), number=iterations)
+
+        print(  # noqa: T201
+            f"{action:>8}: {before_us / iterations * 1e6:7.1f}us -> "
+            f"{after_us / iterations * 1e6:7.1f}us per call",
+        )
+
+
+if __name__ == "__main__":
+    main()
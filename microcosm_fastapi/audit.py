@@ -2,28 +2,51 @@
 Audit log support for FastAPI routes.
 
 """
-import json
 from distutils.util import strtobool
-from functools import partial
+from functools import lru_cache
 from json import loads
 from json.decoder import JSONDecodeError
-from logging import getLogger
-from typing import Any, NamedTuple
+from logging import (
+    DEBUG,
+    ERROR,
+    INFO,
+    getLogger,
+)
+from time import time
+from typing import Any, Iterable, NamedTuple
 from uuid import UUID
 
 from fastapi import Request
-from fastapi.responses import StreamingResponse
 from inflection import underscore
 from microcosm.api import defaults, typed
-from microcosm.config.types import boolean
+from microcosm.config.types import boolean, comma_separated_list
+from microcosm.errors import NotBoundError
 from microcosm.metadata import Metadata
-from microcosm_logging.timing import elapsed_time
-from starlette.datastructures import MutableHeaders
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
 
-from microcosm_fastapi.context import capitalise_context
+from microcosm_fastapi.audit_sampling import AuditSampler, parse_operation_values
+from microcosm_fastapi.audit_sink import (
+    DEFAULT_AUDIT_QUEUE_BATCH_SIZE,
+    AuditSink,
+    OverflowPolicy,
+    QueuedAuditSink,
+)
+from microcosm_fastapi.context import HEADER_NAME_CACHE_SIZE, capitalise_header
 from microcosm_fastapi.errors import ParsedException
 from microcosm_fastapi.logging_data_map import LoggingInfo
-from microcosm_fastapi.utils import AsyncIteratorWrapper
+from microcosm_fastapi.timing import (
+    MIDDLEWARE,
+    PHASE_FIELDS,
+    ROUTE,
+    RequestTiming,
+    request_timing,
+)
 
 
 DEFAULT_INCLUDE_REQUEST_BODY_STATUS = 400
@@ -39,6 +62,7 @@ class AuditOptions(NamedTuple):
     include_path: bool
     include_query_string: bool
     log_as_debug: bool
+    include_phase_timing: bool = False
 
 
 SKIP_LOGGING = "_microcosm_flask_skip_audit_logging"
@@ -60,30 +84,63 @@ def should_skip_logging(request: Request) -> bool:
     return bool(strtobool(request.headers.get("x-request-nolog", "false")))
 
 
+@lru_cache(maxsize=HEADER_NAME_CACHE_SIZE)
+def response_header_field(name: bytes) -> str | None:
+    """
+    Map a X-<>-Id response header name to its audit field, if it is one.
+
+    """
+    parts = name.decode("latin-1").split("-")
+    if len(parts) != 3:
+        return None
+    if parts[0] != "X":
+        return None
+    if parts[-1] != "Id":
+        return None
+
+    return f"{underscore(parts[1])}_id"
+
+
 class RequestInfo:
     """
     Capture of key information for requests.
 
+    Built for every audited request, so holds only references and derives the rest
+    when (and if) the record is built.
+
     """
 
+    __slots__ = (
+        "options",
+        "app_metadata",
+        "operation",
+        "func",
+        "request",
+        "request_context",
+        "timing",
+        "parsed_exception",
+        "stack_trace",
+        "request_body",
+        "response_body",
+        "response_headers",
+        "status_code",
+        "success",
+        "sample_weight",
+    )
+
     def __init__(
         self,
         options: AuditOptions,
         request: Request,
-        request_context: dict[str, Any],
+        request_context: dict[str, Any] | None,
         app_metadata: Metadata,
     ):
         self.options = options
         self.app_metadata = app_metadata
         self.operation: str | None = None
         self.func: str | None = None
-        self.method = request.method
-        self.args = request.query_params
 
         self.request = request
-        self.path = request.url.path
-        self.query = request.url.query
-
         self.request_context = request_context
         self.timing: dict[Any, Any] = dict()
 
@@ -91,21 +148,38 @@ class RequestInfo:
         self.stack_trace = None
         self.request_body = None
         self.response_body = None
-        self.response_headers: MutableHeaders | None = None
+        self.response_headers: Iterable[tuple[bytes, bytes]] | None = None
         self.status_code: int | None = None
         self.success: bool | None = None
+        # number of requests this record stands for, when sampling
+        self.sample_weight: float | None = None
+
+    @property
+    def method(self) -> str:
+        return self.request.method
+
+    @property
+    def args(self):
+        return self.request.query_params
+
+    @property
+    def path(self) -> str:
+        return self.request.scope["path"]
+
+    @property
+    def query(self) -> str:
+        return self.request.scope["query_string"].decode("latin-1")
 
     def to_dict(self) -> dict:
         dct = dict(operation=self.operation, func=self.func, method=self.method, **self.timing)
 
-        if self.options.include_query_string and self.args:
-            dct.update({
-                key: values
-                for key, values in self.args.items()
-            })
+        if self.options.include_query_string and self.request.scope["query_string"]:
+            for key, values in self.args.items():
+                dct[key] = values
 
         if self.request_context is not None:
-            dct.update(capitalise_context(self.request_context))
+            for key, value in self.request_context.items():
+                dct[capitalise_header(key)] = value
 
         if self.success is True:
             dct.update(
@@ -126,30 +200,52 @@ class RequestInfo:
         self.post_process_response_body(dct)
         self.post_process_response_headers(dct)
 
-        return dct
+        if self.sample_weight is not None:
+            dct.update(sample_weight=self.sample_weight)
 
-    async def capture_response(self, response) -> None:
-        self.success = True
+        return dct
 
-        body, self.status_code, self.response_headers = await parse_response(response)
+    @property
+    def response_body_limit(self) -> int | bool | None:
+        """
+        How many bytes of the response body to retain for logging, if any.
 
+        """
         if not self.app_metadata.debug:
-            # only capture responsebody on debug
-            return
+            # only capture response body on debug
+            return None
 
         if not self.options.include_response_body_status:
             # only capture response body if requested
-            return
+            return None
 
-        if not body:
-            # only capture request body if there is one
-            return
+        return self.options.include_response_body_status
 
-        if (
-            self.options.include_response_body_status is not True
-            and len(body) >= self.options.include_response_body_status
-        ):
-            # don't capture response body if it's too large
+    def capture_phases(self, timing: RequestTiming) -> None:
+        """
+        Add the time spent per phase so far to the timing fields.
+
+        """
+        for phase, field in PHASE_FIELDS.items():
+            if phase in timing.phases:
+                self.timing[field] = timing.phases[phase]
+
+        route_time = timing.phases.get(ROUTE)
+        if route_time is not None:
+            self.timing[PHASE_FIELDS[MIDDLEWARE]] = max(self.timing["elapsed_time"] - route_time, 0.0)
+
+    def capture_response(self, status_code: int, headers: Iterable[tuple[bytes, bytes]]) -> None:
+        self.success = True
+        self.status_code = status_code
+        self.response_headers = headers
+
+    def capture_response_body(self, body: bytes | None) -> None:
+        """
+        Capture a (complete) response body retained by `ResponseBodyTee`.
+
+        """
+        if not body:
+            # only capture response body if there is one
             return
 
         try:
@@ -158,8 +254,6 @@ class RequestInfo:
             # not json
             pass
 
-        return
-
     def capture_error(self, error) -> None:
         self.parsed_exception = ParsedException(error)
         self.status_code = self.parsed_exception.status_code
@@ -194,16 +288,10 @@ class RequestInfo:
         if not self.response_headers:
             return
 
-        for key, value in self.response_headers.items():
-            parts = key.split("-")
-            if len(parts) != 3:
-                continue
-            if parts[0] != "X":
-                continue
-            if parts[-1] != "Id":
-                continue
-
-            dct[f"{underscore(parts[1])}_id"] = value
+        for key, value in self.response_headers:
+            field = response_header_field(key)
+            if field is not None:
+                dct[field] = value.decode("latin-1")
 
     def set_operation_and_func_name(self, logging_info: LoggingInfo) -> None:
         """
@@ -236,75 +324,144 @@ class RequestInfo:
         return data
 
 
-async def parse_response(response: StreamingResponse) -> tuple[Any, int, MutableHeaders]:
+class ResponseBodyTee:
     """
-    Parse a FastAPI response into a body, a status code, and headers
+    Observe response body chunks as they are sent, retaining them only while needed.
+
+    Retains the body only if a `limit` is given (`True` for no limit) and the body
+    stays under it; otherwise `body` is `None`.
 
     """
-    # Taken from SO: https://stackoverflow.com/questions/60778279/fastapi-middleware-peeking-into-responses
-    # Consuming FastAPI response and grabbing body here
-    resp_body = [section async for section in response.__dict__["body_iterator"]]
 
-    # Repairing FastAPI response
-    response.__setattr__("body_iterator", AsyncIteratorWrapper(resp_body))
+    def __init__(self, limit: int | bool | None = None):
+        self.retained: list[bytes] | None = [] if limit else None
+        self.max_size = None if limit is True or not limit else limit
+        self.size = 0
 
-    # Formatting response body for logging
-    try:
-        body = json.loads(resp_body[0].decode())
-    except Exception:
-        body = str(resp_body)
+    def add(self, chunk: bytes) -> None:
+        if self.retained is None:
+            return
 
-    return body, response.status_code, response.headers
+        self.size += len(chunk)
+        if self.max_size is not None and self.size >= self.max_size:
+            # don't capture response body if it's too large
+            self.retained = None
+        else:
+            self.retained.append(chunk)
 
+    @property
+    def body(self) -> bytes | None:
+        return b"".join(self.retained) if self.retained is not None else None
 
-def create_audit_request(graph, options):
-    async def audit_request(graph, options: AuditOptions, request: Request, call_next):
-        """
-        Audit request
 
-        """
-        logger = getLogger(AUDIT_LOGGER_NAME)
+class AuditMiddleware:
+    """
+    Audit requests, logging once the final response chunk has been sent.
 
-        request_context = graph.request_context(request)
-        request_info = RequestInfo(options, request, request_context, graph.metadata)
+    """
 
-        logging_info: LoggingInfo = graph.logging_data_map.get_entry(
-            request.url.path, request.method
-        )
-        if logging_info.is_empty():
-            # if logging info is empty then we don't produce any logs and return early
-            return await call_next(request)
+    def __init__(
+        self,
+        app: ASGIApp,
+        graph,
+        options: AuditOptions,
+        sink: AuditSink,
+        sampler: AuditSampler | None = None,
+    ):
+        self.app = app
+        self.graph = graph
+        self.options = options
+        self.sink = sink
+        self.sampler = sampler if sampler is not None and sampler.enabled else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        request_info.set_operation_and_func_name(logging_info)
+        request = Request(scope, receive)
+        request_info: RequestInfo | None = None
+        start_time = time()
+        tee = ResponseBodyTee()
+        skip_logging = False
+
+        timing = None
+        if self.options.include_phase_timing:
+            timing = RequestTiming()
+            token = request_timing.set(timing)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal request_info, tee, skip_logging
+
+            if message["type"] == "http.response.start":
+                # The router has resolved `scope["route"]` by now, if any route matched
+                logging_info: LoggingInfo = self.graph.logging_data_map.get_entry(
+                    scope["path"], scope["method"], scope.get("route"),
+                )
+                if logging_info.is_empty():
+                    # if logging info is empty then we don't produce any logs
+                    await send(message)
+                    return
+
+                # route metrics need the request info even when we don't log;
+                # the request context is only extracted once we know we will
+                request_info = RequestInfo(self.options, request, None, self.graph.metadata)
+                request_info.set_operation_and_func_name(logging_info)
+                request_info.timing["elapsed_time"] = (time() - start_time) * 1000
+                if timing is not None:
+                    request_info.capture_phases(timing)
+
+                request_error = getattr(request.state, "error", None)
+                if request_error is None:
+                    request_info.capture_response(message["status"], message["headers"])
+                else:
+                    request_info.capture_error(request_error)
 
-        with elapsed_time(request_info.timing):
-            response = await call_next(request)
+                skip_logging = should_skip_logging(request)
+                if not skip_logging and self.sampler is not None:
+                    # decide before retaining the body or building the record
+                    request_info.sample_weight = self.sampler.sample(
+                        request_info.operation, request_info.status_code or 0,
+                    )
+                    skip_logging = request_info.sample_weight is None
 
-        request_error = getattr(request.state, "error", None)
-        if request_error is None:
-            await request_info.capture_response(response)
-        else:
-            request_info.capture_error(request_error)
+                if not skip_logging and request_error is None:
+                    tee = ResponseBodyTee(request_info.response_body_limit)
+
+                # Setting request state for future middleware functions
+                request.state.request_info = request_info
+                await send(message)
 
-        if not should_skip_logging(request):
-            if request_info.status_code == 500:
-                # something actually went wrong; investigate
-                logger.error(request_info.to_dict())
+            elif message["type"] == "http.response.body" and request_info is not None:
+                await send(message)
+                tee.add(message.get("body", b""))
+
+                if not message.get("more_body", False) and not skip_logging:
+                    request_info.capture_response_body(tee.body)
+                    request_info.request_context = self.graph.request_context(request)
+                    self.log(request_info)
 
             else:
-                # usually log at INFO; a raised exception can be an error or
-                # expected behavior (e.g. 404)
-                if not request_info.options.log_as_debug:
-                    logger.info(request_info.to_dict())
-                else:
-                    logger.debug(request_info.to_dict())
+                await send(message)
 
-        # Setting request state for future middleware functions
-        request.state.request_info = request_info
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if timing is not None:
+                request_timing.reset(token)
 
-        return response
+    def log(self, request_info: RequestInfo) -> None:
+        if request_info.status_code == 500:
+            # something actually went wrong; investigate
+            self.sink.emit(ERROR, request_info)
 
-    return partial(audit_request, graph, options)
+        else:
+            # usually log at INFO; a raised exception can be an error or
+            # expected behavior (e.g. 404)
+            if not request_info.options.log_as_debug:
+                self.sink.emit(INFO, request_info)
+            else:
+                self.sink.emit(DEBUG, request_info)
 
 
 @defaults(
@@ -315,6 +472,20 @@ def create_audit_request(graph, options):
     include_path=typed(type=boolean, default_value=False),
     include_query_string=typed(type=boolean, default_value=False),
     log_as_debug=typed(type=boolean, default_value=False),
+    # break latency down into session, sql, handler, pydantic and middleware time
+    include_phase_timing=typed(type=boolean, default_value=False),
+    # queue records for a background writer; 0 logs inline on the request path
+    queue_size=typed(type=int, default_value=0),
+    queue_batch_size=typed(type=int, default_value=DEFAULT_AUDIT_QUEUE_BATCH_SIZE),
+    # drop, sample or block when the queue is full
+    queue_overflow_policy=typed(type=OverflowPolicy, default_value=OverflowPolicy.DROP.value),
+    queue_sample_rate=typed(type=float, default_value=0.1),
+    # fraction of successful requests to audit; errors are always audited
+    sample_rate=typed(type=float, default_value=1.0),
+    # per operation overrides, e.g. "pizza.search.v1:0.01"
+    operation_sample_rates=typed(type=comma_separated_list, default_value=""),
+    # per operation records per second, e.g. "pizza.retrieve.v1:50"
+    operation_rate_limits=typed(type=comma_separated_list, default_value=""),
 )
 def configure_audit_middleware(graph):
     """
@@ -327,6 +498,41 @@ def configure_audit_middleware(graph):
         include_path=graph.config.audit_middleware.include_path,
         include_query_string=graph.config.audit_middleware.include_query_string,
         log_as_debug=graph.config.audit_middleware.log_as_debug,
+        include_phase_timing=graph.config.audit_middleware.include_phase_timing,
     )
 
-    graph.app.middleware("http")(create_audit_request(graph, options))
+    sink = create_audit_sink(graph)
+    sampler = AuditSampler(
+        default_sample_rate=graph.config.audit_middleware.sample_rate,
+        sample_rates=parse_operation_values(graph.config.audit_middleware.operation_sample_rates),
+        rate_limits=parse_operation_values(graph.config.audit_middleware.operation_rate_limits),
+    )
+    graph.app.add_middleware(
+        AuditMiddleware, graph=graph, options=options, sink=sink, sampler=sampler,
+    )
+    return sink
+
+
+def create_audit_sink(graph) -> AuditSink:
+    """
+    Create the sink that writes audit records.
+
+    """
+    logger = getLogger(AUDIT_LOGGER_NAME)
+    config = graph.config.audit_middleware
+    if not config.queue_size:
+        return AuditSink(logger)
+
+    try:
+        metrics = graph.metrics
+    except NotBoundError:
+        metrics = None
+
+    return QueuedAuditSink(
+        logger,
+        max_size=config.queue_size,
+        batch_size=config.queue_batch_size,
+        overflow_policy=config.queue_overflow_policy,
+        sample_rate=config.queue_sample_rate,
+        metrics=metrics if metrics and metrics.host != "localhost" else None,
+    )
@@ -0,0 +1,104 @@
+"""
+Sampling and rate limiting of audit records.
+
+Decisions are taken per operation when the response starts, before any record is built.
+Errors are always logged. Every emitted record carries the number of requests it stands
+for as its `sample_weight`, so that downstream counts stay accurate.
+
+"""
+from random import random
+from time import monotonic
+
+
+def parse_operation_values(values: list[str]) -> dict[str, float]:
+    """
+    Parse `operation:value` pairs, e.g. ["pizza.retrieve.v1:0.1"].
+
+    """
+    parsed = {}
+    for value in values:
+        operation, _, number = value.rpartition(":")
+        if not operation:
+            raise ValueError(f"Expected <operation>:<value>, got: {value}")
+        parsed[operation] = float(number)
+    return parsed
+
+
+class TokenBucket:
+    """
+    Allow up to `rate` events per second, with bursts of up to `rate` events.
+
+    """
+
+    def __init__(self, rate: float, clock=monotonic):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+
+    def take(self) -> bool:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens < 1.0:
+            return False
+
+        self.tokens -= 1.0
+        return True
+
+
+class AuditSampler:
+    """
+    Decide whether to audit a request, and with which weight.
+
+    """
+
+    def __init__(
+        self,
+        default_sample_rate: float = 1.0,
+        sample_rates: dict[str, float] | None = None,
+        rate_limits: dict[str, float] | None = None,
+        random=random,
+        clock=monotonic,
+    ):
+        self.default_sample_rate = default_sample_rate
+        self.sample_rates = sample_rates or {}
+        self.buckets = {
+            operation: TokenBucket(rate, clock=clock)
+            for operation, rate in (rate_limits or {}).items()
+        }
+        self.random = random
+        # weight of requests suppressed by rate limits since the last record, per operation
+        self.suppressed: dict[str | None, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.default_sample_rate < 1.0 or bool(self.sample_rates or self.buckets)
+
+    def sample(self, operation: str | None, status_code: int) -> float | None:
+        """
+        Return the weight of the record to emit, or `None` to skip it.
+
+        """
+        if status_code >= 400:
+            # always log errors
+            return 1.0
+
+        rate = self.sample_rates.get(operation, self.default_sample_rate)   # type: ignore
+        if rate <= 0.0:
+            return None
+        if rate < 1.0 and self.random() >= rate:
+            return None
+        weight = 1.0 / rate
+
+        bucket = self.buckets.get(operation)   # type: ignore
+        if bucket is None:
+            return weight
+
+        if not bucket.take():
+            self.suppressed[operation] = self.suppressed.get(operation, 0.0) + weight
+            return None
+
+        return weight + self.suppressed.pop(operation, 0.0)
@@ -0,0 +1,140 @@
+"""
+Audit log sinks.
+
+The audit middleware hands completed `RequestInfo` records to a sink. The default sink
+logs them inline; the queued sink moves record building, formatting and handler I/O to a
+background writer thread behind a bounded queue.
+
+"""
+from atexit import register
+from enum import Enum, unique
+from logging import Logger
+from queue import Empty, Full, Queue
+from random import random
+from threading import Thread
+from typing import Any
+
+
+DEFAULT_AUDIT_QUEUE_BATCH_SIZE = 100
+
+
+@unique
+class OverflowPolicy(Enum):
+    """
+    What the queued sink does with a record when its queue is full.
+
+    """
+    # Discard the record
+    DROP = "drop"
+    # Keep a `sample_rate` fraction of records once the queue is half full; drop when full
+    SAMPLE = "sample"
+    # Wait for the writer; applies backpressure to the event loop
+    BLOCK = "block"
+
+
+class AuditSink:
+    """
+    Log audit records inline.
+
+    """
+
+    def __init__(self, logger: Logger):
+        self.logger = logger
+
+    def emit(self, level: int, request_info: Any) -> None:
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, request_info.to_dict())
+
+    def close(self) -> None:
+        pass
+
+
+class QueuedAuditSink(AuditSink):
+    """
+    Log audit records from a background thread, in batches.
+
+    """
+
+    def __init__(
+        self,
+        logger: Logger,
+        max_size: int,
+        batch_size: int = DEFAULT_AUDIT_QUEUE_BATCH_SIZE,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP,
+        sample_rate: float = 0.1,
+        metrics=None,
+    ):
+        super().__init__(logger)
+        self.queue: Queue = Queue(maxsize=max_size)
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.overflow_policy = overflow_policy
+        self.sample_rate = sample_rate
+        self.metrics = metrics
+
+        self.queued = 0
+        self.dropped = 0
+
+        self.writer = Thread(target=self.write, name="audit-sink", daemon=True)
+        self.writer.start()
+        register(self.close)
+
+    def emit(self, level: int, request_info: Any) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+
+        if self.overflow_policy == OverflowPolicy.BLOCK:
+            self.queue.put((level, request_info))
+            self.queued += 1
+            return
+
+        if (
+            self.overflow_policy == OverflowPolicy.SAMPLE
+            and self.queue.qsize() * 2 >= self.max_size
+            and random() >= self.sample_rate
+        ):
+            self.drop()
+            return
+
+        try:
+            self.queue.put_nowait((level, request_info))
+            self.queued += 1
+        except Full:
+            self.drop()
+
+    def drop(self) -> None:
+        self.dropped += 1
+        if self.metrics is not None:
+            self.metrics.increment("audit.dropped")
+
+    def write(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except Empty:
+                pass
+
+            for item in batch:
+                if item is None:
+                    return
+                level, request_info = item
+                try:
+                    self.logger.log(level, request_info.to_dict())
+                except Exception:
+                    self.logger.exception("Unable to write audit record")
+
+            if self.metrics is not None:
+                self.metrics.gauge("audit.queued", self.queue.qsize())
+
+    def close(self) -> None:
+        """
+        Write out queued records and stop the writer.
+
+        """
+        if not self.writer.is_alive():
+            return
+
+        self.queue.put(None)
+        self.writer.join()
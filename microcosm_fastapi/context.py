@@ -1,29 +1,45 @@
+from functools import lru_cache
+
 from fastapi import Request
 from microcosm.api import defaults
 
 
 X_REQUEST = "X-Request"
 HEADER_PREFIXES = [X_REQUEST]
+HEADER_NAME_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=HEADER_NAME_CACHE_SIZE)
+def capitalise_header(name: str) -> str:
+    # "x-request-id" -> "X-Request-Id"
+    return "-".join([part.capitalize() for part in name.split("-")])
 
 
 def capitalise_context(dct: dict[str, str]):
     # do conversion to upper case
     # {"x-request-id": "1234"} -> {"X-Request-Id": "1234"}
     return {
-        ("-").join([k_part.capitalize() for k_part in k.split("-")]): v
+        capitalise_header(k): v
         for k, v in dct.items()
     }
 
 
 def context_wrapper(include_header_prefixes):
+    prefixes = tuple(prefix.lower() for prefix in include_header_prefixes)
+
+    @lru_cache(maxsize=HEADER_NAME_CACHE_SIZE)
+    def context_header(raw_name: bytes) -> str | None:
+        # the header name if it is part of the context
+        name = raw_name.decode("latin-1")
+        return name if name.lower().startswith(prefixes) else None
+
     def retrieve_context(request: Request):
-        context = {
-            header: value
-            for header, value in request.headers.items()
-            if any(
-                [header.lower().startswith(prefix.lower()) for prefix in include_header_prefixes]
-            )
-        }
+        # work on the raw ASGI headers, without building a `Headers` mapping
+        context = {}
+        for raw_name, raw_value in request.scope["headers"]:
+            header = context_header(raw_name)
+            if header is not None:
+                context[header] = raw_value.decode("latin-1")
         return context
 
     return retrieve_context
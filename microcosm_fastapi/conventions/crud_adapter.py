@@ -26,6 +26,16 @@ class CRUDStoreAdapter:
         await self.store.delete(identifier, session=session)
         return Response(status_code=HTTPStatus.NO_CONTENT.value)
 
+    async def _delete_batch(self, session: AsyncSession | None = None, **kwargs):
+        """
+        Delete every model matching the (auto) filters in a single statement.
+
+        Without any filter, fails with a bad request rather than deleting every model.
+
+        """
+        await self.store.delete_many(session=session, **kwargs)
+        return Response(status_code=HTTPStatus.NO_CONTENT.value)
+
     async def _replace(
         self, identifier: UUID, body: BaseModel, session: AsyncSession | None = None
     ):
@@ -52,9 +62,15 @@ class CRUDStoreAdapter:
         def search(self, offset: int, limit: int) -> SearchSchema(PizzaSchema):
             pass
 
+        The total count is computed according to the store's `count_mode`.
+
         """
-        items = await self.store.search(offset=offset, limit=limit, session=session, **kwargs)
-        count = await self.store.count(session=session, **kwargs)
+        items, count = await self.store.search_with_count(
+            offset=offset,
+            limit=limit,
+            session=session,
+            **kwargs,
+        )
 
         payload = dict(
             items=items,
@@ -68,6 +84,43 @@ class CRUDStoreAdapter:
 
         return payload
 
+    async def _search_after(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        link_provider: Callable | None = None,
+        session: AsyncSession | None = None,
+        **kwargs,
+    ):
+        """
+        The keyset search endpoint expects to be serialized by
+        `microcosm_fastapi.conventions.schemas:CursorSearchSchema` and requires
+        the store to declare `keyset_columns`.
+
+        You can do this via a route definition that looks like:
+
+        def search(self, limit: int, cursor: str | None = None) -> CursorSearchSchema(PizzaSchema):
+            pass
+
+        """
+        items, next_cursor = await self.store.search_after(
+            cursor=cursor,
+            limit=limit,
+            session=session,
+            **kwargs,
+        )
+
+        payload = dict(
+            items=items,
+            cursor=cursor,
+            limit=limit,
+        )
+
+        if link_provider:
+            payload["_links"] = link_provider(next_cursor)
+
+        return payload
+
     async def _count(
         self,
         offset: int | None = None,
@@ -83,3 +136,22 @@ class CRUDStoreAdapter:
     ):
         model = self.store.model_class(id=identifier, **body.dict())
         return await self.store.update(identifier, model, session=session)
+
+    async def _update_batch(
+        self,
+        identifiers: list[UUID],
+        body: BaseModel,
+        session: AsyncSession | None = None,
+    ):
+        """
+        Apply the same partial update to many models in a single statement.
+
+        Only the fields set on the request body are updated.
+
+        """
+        items = await self.store.update_by_ids(
+            identifiers,
+            body.dict(exclude_unset=True),
+            session=session,
+        )
+        return dict(items=items)
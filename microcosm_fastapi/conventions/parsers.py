@@ -60,3 +60,35 @@ def LinkProvider(request: Request, offset: int = 0, limit: int = 20):
         return links_payload
 
     return CreateLinks
+
+
+def CursorLinkProvider(request: Request, cursor: str | None = None, limit: int = 20):
+    """
+    Parse the URL so we are able to create a keyset paginated links record that's relative
+    to the current location.
+
+    Keyset pages can only be walked forwards, so there is no `prev` link.
+
+    """
+
+    def CreateLinks(next_cursor):
+        self_parameters: dict[str, Any] = dict(limit=limit)
+        if cursor is not None:
+            self_parameters["cursor"] = cursor
+
+        links_payload = dict(
+            self=dict(
+                href=join_url_with_parameters(str(request.url), self_parameters)
+            )
+        )
+
+        if next_cursor is not None:
+            links_payload["next"] = dict(
+                href=join_url_with_parameters(
+                    str(request.url), dict(cursor=next_cursor, limit=limit)
+                )
+            )
+
+        return links_payload
+
+    return CreateLinks
@@ -0,0 +1,323 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+`PrometheusMetrics` stands in for the statsd client on the graph, so that everything
+publishing through `graph.metrics` (routes, connection pools, stores, pubsub) also
+records into a `MetricsRegistry`. Recording is a dictionary update; tags are only
+parsed into labels when scraped.
+
+Under multiple worker processes, each worker periodically writes a snapshot of its
+registry to a shared directory, and a scrape aggregates the snapshots of all workers.
+
+"""
+import json
+import os
+import re
+from bisect import bisect_left
+from threading import Event, Thread
+from typing import Any
+
+
+DEFAULT_BUCKETS = (1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0, 10000.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# A metric is identified by its name and its (statsd) tags
+MetricKey = tuple[str, tuple[str, ...]]
+
+
+def metric_name(name: str) -> str:
+    name = re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+    return f"_{name}" if name[:1].isdigit() else name
+
+
+def format_labels(tags: tuple[str, ...], *extra: tuple[str, str]) -> str:
+    labels = []
+    for tag in tags:
+        key, separator, value = tag.partition(":")
+        if separator:
+            labels.append((metric_name(key), value))
+    labels.extend(extra)
+    if not labels:
+        return ""
+
+    return "{" + ",".join(
+        '{}="{}"'.format(
+            key,
+            value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for key, value in labels
+    ) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and fixed-bucket histograms, keyed on name and tags.
+
+    Histograms keep a count per bucket (the last one unbounded), followed by the sum.
+
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counters: dict[MetricKey, float] = {}
+        self.gauges: dict[MetricKey, float] = {}
+        self.histograms: dict[MetricKey, list[float]] = {}
+
+    def increment(self, metric: str, value: float = 1, tags=None, sample_rate=None) -> None:
+        key = (metric, tuple(tags) if tags else ())
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def decrement(self, metric: str, value: float = 1, tags=None, sample_rate=None) -> None:
+        self.increment(metric, -value, tags)
+
+    def gauge(self, metric: str, value: float, tags=None, sample_rate=None) -> None:
+        self.gauges[(metric, tuple(tags) if tags else ())] = value
+
+    def histogram(self, metric: str, value: float, tags=None, sample_rate=None) -> None:
+        key = (metric, tuple(tags) if tags else ())
+        state = self.histograms.get(key)
+        if state is None:
+            state = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    timing = histogram
+    distribution = histogram
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        A copy of the registry's values, as JSON serializable data.
+
+        """
+        # copying a dict does not release the GIL, so needs no lock against recording
+        counters = dict(self.counters)
+        gauges = dict(self.gauges)
+        histograms = dict(self.histograms)
+        return dict(
+            buckets=list(self.buckets),
+            counters=[[name, list(tags), value] for (name, tags), value in counters.items()],
+            gauges=[[name, list(tags), value] for (name, tags), value in gauges.items()],
+            histograms=[[name, list(tags), list(state)] for (name, tags), state in histograms.items()],
+        )
+
+    def merge(self, snapshot: dict[str, Any], include_gauges: bool = True) -> None:
+        """
+        Add the values of a snapshot to this registry.
+
+        Gauges are summed across snapshots, e.g. connections in use per worker.
+
+        """
+        for name, tags, value in snapshot["counters"]:
+            key = (name, tuple(tags))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+        if include_gauges:
+            for name, tags, value in snapshot["gauges"]:
+                key = (name, tuple(tags))
+                self.gauges[key] = self.gauges.get(key, 0) + value
+
+        if tuple(snapshot["buckets"]) != self.buckets:
+            # written with a different configuration
+            return
+
+        for name, tags, state in snapshot["histograms"]:
+            key = (name, tuple(tags))
+            current = self.histograms.get(key)
+            if current is None:
+                self.histograms[key] = list(state)
+            else:
+                self.histograms[key] = [a + b for a, b in zip(current, state)]
+
+    def to_text(self) -> str:
+        """
+        Render the registry in the Prometheus text exposition format.
+
+        """
+        lines: list[str] = []
+
+        def by_name(values):
+            grouped: dict[str, list] = {}
+            for (name, tags), value in sorted(values.items()):
+                grouped.setdefault(name, []).append((tags, value))
+            return grouped.items()
+
+        for name, series in by_name(self.counters):
+            name = metric_name(name)
+            if not name.endswith("_total"):
+                name = f"{name}_total"
+            lines.append(f"# TYPE {name} counter")
+            for tags, value in series:
+                lines.append(f"{name}{format_labels(tags)} {format_value(value)}")
+
+        for name, series in by_name(self.gauges):
+            name = metric_name(name)
+            lines.append(f"# TYPE {name} gauge")
+            for tags, value in series:
+                lines.append(f"{name}{format_labels(tags)} {format_value(value)}")
+
+        bounds = [*self.buckets, float("inf")]
+        for name, series in by_name(self.histograms):
+            name = metric_name(name)
+            lines.append(f"# TYPE {name} histogram")
+            for tags, state in series:
+                cumulative = 0
+                for bound, count in zip(bounds, state):
+                    cumulative += count
+                    labels = format_labels(tags, ("le", format_value(bound)))
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(tags)} {format_value(state[-1])}")
+                lines.append(f"{name}_count{format_labels(tags)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MultiProcessStore:
+    """
+    Share registries between worker processes through a directory of snapshots.
+
+    Each worker writes its snapshot every `interval` seconds from a background thread.
+    Counters and histograms of exited workers are kept; their gauges are not.
+
+    """
+
+    def __init__(self, directory: str, registry: MetricsRegistry, interval: float, pid: int | None = None):
+        self.directory = directory
+        self.registry = registry
+        self.interval = interval
+        self.pid = pid or os.getpid()
+        self.path = self.path_for(self.pid)
+        self.stopped = Event()
+        self.writer: Thread | None = None
+
+        os.makedirs(directory, exist_ok=True)
+        previous = self.read(self.path)
+        if previous is not None:
+            # a previous worker had the same pid; keep its counts monotonic
+            self.registry.merge(previous, include_gauges=False)
+
+    def path_for(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics_{pid}.json")
+
+    def read(self, path: str) -> dict[str, Any] | None:
+        try:
+            with open(path) as snapshot_file:
+                return json.load(snapshot_file)
+        except (OSError, ValueError):
+            return None
+
+    def write(self) -> None:
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as snapshot_file:
+            json.dump(self.registry.snapshot(), snapshot_file)
+        os.replace(temporary_path, self.path)
+
+    def start(self) -> "MultiProcessStore":
+        self.writer = Thread(target=self.run, name="metrics-store", daemon=True)
+        self.writer.start()
+        return self
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def close(self) -> None:
+        self.stopped.set()
+        self.write()
+
+    def collect(self) -> MetricsRegistry:
+        """
+        Aggregate the live registry of this worker with the snapshots of all others.
+
+        """
+        aggregate = MetricsRegistry(self.registry.buckets)
+        aggregate.merge(self.registry.snapshot())
+
+        for filename in os.listdir(self.directory):
+            if not filename.startswith("metrics_") or not filename.endswith(".json"):
+                continue
+            try:
+                pid = int(filename[len("metrics_"):-len(".json")])
+            except ValueError:
+                continue
+            if pid == self.pid:
+                continue
+
+            snapshot = self.read(os.path.join(self.directory, filename))
+            if snapshot is not None:
+                aggregate.merge(snapshot, include_gauges=is_alive(pid))
+
+        return aggregate
+
+
+class PrometheusMetrics:
+    """
+    Metrics client recording into a registry, and forwarding to a statsd client if any.
+
+    """
+
+    def __init__(self, registry: MetricsRegistry, statsd=None, store: MultiProcessStore | None = None):
+        self.registry = registry
+        self.statsd = statsd
+        self.store = store
+
+    @property
+    def host(self) -> str:
+        # publishers only publish to a metrics client that isn't sending to localhost
+        return self.statsd.host if self.statsd is not None else "prometheus"
+
+    def increment(self, metric, value=1, tags=None, sample_rate=None, **kwargs):
+        self.registry.increment(metric, value, tags)
+        if self.statsd is not None:
+            self.statsd.increment(metric, value, tags=tags, sample_rate=sample_rate, **kwargs)
+
+    def decrement(self, metric, value=1, tags=None, sample_rate=None, **kwargs):
+        self.registry.decrement(metric, value, tags)
+        if self.statsd is not None:
+            self.statsd.decrement(metric, value, tags=tags, sample_rate=sample_rate, **kwargs)
+
+    def gauge(self, metric, value, tags=None, sample_rate=None, **kwargs):
+        self.registry.gauge(metric, value, tags)
+        if self.statsd is not None:
+            self.statsd.gauge(metric, value, tags=tags, sample_rate=sample_rate, **kwargs)
+
+    def histogram(self, metric, value, tags=None, sample_rate=None, **kwargs):
+        self.registry.histogram(metric, value, tags)
+        if self.statsd is not None:
+            self.statsd.histogram(metric, value, tags=tags, sample_rate=sample_rate, **kwargs)
+
+    def timing(self, metric, value, tags=None, sample_rate=None, **kwargs):
+        self.registry.timing(metric, value, tags)
+        if self.statsd is not None:
+            self.statsd.timing(metric, value, tags=tags, sample_rate=sample_rate, **kwargs)
+
+    def distribution(self, metric, value, tags=None, sample_rate=None, **kwargs):
+        self.registry.distribution(metric, value, tags)
+        if self.statsd is not None:
+            self.statsd.distribution(metric, value, tags=tags, sample_rate=sample_rate, **kwargs)
+
+    def collect(self) -> MetricsRegistry:
+        if self.store is not None:
+            return self.store.collect()
+
+        aggregate = MetricsRegistry(self.registry.buckets)
+        aggregate.merge(self.registry.snapshot())
+        return aggregate
+
+    def to_text(self) -> str:
+        return self.collect().to_text()
@@ -0,0 +1,57 @@
+from atexit import register
+from os import environ
+
+from fastapi import Response
+from microcosm.api import defaults, typed
+from microcosm.config.types import comma_separated_list
+
+from microcosm_fastapi.conventions.prometheus.models import (
+    CONTENT_TYPE,
+    DEFAULT_BUCKETS,
+    MetricsRegistry,
+    MultiProcessStore,
+    PrometheusMetrics,
+)
+from microcosm_fastapi.metrics import get_metrics
+
+
+@defaults(
+    path="/metrics",
+    # histogram bucket bounds, in the unit published (milliseconds for timings)
+    buckets=typed(comma_separated_list, default_value=",".join(str(bucket) for bucket in DEFAULT_BUCKETS)),
+    # directory shared by worker processes; metrics are per process when empty
+    multiprocess_dir=environ.get("PROMETHEUS_MULTIPROC_DIR", ""),
+    # seconds between writes of this worker's metrics to the shared directory
+    write_interval=typed(float, default_value=5.0),
+)
+def configure_prometheus(graph):
+    """
+    Keep metrics in process and serve them for Prometheus to scrape.
+
+    Replaces `graph.metrics` with a client that records into the registry (and still
+    sends to statsd, if configured), so use this convention before any component that
+    publishes metrics.
+
+    """
+    config = graph.config.prometheus_convention
+    registry = MetricsRegistry(tuple(float(bucket) for bucket in config.buckets))
+
+    store = None
+    if config.multiprocess_dir:
+        store = MultiProcessStore(config.multiprocess_dir, registry, config.write_interval).start()
+        register(store.close)
+
+    statsd = get_metrics(graph)
+    client = PrometheusMetrics(
+        registry,
+        statsd=statsd if statsd and statsd.host != "localhost" else None,
+        store=store,
+    )
+    graph.assign("metrics", client)
+
+    @graph.app.get(config.path, include_in_schema=False)
+    def configure_prometheus_endpoint():
+        # a sync endpoint, so rendering runs in the thread pool rather than the event loop
+        return Response(client.to_text(), media_type=CONTENT_TYPE)
+
+    return client
@@ -4,9 +4,19 @@ from typing import Any
 from pydantic import AnyHttpUrl, BaseModel as BaseModel, Field
 
 from microcosm_fastapi.naming import to_camel
+from microcosm_fastapi.timing import PYDANTIC, timed
 
 
 class EnhancedBaseModel(BaseModel):
+    @classmethod
+    def validate(cls, value: Any):
+        with timed(PYDANTIC):
+            return super().validate(value)
+
+    def dict(self, *args, **kwargs):
+        with timed(PYDANTIC):
+            return super().dict(*args, **kwargs)
+
     @classmethod
     def _get_value(
         cls,
@@ -97,3 +107,17 @@ def SearchSchema(item_class):
     _SearchSchema.__name__ = item_class.__name__ + "List"
 
     return _SearchSchema
+
+
+def CursorSearchSchema(item_class):
+    class _CursorSearchSchema(EnhancedBaseModel):
+        links: LinksSchema | None = Field(alias="_links")
+        items: list[item_class]
+        cursor: str | None
+        limit: int
+
+        __config__ = item_class.__config__
+
+    _CursorSearchSchema.__name__ = item_class.__name__ + "CursorList"
+
+    return _CursorSearchSchema
@@ -0,0 +1,212 @@
+"""
+Read-through cache for `StoreAsync.retrieve`.
+
+Entries hold committed column values only: they are populated from retrieves that run
+outside of any caller-managed session and are invalidated by every write through the
+store, again once the writing transaction commits.
+
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterable
+from itertools import count
+from math import inf
+from time import monotonic
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+DEFAULT_RETRIEVE_CACHE_SIZE = 1024
+DEFAULT_RETRIEVE_CACHE_TTL = 60
+
+PENDING_INVALIDATIONS = "_microcosm_fastapi_retrieve_cache_invalidations"
+
+
+class RetrieveCacheBackend(ABC):
+    """
+    A simple key-value cache interface with expiry.
+
+    Backends must be safe to call from the event loop; remote backends (e.g. Redis)
+    are expected to serialize the column value dictionaries they are given.
+
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Any | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """
+        Set a key, value pair to the cache.
+
+        Optional ttl (time-to-live) value should be in seconds.
+
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+
+class LRUCacheBackend(RetrieveCacheBackend):
+    """
+    In-process least recently used cache with per-entry expiry.
+
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_RETRIEVE_CACHE_SIZE, clock=monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = self.clock() + ttl if ttl else inf
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+
+class RetrieveCache:
+    """
+    Per-store read-through cache keyed on primary key.
+
+    Reads that race with a write can otherwise re-populate a stale value after the write
+    invalidated it; every read therefore takes a ticket first and its result is only
+    stored if the key was not invalidated since.
+
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: RetrieveCacheBackend,
+        ttl: float | None = DEFAULT_RETRIEVE_CACHE_TTL,
+        metrics=None,
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        self.ttl = ttl
+        self.metrics = metrics
+        self.hits = 0
+        self.misses = 0
+
+        self.tickets = count()
+        self.invalidated_at: OrderedDict[str, int] = OrderedDict()
+        # The latest invalidation no longer remembered per key
+        self.forgotten_at = -1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def key_for(self, identifier) -> str:
+        return f"{self.model_name}:{identifier}"
+
+    def ticket(self) -> int:
+        return next(self.tickets)
+
+    def get(self, identifier):
+        """
+        Return the cached column values for an identifier, if any.
+
+        """
+        values = self.backend.get(self.key_for(identifier))
+        self.record(hit=values is not None)
+        return values
+
+    def set(self, identifier, values: dict[str, Any], ticket: int) -> None:
+        """
+        Cache committed column values read after taking `ticket`.
+
+        """
+        key = self.key_for(identifier)
+        if self.forgotten_at >= ticket or self.invalidated_at.get(key, -1) >= ticket:
+            return
+
+        self.backend.set(key, values, ttl=self.ttl)
+
+    def invalidate(self, identifiers: Iterable, session: AsyncSession | None = None) -> None:
+        """
+        Drop cached values for identifiers.
+
+        When the write happens in a caller-managed session, the values are dropped again
+        once that session commits, so concurrent reads of the previously committed state
+        do not outlive the transaction.
+
+        """
+        keys = [self.key_for(identifier) for identifier in identifiers]
+        self.evict(keys)
+
+        if session is None or not keys:
+            return
+
+        sync_session = session.sync_session
+        pending = sync_session.info.get(PENDING_INVALIDATIONS)
+        if pending is None:
+            pending = sync_session.info[PENDING_INVALIDATIONS] = []
+            # Listeners stay registered for the life of the session
+            if not event.contains(sync_session, "after_commit", flush_pending_invalidations):
+                event.listen(sync_session, "after_commit", flush_pending_invalidations)
+                event.listen(sync_session, "after_rollback", discard_pending_invalidations)
+
+        pending.append((self, keys))
+
+    def evict(self, keys: list[str]) -> None:
+        for key in keys:
+            self.backend.delete(key)
+            self.invalidated_at[key] = self.ticket()
+            self.invalidated_at.move_to_end(key)
+
+        # Reads that took a ticket before a forgotten invalidation are rejected outright
+        while len(self.invalidated_at) > DEFAULT_RETRIEVE_CACHE_SIZE:
+            _, invalidated_at = self.invalidated_at.popitem(last=False)
+            self.forgotten_at = max(self.forgotten_at, invalidated_at)
+
+    def record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        if self.metrics is None:
+            return
+
+        self.metrics.increment(
+            "store.retrieve_cache",
+            tags=[
+                f"result:{'hit' if hit else 'miss'}",
+                f"model_name:{self.model_name}",
+            ],
+        )
+
+
+def flush_pending_invalidations(session) -> None:
+    for cache, keys in session.info.pop(PENDING_INVALIDATIONS, ()):
+        cache.evict(keys)
+
+
+def discard_pending_invalidations(session) -> None:
+    session.info.pop(PENDING_INVALIDATIONS, None)
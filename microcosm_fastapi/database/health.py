@@ -4,6 +4,8 @@ Simple Postgres health check.
 """
 from alembic.script import ScriptDirectory
 
+from microcosm_fastapi.database.pool import instrumentation_for
+
 
 async def check_health(graph):
     """
@@ -28,6 +30,21 @@ async def check_alembic(graph):
         return result.scalar()
 
 
+def check_pool(graph):
+    """
+    Report connection pool usage for the primary and any read replicas.
+
+    Intended as an optional check, i.e. shown on `/api/health?full=true`.
+
+    """
+    engines = [graph.postgres_async, *graph.postgres_async_replicas]
+    return "; ".join(
+        f"{instrumentation.name}: {instrumentation}"
+        for instrumentation in map(instrumentation_for, engines)
+        if instrumentation is not None
+    )
+
+
 async def get_current_head_version(graph):
     """
     Returns the current head version.
@@ -0,0 +1,107 @@
+"""
+Request-scoped batching of `StoreAsync.retrieve`.
+
+Retrieves by primary key that are issued within the same event loop tick against a
+session with batching enabled, from a store opting in with `batch_retrieves`, are
+coalesced into a single `WHERE id IN (...)` query, which turns the classic N+1 pattern
+of resolving related models into one round trip.
+
+"""
+from asyncio import (
+    Future,
+    Lock,
+    Task,
+    get_running_loop,
+)
+
+from microcosm_postgres.errors import ModelNotFoundError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+BATCHED_RETRIEVES = "_microcosm_fastapi_batched_retrieves"
+
+
+def enable_batched_retrieves(session: AsyncSession) -> AsyncSession:
+    """
+    Batch retrieves issued against this session.
+
+    """
+    session.sync_session.info[BATCHED_RETRIEVES] = {}
+    return session
+
+
+def loader_for(store, session: AsyncSession | None):
+    """
+    Return the retrieve loader for a store and session, if both enable batching.
+
+    """
+    if session is None or not getattr(store, "batch_retrieves", False):
+        return None
+
+    loaders = session.sync_session.info.get(BATCHED_RETRIEVES)
+    if loaders is None:
+        return None
+
+    loader = loaders.get(store)
+    if loader is None:
+        loader = loaders[store] = RetrieveLoader(store, session)
+    return loader
+
+
+class RetrieveLoader:
+    """
+    Collects the identifiers retrieved from one store and session and loads them together.
+
+    Each caller receives its own instance or `ModelNotFoundError`.
+
+    """
+
+    def __init__(self, store, session: AsyncSession):
+        self.store = store
+        self.session = session
+        self.pending: dict[object, list[Future]] = {}
+        self.scheduled = False
+        # The event loop only keeps weak references to tasks
+        self.dispatches: set[Task] = set()
+        # An `AsyncSession` runs one statement at a time
+        self.lock = Lock()
+
+    async def load(self, identifier):
+        loop = get_running_loop()
+        future = loop.create_future()
+        self.pending.setdefault(identifier, []).append(future)
+
+        if not self.scheduled:
+            # Runs after every task that is already ready, i.e. the rest of this tick
+            self.scheduled = True
+            task = loop.create_task(self.dispatch())
+            self.dispatches.add(task)
+            task.add_done_callback(self.dispatches.discard)
+
+        return await future
+
+    async def dispatch(self):
+        pending, self.pending, self.scheduled = self.pending, {}, False
+
+        try:
+            async with self.lock:
+                instances = await self.store.retrieve_many(list(pending), session=self.session)
+        except Exception as error:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(error)
+            return
+
+        found = {str(instance.id): instance for instance in instances}
+        for identifier, futures in pending.items():
+            instance = found.get(str(identifier))
+            for future in futures:
+                if future.done():
+                    continue
+                if instance is None:
+                    future.set_exception(
+                        ModelNotFoundError(f"{self.store.model_name} not found"),
+                    )
+                else:
+                    future.set_result(instance)
@@ -0,0 +1,92 @@
+"""
+Keyset (cursor) pagination support.
+
+Cursors are opaque to clients: a url-safe encoding of the sort key values
+of the last model on the previous page.
+
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from json import dumps, loads
+from uuid import UUID
+
+
+class InvalidCursorError(Exception):
+    """
+    A pagination cursor could not be decoded against the store's sort key.
+
+    """
+    @property
+    def status_code(self):
+        # bad request
+        return 400
+
+    @property
+    def include_stack_trace(self):
+        return False
+
+
+def to_cursor_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def python_type_for(column):
+    """
+    Resolve the python type of a column, looking through type decorators.
+
+    """
+    for column_type in (column.type, getattr(column.type, "impl", None)):
+        try:
+            python_type = column_type.python_type
+        except (AttributeError, NotImplementedError):
+            continue
+        if python_type is not object:
+            return python_type
+
+    return object
+
+
+def from_cursor_value(column, value):
+    if value is None:
+        return value
+
+    python_type = python_type_for(column)
+    if issubclass(python_type, datetime):
+        return datetime.fromisoformat(value)
+    if issubclass(python_type, UUID):
+        return UUID(value)
+    return value
+
+
+def encode_cursor(values) -> str:
+    """
+    Encode sort key values into an opaque cursor.
+
+    """
+    payload = dumps([to_cursor_value(value) for value in values], separators=(",", ":"))
+    return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    """
+    Decode an opaque cursor into sort key values for the given columns.
+
+    :raises `InvalidCursorError` if the cursor is malformed
+
+    """
+    try:
+        payload = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = loads(payload)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("Cursor does not match the sort key")
+
+        return [
+            from_cursor_value(column, value)
+            for column, value in zip(columns, values)
+        ]
+    except (TypeError, ValueError) as error:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from error
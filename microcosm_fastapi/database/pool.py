@@ -0,0 +1,217 @@
+"""
+Connection pool instrumentation for async engines.
+
+Tracks checkout wait time, checkout timeouts (pool exhaustion), pre-ping latency,
+connections in use and invalidations through pool events, publishes them through
+`metrics` and keeps a running summary for the health check.
+
+Pools have no events for checkout wait, timeouts or pre-pings, so these hook into
+`QueuePool._do_get` and `Dialect.do_ping`; tests check out of a real pool to catch
+SQLAlchemy releases changing either, and `setup.py` caps the SQLAlchemy version.
+
+"""
+from time import monotonic, perf_counter
+from typing import Callable
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from microcosm_fastapi.timing import SESSION, record_phase
+
+
+# Key in `ConnectionPoolEntry.info` holding how long the last checkout waited
+CHECKOUT_WAIT = "checkout_wait"
+
+# Minimum seconds between publications of pool usage gauges
+USAGE_INTERVAL = 10.0
+
+instrumented_engines: WeakKeyDictionary[Engine, "PoolInstrumentation"] = WeakKeyDictionary()
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waited for a connection.
+
+    The wait includes opening a new connection when the pool has none idle. Checkouts
+    timing out are reported to `on_checkout_timeout`, as pools have no event for them.
+
+    """
+    on_checkout_timeout: Callable[[float], None] | None = None
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            if self.on_checkout_timeout is not None:
+                self.on_checkout_timeout(perf_counter() - start)
+            raise
+        record.info[CHECKOUT_WAIT] = perf_counter() - start
+        return record
+
+    def recreate(self):
+        # NB: `engine.dispose()` replaces the pool
+        pool = super().recreate()
+        pool.on_checkout_timeout = self.on_checkout_timeout
+        return pool
+
+
+class Timings:
+    """
+    Running count, total and maximum of a duration in seconds.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def to_dict(self, prefix: str):
+        return {
+            f"{prefix}_count": self.count,
+            f"{prefix}_mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            f"{prefix}_max_ms": round(self.max * 1000, 3),
+        }
+
+
+class PoolInstrumentation:
+    """
+    Listen to pool events of an engine and publish pool saturation metrics.
+
+    """
+
+    def __init__(self, engine: AsyncEngine, name: str, metrics=None):
+        self.engine = engine.sync_engine
+        self.name = name
+        self.metrics = metrics
+        self.tags = [f"engine:{name}"]
+
+        self.checkout_wait = Timings()
+        self.pre_ping = Timings()
+        self.connects = 0
+        self.invalidations = 0
+        self.checkout_timeouts = 0
+        self.usage_published_at: float | None = None
+
+    @property
+    def pool(self):
+        return self.engine.pool
+
+    @property
+    def checked_out(self) -> int:
+        return self.pool.checkedout()
+
+    @property
+    def overflow(self) -> int:
+        overflow = getattr(self.pool, "overflow", None)
+        return max(overflow(), 0) if overflow else 0
+
+    def instrument(self) -> "PoolInstrumentation":
+        # Pool events registered on the engine survive `engine.dispose()`
+        event.listen(self.engine, "checkout", self.on_checkout)
+        event.listen(self.engine, "checkin", self.on_checkin)
+        event.listen(self.engine, "connect", self.on_connect)
+        event.listen(self.engine, "invalidate", self.on_invalidate)
+        event.listen(self.engine, "soft_invalidate", self.on_invalidate)
+
+        dialect = self.engine.dialect
+        do_ping = dialect.do_ping
+
+        def timed_ping(dbapi_connection):
+            start = perf_counter()
+            try:
+                return do_ping(dbapi_connection)
+            finally:
+                self.on_pre_ping(perf_counter() - start)
+
+        dialect.do_ping = timed_ping   # type: ignore
+        if isinstance(self.pool, InstrumentedAsyncAdaptedQueuePool):
+            self.pool.on_checkout_timeout = self.on_checkout_timeout
+        instrumented_engines[self.engine] = self
+        return self
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        wait = connection_record.info.pop(CHECKOUT_WAIT, None)
+        if wait is not None:
+            self.checkout_wait.add(wait)
+            self.histogram("postgres.pool.checkout_wait", wait)
+            record_phase(SESSION, wait * 1000)
+
+        self.publish_usage()
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        self.publish_usage()
+
+    def on_checkout_timeout(self, wait: float):
+        self.checkout_timeouts += 1
+        self.increment("postgres.pool.checkout_timeout")
+        self.histogram("postgres.pool.checkout_wait", wait)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+        self.increment("postgres.pool.connect")
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+        self.increment("postgres.pool.invalidate")
+
+    def on_pre_ping(self, elapsed: float):
+        self.pre_ping.add(elapsed)
+        self.histogram("postgres.pool.pre_ping", elapsed)
+
+    def publish_usage(self):
+        """
+        Publish connections in use, at most once per `USAGE_INTERVAL`.
+
+        """
+        if self.metrics is None:
+            return
+
+        now = monotonic()
+        if self.usage_published_at is not None and now - self.usage_published_at < USAGE_INTERVAL:
+            return
+        self.usage_published_at = now
+
+        self.metrics.gauge("postgres.pool.checked_out", self.checked_out, tags=self.tags)
+        self.metrics.gauge("postgres.pool.overflow", self.overflow, tags=self.tags)
+
+    def histogram(self, name: str, elapsed: float):
+        if self.metrics is None:
+            return
+
+        self.metrics.histogram(name, elapsed * 1000, tags=self.tags)
+
+    def increment(self, name: str):
+        if self.metrics is None:
+            return
+
+        self.metrics.increment(name, tags=self.tags)
+
+    def to_dict(self):
+        return dict(
+            checked_out=self.checked_out,
+            overflow=self.overflow,
+            size=self.pool.size() if hasattr(self.pool, "size") else None,
+            connects=self.connects,
+            invalidations=self.invalidations,
+            checkout_timeouts=self.checkout_timeouts,
+            **self.checkout_wait.to_dict("checkout_wait"),
+            **self.pre_ping.to_dict("pre_ping"),
+        )
+
+    def __str__(self):
+        return ", ".join(f"{key}={value}" for key, value in self.to_dict().items())
+
+
+def instrumentation_for(engine: AsyncEngine) -> PoolInstrumentation | None:
+    return instrumented_engines.get(engine.sync_engine)
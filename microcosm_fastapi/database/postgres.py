@@ -1,8 +1,15 @@
 import ssl
 
+from microcosm.api import defaults, typed
+from microcosm.config.model import Configuration
+from microcosm.config.types import boolean, comma_separated_list
 from microcosm_postgres.factories.engine import choose_uri
 from sqlalchemy.ext.asyncio import create_async_engine
 
+from microcosm_fastapi.database.pool import InstrumentedAsyncAdaptedQueuePool, PoolInstrumentation
+from microcosm_fastapi.metrics import get_metrics
+from microcosm_fastapi.timing import time_statements
+
 
 def choose_connect_args(metadata, config):
     """
@@ -52,12 +59,88 @@ def make_engine(metadata, config):
 
     uri = choose_uri(metadata, config.postgres)
     args = choose_args(metadata, config.postgres)
+    if config.postgres_async.instrument_pool:
+        args.update(poolclass=InstrumentedAsyncAdaptedQueuePool)
+
     return create_async_engine(
         uri,
         **args,
     )
 
 
+def make_replica_engines(metadata, config):
+    """
+    Create one engine per configured read replica host.
+
+    Replicas share the primary's connection settings except for the host and,
+    optionally, the read-only username convention.
+    """
+    engines = []
+    for host in config.postgres_async_replicas.hosts:
+        replica_config = Configuration(config.postgres)
+        replica_config.host = host
+        replica_config.driver = "postgresql+asyncpg"
+        replica_config.read_only = config.postgres_async_replicas.read_only
+
+        uri = choose_uri(metadata, replica_config)
+        args = choose_args(metadata, replica_config)
+        if config.postgres_async.instrument_pool:
+            args.update(poolclass=InstrumentedAsyncAdaptedQueuePool)
+
+        engines.append(
+            create_async_engine(
+                uri,
+                **args,
+            )
+        )
+
+    return engines
+
+
+def instrument_pool(graph, engine, name):
+    """
+    Publish pool saturation metrics for an engine.
+
+    """
+    if not graph.config.postgres_async.instrument_pool:
+        return
+
+    metrics = get_metrics(graph)
+    PoolInstrumentation(
+        engine,
+        name,
+        metrics=metrics if metrics and metrics.host != "localhost" else None,
+    ).instrument()
+
+
+def instrument_engine(graph, engine, name):
+    instrument_pool(graph, engine, name)
+    if graph.config.postgres_async.time_statements:
+        time_statements(engine)
+
+
+@defaults(
+    # track checkout wait, pre-ping latency and pool usage; see `check_pool`
+    instrument_pool=typed(boolean, default_value=True),
+    # time statements into the `sql` phase of requests with phase timing enabled
+    time_statements=typed(boolean, default_value=True),
+)
 def configure_postgres(graph):
     engine = make_engine(graph.metadata, graph.config)
+    instrument_engine(graph, engine, "primary")
     return engine
+
+
+@defaults(
+    # read replica hosts; reads are routed to the primary when empty
+    hosts=typed(comma_separated_list, default_value=""),
+    # connect to replicas with the read-only username convention
+    read_only=typed(boolean, default_value=False),
+    # seconds during which reads stay on the primary after a write in the same request
+    sticky_seconds=typed(float, default_value=1.0),
+)
+def configure_postgres_replicas(graph):
+    engines = make_replica_engines(graph.metadata, graph.config)
+    for host, engine in zip(graph.config.postgres_async_replicas.hosts, engines):
+        instrument_engine(graph, engine, host)
+    return engines
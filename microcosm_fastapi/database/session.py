@@ -1,13 +1,123 @@
+from contextvars import ContextVar
+from itertools import cycle
+from time import monotonic
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from microcosm_fastapi.metrics import get_metrics
+
+
+# Monotonic deadline until which reads in the current context stay on the primary
+read_your_writes_until: ContextVar[float] = ContextVar("read_your_writes_until", default=0.0)
+
+
+class PrimarySession(Session):
+    """
+    Session bound to the primary that records writes for read-your-writes routing.
+
+    """
+    sticky_seconds = 0.0
+
+    def mark_write(self):
+        read_your_writes_until.set(monotonic() + self.sticky_seconds)
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def mark_flush(session, flush_context):
+    session.mark_write()
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def mark_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.mark_write()
+
+
+class RoutingSessionMaker:
+    """
+    Make sessions bound to the primary by default, or to a read replica via `reader`.
+
+    Reads are kept on the primary for `sticky_seconds` after a write in the same
+    context (i.e. request), so that callers read their own writes despite replica lag.
+
+    The rest of the `sessionmaker` API (e.g. `begin`, `configure`, `kw`) is the primary's.
+
+    """
+
+    def __init__(self, primary, replicas, sticky_seconds, metrics=None):
+        self.primary = primary
+        self.replicas = replicas
+        self.next_replica = cycle(range(len(replicas)))
+        self.sticky_seconds = sticky_seconds
+        self.metrics = metrics
+
+    def __call__(self, **kwargs):
+        return self.primary(**kwargs)
+
+    def __getattr__(self, name):
+        if name == "primary":
+            # not yet set, e.g. while copying
+            raise AttributeError(name)
+        return getattr(self.primary, name)
+
+    def reader(self, **kwargs):
+        if read_your_writes_until.get() > monotonic():
+            self.record("primary", self.primary)
+            return self.primary(**kwargs)
+
+        replica = self.replicas[next(self.next_replica)]
+        self.record("replica", replica)
+        return replica(**kwargs)
+
+    def record(self, role, maker):
+        if self.metrics is None:
+            return
+
+        self.metrics.increment(
+            "postgres.session",
+            tags=[
+                f"role:{role}",
+                f"engine:{maker.kw['bind'].url.host}",
+            ],
+        )
 
 
 def configure_session_maker(graph):
     # expire_on_commit=False
     # In async settings, we don't want SQLAlchemy to issue new SQL queries
     # to the database when accessing already commited objects.
-    return sessionmaker(
-        graph.postgres_async,
-        class_=AsyncSession,
-        expire_on_commit=False,
+    replicas = graph.postgres_async_replicas
+    if not replicas:
+        return sessionmaker(
+            graph.postgres_async,
+            class_=AsyncSession,
+            expire_on_commit=False,
+        )
+
+    sticky_seconds = graph.config.postgres_async_replicas.sticky_seconds
+    primary_session_class = type(
+        "PrimarySession",
+        (PrimarySession,),
+        dict(sticky_seconds=sticky_seconds),
+    )
+    metrics = get_metrics(graph)
+    return RoutingSessionMaker(
+        primary=sessionmaker(
+            graph.postgres_async,
+            class_=AsyncSession,
+            sync_session_class=primary_session_class,
+            expire_on_commit=False,
+        ),
+        replicas=[
+            sessionmaker(
+                engine,
+                class_=AsyncSession,
+                expire_on_commit=False,
+            )
+            for engine in replicas
+        ],
+        sticky_seconds=sticky_seconds,
+        metrics=metrics if metrics and metrics.host != "localhost" else None,
     )
@@ -0,0 +1,49 @@
+"""
+Parameterized statement cache for async stores.
+
+For a given operation, set of active filters and pagination shape, a store's
+search-like statements differ only by their bound values. Building each shape
+once (with `bindparam` placeholders) skips the per-call `select()` construction
+and lets SQLAlchemy reuse the memoized cache key of the same statement object.
+
+"""
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+DEFAULT_STATEMENT_CACHE_SIZE = 256
+
+
+class StatementCache:
+    """
+    A bounded map from statement shape to a parameterized statement.
+
+    Once full, new shapes are built on every call rather than evicting: the set of
+    shapes a store uses is small and stable, so overflow signals misuse, not churn.
+
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_STATEMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.statements: dict[Hashable, Any] = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Return the statement for a key, building it on a miss, and whether it was a hit.
+
+        """
+        statement = self.statements.get(key)
+        if statement is not None:
+            self.hits += 1
+            return statement, True
+
+        self.misses += 1
+        statement = build()
+        if len(self.statements) < self.maxsize:
+            self.statements[key] = statement
+        return statement, False
+
+    def clear(self) -> None:
+        self.statements.clear()
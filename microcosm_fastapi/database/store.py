@@ -1,5 +1,9 @@
-from contextlib import asynccontextmanager
+from asyncio import gather
+from contextlib import asynccontextmanager, contextmanager
+from copy import deepcopy
+from enum import Enum, unique
 
+from microcosm_logging.timing import elapsed_time
 from microcosm_postgres.diff import Version
 from microcosm_postgres.errors import (
     DuplicateModelError,
@@ -9,18 +13,108 @@ from microcosm_postgres.errors import (
     ReferencedModelError,
 )
 from microcosm_postgres.identifiers import new_object_id
-from microcosm_postgres.metrics import postgres_metric_timing
-from sqlalchemy import func, select
+from microcosm_postgres.metrics import SQLExecutionStatus, postgres_metric_timing
+from sqlalchemy import (
+    Float,
+    bindparam,
+    delete,
+    func,
+    insert,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import ONETOMANY, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.orm.exc import FlushError, NoResultFound
 
+from microcosm_fastapi.database.cache import DEFAULT_RETRIEVE_CACHE_TTL, RetrieveCache
+from microcosm_fastapi.database.loader import loader_for
+from microcosm_fastapi.database.pagination import decode_cursor, encode_cursor
+from microcosm_fastapi.database.statements import StatementCache
+
+
+# Rows per multi-row INSERT; keeps us well clear of the 32767 bind parameter limit
+DEFAULT_BULK_BATCH_SIZE = 500
+
+# Columns that an upsert must never overwrite on conflict
+UPSERT_IMMUTABLE_COLUMNS = ("id", "created_at")
+
+# Statement building hooks; overriding any of them disables the statement cache
+QUERY_HOOKS = ("_query", "_order_by", "_where", "_auto_where", "_paginate")
+
+
+def copy_mutable(value):
+    """
+    Copy container values (e.g. JSON columns) so that cached rows cannot be mutated in place.
+    """
+    return deepcopy(value) if isinstance(value, (dict, list, set)) else value
+
+
+class MissingCriterionError(ValueError):
+    """
+    A set-based write was not restricted to any rows, so it would affect the whole table.
+
+    """
+    @property
+    def status_code(self):
+        # bad request
+        return 400
+
+    @property
+    def include_stack_trace(self):
+        return False
+
+
+@unique
+class CountMode(Enum):
+    """
+    How `StoreAsync.search_with_count` computes the total alongside a page of results.
+
+    """
+    # Search, then count; one round trip each
+    SERIAL = "serial"
+    # A single statement carrying `count(*) OVER ()` on every row
+    WINDOW = "window"
+    # Search and count concurrently on separate pooled connections
+    CONCURRENT = "concurrent"
+    # Planner estimate of the table size from `pg_class.reltuples`; ignores filters
+    ESTIMATE = "estimate"
+    # No count query; fetch `limit + 1` rows so that the total is exact up to the next page
+    PROBE = "probe"
+
 
 class StoreAsync:
-    def __init__(self, graph, model_class, auto_filter_fields=()):
+    def __init__(
+        self,
+        graph,
+        model_class,
+        auto_filter_fields=(),
+        bulk_batch_size=DEFAULT_BULK_BATCH_SIZE,
+        upsert_index_elements=("id",),
+        set_based_delete=True,
+        count_mode=CountMode.SERIAL,
+        keyset_columns=(),
+        cache_statements=True,
+        retrieve_cache_backend=None,
+        retrieve_cache_ttl=DEFAULT_RETRIEVE_CACHE_TTL,
+        read_from_replicas=True,
+        batch_retrieves=False,
+    ):
         if graph:
             self.graph = graph
             self.session_maker = graph.session_maker_async
+            # Reads without an explicit session may go to a read replica
+            self.read_session_maker = (
+                getattr(self.session_maker, "reader", self.session_maker)
+                if read_from_replicas
+                else self.session_maker
+            )
             self.postgres_store_metrics = self.graph.postgres_store_metrics
         else:
             # no-op function for metrics if graph isn't passed
@@ -31,6 +125,34 @@ class StoreAsync:
             auto_filter_field.name: auto_filter_field
             for auto_filter_field in auto_filter_fields
         }
+        self.bulk_batch_size = bulk_batch_size
+        self.upsert_index_elements = upsert_index_elements
+        self.set_based_delete = set_based_delete
+        self.count_mode = count_mode
+        # Unique sort key for keyset pagination, e.g. (Pizza.created_at, Pizza.id)
+        self.keyset_columns = tuple(keyset_columns)
+        self.statement_cache = (
+            StatementCache()
+            if cache_statements and not self.overrides_query_hooks()
+            else None
+        )
+        # Read-through cache of committed rows for `retrieve`, e.g. an `LRUCacheBackend`
+        self.retrieve_cache = (
+            RetrieveCache(
+                self.model_name,
+                retrieve_cache_backend,
+                ttl=retrieve_cache_ttl,
+                metrics=(
+                    self.postgres_store_metrics.metrics
+                    if getattr(self.postgres_store_metrics, "enabled", False)
+                    else None
+                ),
+            )
+            if retrieve_cache_backend is not None
+            else None
+        )
+        # Coalesce concurrent retrieves on sessions with batching enabled (see `loader`)
+        self.batch_retrieves = batch_retrieves
         self.assign_model_class_store()
 
         # Error checking on subclass definitions
@@ -47,12 +169,62 @@ class StoreAsync:
     def model_name(self):
         return self.model_class.__name__ if self.model_class else None
 
+    def overrides_query_hooks(self):
+        """
+        Whether a subclass customizes how statements are built from `**kwargs`.
+
+        Custom hooks may depend on argument values, not just on which arguments are set,
+        so their statements cannot be shared between calls.
+        """
+        return any(
+            getattr(type(self), hook) is not getattr(StoreAsync, hook)
+            for hook in QUERY_HOOKS
+        )
+
+    @property
+    def use_set_based_delete(self):
+        """
+        Whether deletes can be issued as a single `DELETE ... WHERE` statement.
+
+        Loading rows into the session is only needed when the ORM has to act on them:
+        delete cascades, association tables, mapper delete listeners or one-to-many
+        relationships whose foreign keys the ORM nulls out (without `passive_deletes`).
+        """
+        if not self.set_based_delete:
+            return False
+
+        mapper = inspect(self.model_class)
+        if mapper.dispatch.before_delete or mapper.dispatch.after_delete:
+            return False
+
+        return not any(
+            relationship.cascade.delete
+            or relationship.secondary is not None
+            or (relationship.direction is ONETOMANY and not relationship.passive_deletes)
+            for relationship in mapper.relationships
+        )
+
     def new_object_id(self):
         """
         Injectable id generation to facilitate mocking.
         """
         return new_object_id()
 
+    def invalidate_retrieve_cache(self, identifiers, session: AsyncSession | None = None):
+        """
+        Drop models from the retrieve cache after a write.
+
+        Writes through the store call this already; call it after changing rows by other means.
+        Within an open transaction the models are dropped again once it commits.
+        """
+        if self.retrieve_cache is None:
+            return
+
+        if session is not None and not session.in_transaction():
+            session = None
+
+        self.retrieve_cache.invalidate(identifiers, session)
+
     @asynccontextmanager
     async def flushing(self, session):
         """
@@ -77,6 +249,26 @@ class StoreAsync:
             else:
                 raise ModelIntegrityError(error)
 
+    @contextmanager
+    def batch_metric_timing(self, action):
+        """
+        Emit `postgres_store_metrics` for a single batch of a bulk operation.
+        """
+        extra = dict(
+            model_name=self.model_name,
+            action=action,
+        )
+        execution_status = SQLExecutionStatus.FAILURE.name
+        try:
+            with elapsed_time(extra):
+                yield
+            execution_status = SQLExecutionStatus.SUCCESS.name
+        finally:
+            self.postgres_store_metrics(
+                execution_result=execution_status,
+                **extra,
+            )
+
     @asynccontextmanager
     async def with_transaction(self, session):
         try:
@@ -108,7 +300,7 @@ class StoreAsync:
             yield session
 
         else:
-            async with self.session_maker() as session:
+            async with self.read_session_maker() as session:
                 yield session
 
     @postgres_metric_timing(action="create")
@@ -121,16 +313,101 @@ class StoreAsync:
                 instance.id = self.new_object_id()
             session.add(instance)   # type: ignore
 
+        self.invalidate_retrieve_cache([instance.id], session)
         return instance
 
+    async def create_many(
+        self,
+        instances,
+        session: AsyncSession | None = None,
+        batch_size: int | None = None,
+    ):
+        """
+        Create many model instances using batched multi-row INSERTs.
+
+        Returns the created instances, hydrated from `RETURNING`, in input order.
+        """
+        return await self._insert_many(
+            insert(self.model_class),
+            instances,
+            action="create_many",
+            session=session,
+            batch_size=batch_size,
+        )
+
+    async def upsert_many(
+        self,
+        instances,
+        index_elements=None,
+        session: AsyncSession | None = None,
+        batch_size: int | None = None,
+    ):
+        """
+        Create or update many model instances using batched `INSERT ... ON CONFLICT DO UPDATE`.
+
+        :param index_elements: the conflict target; defaults to the store's `upsert_index_elements`
+
+        Only the columns that are set on a given instance are updated on conflict (instances
+        setting different columns are upserted in separate statements); `updated_at` is set
+        by the database unless provided.
+        """
+        index_elements = tuple(index_elements or self.upsert_index_elements)
+        columns = inspect(self.model_class).c
+
+        def on_conflict(rows):
+            # NB: rows of a batch all set the same columns
+            statement = postgres_insert(self.model_class)
+            set_ = {
+                key: statement.excluded[key]
+                for key in sorted(rows[0])
+                if key not in index_elements and key not in UPSERT_IMMUTABLE_COLUMNS
+            }
+            if "updated_at" in columns and "updated_at" not in set_:
+                set_["updated_at"] = self._new_updated_at()
+            return statement.on_conflict_do_update(
+                index_elements=index_elements,
+                set_=set_,
+            )
+
+        return await self._insert_many(
+            on_conflict,
+            instances,
+            action="upsert_many",
+            session=session,
+            batch_size=batch_size,
+        )
+
     @postgres_metric_timing(action="retrieve")
     async def retrieve(self, identifier, *criterion, session: AsyncSession | None = None):
         """
         Retrieve a model by primary key and zero or more other criteria.
         :raises `NotFound` if there is no existing model
         """
+        if not criterion and session is None and self.retrieve_cache is not None:
+            return await self._retrieve_cached(identifier)
+
+        loader = None if criterion else loader_for(self, session)
+        if loader is not None:
+            return await loader.load(identifier)
+
+        if not criterion and self.statement_cache is not None:
+            statement, parameters = self._statement_for("retrieve", identifier=identifier)
+            return await self._get_one(statement, parameters=parameters, session=session)
+
         return await self._retrieve(self.model_class.id == identifier, *criterion, session=session)
 
+    async def retrieve_many(self, identifiers, session: AsyncSession | None = None):
+        """
+        Retrieve the models with the given primary keys in a single query.
+
+        Missing models are omitted; results are not ordered.
+        """
+        identifiers = list(identifiers)
+        if not identifiers:
+            return []
+
+        return await self.get_all(self._query(self.model_class.id.in_(identifiers)), session=session)
+
     @postgres_metric_timing(action="update")
     async def update(self, identifier, new_instance, session: AsyncSession | None = None):
         """
@@ -142,8 +419,38 @@ class StoreAsync:
             await self.merge(instance, new_instance, session)   # type: ignore
             instance.updated_at = instance.new_timestamp()
 
+        self.invalidate_retrieve_cache([instance.id], session)
         return instance
 
+    @postgres_metric_timing(action="update_many")
+    async def update_many(self, *criterion, values, session: AsyncSession | None = None):
+        """
+        Update all models matching some criterion with the same values in a single statement.
+
+        `updated_at` is set by the database unless provided in `values`.
+        Returns the updated instances.
+        :raises `MissingCriterionError` without a criterion; pass `sqlalchemy.true()` to update every model
+        """
+        if not criterion:
+            raise MissingCriterionError(f"Refusing to update every {self.model_name}")
+
+        return await self._update_rows(*criterion, values=values, session=session)
+
+    @postgres_metric_timing(action="update_by_ids")
+    async def update_by_ids(self, identifiers, values, session: AsyncSession | None = None):
+        """
+        Update the models with the given primary keys with the same values in a single statement.
+        """
+        identifiers = list(identifiers)
+        if not identifiers:
+            return []
+
+        return await self._update_rows(
+            self.model_class.id.in_(identifiers),
+            values=values,
+            session=session,
+        )
+
     @postgres_metric_timing(action="update_with_diff")
     async def update_with_diff(
         self, identifier, new_instance, session: AsyncSession | None = None
@@ -159,6 +466,7 @@ class StoreAsync:
             instance.updated_at = instance.new_timestamp()
             after = Version(instance)
 
+        self.invalidate_retrieve_cache([instance.id], session)
         return instance, before - after
 
     async def replace(self, identifier, new_instance, session: AsyncSession | None = None):
@@ -178,17 +486,27 @@ class StoreAsync:
         Delete a model by primary key.
         :raises `ModelNotFoundError` if the row cannot be deleted.
         """
-        return await self._delete(self.model_class.id == identifier)
+        return await self._delete(self.model_class.id == identifier, session=session)
+
+    @postgres_metric_timing(action="delete_many")
+    async def delete_many(self, *criterion, session: AsyncSession | None = None, **kwargs):
+        """
+        Delete all models matching some criterion.
+        Returns the number of deleted rows.
+        :raises `MissingCriterionError` if there is neither a criterion nor a filter
+        """
+        if not criterion and all(value is None for value in kwargs.values()):
+            raise MissingCriterionError(f"Refusing to delete every {self.model_name}")
+
+        return len(await self._delete_rows(*criterion, session=session, **kwargs))
 
     @postgres_metric_timing(action="count")
     async def count(self, *criterion, session: AsyncSession | None = None, **kwargs):
         """
         Count the number of models matching some criterion.
         """
-        query = self._query(*criterion)
-        query = self._where(query, **kwargs).subquery()
-        query = select(func.count(query.c.id))
-        return await self.get_first(query, session=session)
+        statement, parameters = self._statement_for("count", *criterion, **kwargs)
+        return await self.get_first(statement, parameters=parameters, session=session)
 
     @postgres_metric_timing(action="search")
     async def search(self, *criterion, session: AsyncSession | None = None, **kwargs):
@@ -198,26 +516,112 @@ class StoreAsync:
         :param limit: pagination limit, if any
         :param session: sqlalchemy session, if any
         """
-        query = self._query(*criterion)
-        query = self._order_by(query, **kwargs)
-        query = self._where(query, **kwargs)
-        # NB: pagination must go last
-        query = self._paginate(query, **kwargs)
+        statement, parameters = self._statement_for("search", *criterion, **kwargs)
+        return await self.get_all(statement, parameters=parameters, session=session)
+
+    @postgres_metric_timing(action="search_with_count")
+    async def search_with_count(
+        self,
+        *criterion,
+        session: AsyncSession | None = None,
+        count_mode: CountMode | None = None,
+        **kwargs,
+    ):
+        """
+        Return a page of models matching some criterion together with the total count.
+        :param count_mode: how to compute the total; defaults to the store's `count_mode`
+        """
+        count_mode = count_mode or self.count_mode
+
+        if count_mode == CountMode.WINDOW:
+            return await self._search_with_window_count(*criterion, session=session, **kwargs)
+
+        if count_mode == CountMode.PROBE:
+            return await self._search_with_probe_count(*criterion, session=session, **kwargs)
+
+        if count_mode == CountMode.ESTIMATE:
+            items = await self.search(*criterion, session=session, **kwargs)
+            count = await self.estimate_count(session=session)
+            if count is None:
+                count = await self.count(*criterion, session=session, **kwargs)
+            return items, count
 
-        return await self.get_all(query, session=session)
+        if count_mode == CountMode.CONCURRENT and session is None:
+            # NB: an explicit session cannot be shared between concurrent statements
+            items, count = await gather(
+                self.search(*criterion, **kwargs),
+                self.count(*criterion, **kwargs),
+            )
+            return items, count
+
+        items = await self.search(*criterion, session=session, **kwargs)
+        count = await self.count(*criterion, session=session, **kwargs)
+        return items, count
+
+    @postgres_metric_timing(action="search_after")
+    async def search_after(
+        self,
+        *criterion,
+        cursor: str | None = None,
+        limit: int | None = None,
+        session: AsyncSession | None = None,
+        **kwargs,
+    ):
+        """
+        Return the page of models following a cursor, ordered by the store's `keyset_columns`,
+        together with the cursor of the next page (None on the last page).
+
+        Unlike offset pagination, the cost of a page does not grow with its depth.
+        :raises `InvalidCursorError` if the cursor is malformed
+        """
+        if not self.keyset_columns:
+            raise ValueError(f"{self.model_name} store does not declare `keyset_columns`")
+
+        items = await self.search(
+            *criterion,
+            cursor=cursor,
+            # NB: fetch one extra row to tell whether there is a next page
+            limit=None if limit is None else limit + 1,
+            session=session,
+            **kwargs,
+        )
+        if limit is None or len(items) <= limit:
+            return items, None
+
+        items = items[:limit]
+        return items, self.cursor_for(items[-1])
+
+    def cursor_for(self, instance) -> str:
+        """
+        Encode the keyset pagination cursor positioned after an instance.
+        """
+        return encode_cursor(
+            getattr(instance, column.key)
+            for column in self.keyset_columns
+        )
+
+    async def estimate_count(self, session: AsyncSession | None = None):
+        """
+        Estimate the number of rows in the model's table from planner statistics.
+
+        Returns None if the table has never been analyzed.
+        """
+        query = text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table_name AS regclass)",
+        ).bindparams(table_name=self.model_class.__table__.fullname)
+        estimate = await self.get_first(query, session=session)
+
+        if estimate is None or estimate < 0:
+            return None
+        return estimate
 
     @postgres_metric_timing(action="search_first")
     async def search_first(self, *criterion, session: AsyncSession | None = None, **kwargs):
         """
         Returns the first match based on criteria or None.
         """
-        query = self._query(*criterion)
-        query = self._order_by(query, **kwargs)
-        query = self._where(query, **kwargs)
-        # NB: pagination must go last
-        query = self._paginate(query, **kwargs)
-
-        return await self.get_first(query, session=session)
+        statement, parameters = self._statement_for("search_first", *criterion, **kwargs)
+        return await self.get_first(statement, parameters=parameters, session=session)
 
     async def expunge(self, instance, session: AsyncSession | None = None):
         async with self.with_maybe_session(session) as session:
@@ -226,14 +630,14 @@ class StoreAsync:
     async def merge(self, instance, new_instance, session: AsyncSession):
         await session.merge(new_instance)
 
-    async def get_all(self, query, session: AsyncSession | None = None):
+    async def get_all(self, query, session: AsyncSession | None = None, parameters=None):
         async with self.with_maybe_session(session) as session:
-            results = await session.execute(query)   # type: ignore
+            results = await session.execute(query, parameters)   # type: ignore
             return [response[0] for response in results.all()]
 
-    async def get_first(self, query, session: AsyncSession | None = None):
+    async def get_first(self, query, session: AsyncSession | None = None, parameters=None):
         async with self.with_maybe_session(session) as session:
-            results = await session.execute(query)   # type: ignore
+            results = await session.execute(query, parameters)   # type: ignore
             first_result = results.first()
 
         if not first_result:
@@ -266,6 +670,9 @@ class StoreAsync:
         return query
 
     def _paginate(self, query, **kwargs):
+        if self.keyset_columns and "cursor" in kwargs:
+            return self._paginate_keyset(query, **kwargs)
+
         offset, limit = kwargs.get("offset"), kwargs.get("limit")
         if offset is not None:
             query = query.offset(offset)
@@ -274,15 +681,81 @@ class StoreAsync:
 
         return query
 
+    def _paginate_keyset(self, query, cursor=None, limit=None, **kwargs):
+        """
+        Seek past the cursor on the (indexed) keyset columns instead of using an offset.
+
+        Pages are ordered by the keyset columns alone (replacing any `_order_by`), as the
+        seek predicate relies on that order.
+        """
+        if cursor is not None:
+            values = decode_cursor(cursor, self.keyset_columns)
+            query = query.where(tuple_(*self.keyset_columns) > tuple(values))
+
+        query = query.order_by(None).order_by(*self.keyset_columns)
+        if limit is not None:
+            query = query.limit(limit)
+
+        return query
+
     async def _retrieve(self, *criterion, session: AsyncSession | None = None):
         """
         Retrieve a model by some criteria.
         :raises `ModelNotFoundError` if the row cannot be deleted.
         """
+        return await self._get_one(self._query(*criterion), session=session)
+
+    async def _retrieve_cached(self, identifier):
+        """
+        Retrieve a model by primary key through the retrieve cache.
+
+        Only reads outside of a caller-managed session reach this path, so the cache
+        is never populated from uncommitted state.
+        """
+        values = self.retrieve_cache.get(identifier)   # type: ignore
+        if values is not None:
+            return self._from_cached_values(values)
+
+        ticket = self.retrieve_cache.ticket()   # type: ignore
+        # Misses read from the primary; a lagging replica would re-populate stale rows
+        async with self.session_maker() as session:
+            if self.statement_cache is not None:
+                statement, parameters = self._statement_for("retrieve", identifier=identifier)
+                instance = await self._get_one(statement, parameters=parameters, session=session)
+            else:
+                instance = await self._retrieve(self.model_class.id == identifier, session=session)
+
+        self.retrieve_cache.set(identifier, self._to_cached_values(instance), ticket)   # type: ignore
+        return instance
+
+    def _to_cached_values(self, instance):
+        """
+        Copy the loaded column values of a model for the retrieve cache.
+        """
+        return {
+            attribute.key: copy_mutable(instance.__dict__[attribute.key])
+            for attribute in inspect(self.model_class).column_attrs
+            if attribute.key in instance.__dict__
+        }
+
+    def _from_cached_values(self, values):
+        """
+        Build a detached model from cached column values, as if loaded by a closed session.
+        """
+        instance = inspect(self.model_class).class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(instance, key, copy_mutable(value))
+        make_transient_to_detached(instance)
+        return instance
+
+    async def _get_one(self, query, parameters=None, session: AsyncSession | None = None):
+        """
+        Execute a query that must match exactly one model.
+        :raises `ModelNotFoundError` if there is no matching row
+        """
         try:
-            query = self._query(*criterion)
             async with self.with_maybe_session(session) as session:
-                results = await session.execute(query)   # type: ignore
+                results = await session.execute(query, parameters)   # type: ignore
                 return results.one()[0]
 
         except NoResultFound as error:
@@ -296,15 +769,272 @@ class StoreAsync:
     async def _delete(self, *criterion, session: AsyncSession | None = None):
         """
         Delete a model by some criterion.
+        :raises `ModelNotFoundError` if no row was deleted.
         """
-        query = self._query(*criterion)
-        async with self.with_maybe_transactional_flushing_session(session) as session:
-            count = len([await session.delete(row[0]) for row in await session.execute(query)])   # type: ignore
+        identifiers = await self._delete_rows(*criterion, session=session)
 
-        if count == 0:
+        if not identifiers:
             raise ModelNotFoundError
         return True
 
+    async def _delete_rows(self, *criterion, session: AsyncSession | None = None, **kwargs):
+        """
+        Delete models by some criterion, returning the primary keys of the deleted rows.
+
+        Uses a single `DELETE ... RETURNING id` unless the model needs the ORM to
+        process each deleted row (see `use_set_based_delete`).
+        """
+        async with self.with_maybe_transactional_flushing_session(session) as session:
+            if not self.use_set_based_delete:
+                query = self._where(self._query(*criterion), **kwargs)
+                rows = (await session.scalars(query)).all()   # type: ignore
+                for row in rows:
+                    await session.delete(row)   # type: ignore
+                identifiers = [row.id for row in rows]
+            else:
+                # NB: `_where` hooks build on a select, so delete the rows it matches by id
+                query = self._where(self._query(*criterion), **kwargs)
+                statement = delete(self.model_class).where(
+                    self.model_class.id.in_(query.with_only_columns(self.model_class.id)),
+                ).returning(self.model_class.id)
+                identifiers = (await session.scalars(statement)).all()   # type: ignore
+
+        self.invalidate_retrieve_cache(identifiers, session)
+        return identifiers
+
+    async def _search_with_window_count(
+        self, *criterion, session: AsyncSession | None = None, **kwargs
+    ):
+        """
+        Search and count in one statement using a `count(*) OVER ()` window column.
+        """
+        query = self._query(*criterion).add_columns(func.count().over())
+        query = self._order_by(query, **kwargs)
+        query = self._where(query, **kwargs)
+        # NB: pagination must go last
+        query = self._paginate(query, **kwargs)
+
+        async with self.with_maybe_session(session) as session:
+            results = await session.execute(query)   # type: ignore
+            rows = results.all()
+
+        if rows:
+            return [row[0] for row in rows], rows[0][1]
+
+        if not kwargs.get("offset"):
+            return [], 0
+
+        # Paged past the end: the window has no rows to report the total on
+        return [], await self.count(*criterion, session=session, **kwargs)
+
+    async def _search_with_probe_count(
+        self, *criterion, session: AsyncSession | None = None, **kwargs
+    ):
+        """
+        Search for one row beyond the page instead of counting.
+
+        The count is exact when there is no further page and a lower bound otherwise,
+        which is enough to decide whether to link to the next page.
+        """
+        offset, limit = kwargs.get("offset") or 0, kwargs.get("limit")
+        if limit is None:
+            items = await self.search(*criterion, session=session, **kwargs)
+            return items, offset + len(items)
+
+        items = await self.search(*criterion, session=session, **dict(kwargs, limit=limit + 1))
+        return items[:limit], offset + len(items)
+
+    def _statement_for(self, action, *criterion, **kwargs):
+        """
+        Return the statement for a search-like action together with its bound parameters.
+
+        Statements without ad hoc criterion are built once per (action, filters, pagination)
+        shape and reused; values are bound at execution time. Parameters are None when
+        the statement was built just for this call.
+        """
+        if not criterion and self.statement_cache is not None and "cursor" not in kwargs:
+            return self._cached_statement(action, **kwargs)
+
+        return self._build_statement(action, *criterion, **kwargs), None
+
+    def _cached_statement(self, action, identifier=None, **kwargs):
+        filters = {
+            key: value
+            for key, value in kwargs.items()
+            if value is not None and key in self.auto_filters
+        }
+        pagination = tuple(
+            key
+            for key in ("offset", "limit")
+            if action in ("search", "search_first") and kwargs.get(key) is not None
+        )
+
+        statement, hit = self.statement_cache.get(   # type: ignore
+            (action, frozenset(filters), pagination),
+            lambda: self._build_parameterized_statement(action, filters, pagination),
+        )
+        self._record_statement_cache(action, hit)
+
+        parameters = {
+            f"filter_{key}": value
+            for key, value in filters.items()
+        }
+        parameters.update({key: kwargs[key] for key in pagination})
+        if action == "retrieve":
+            parameters["identifier"] = identifier
+
+        return statement, parameters
+
+    def _build_statement(self, action, *criterion, **kwargs):
+        """
+        Build a search-like statement through the (possibly overridden) query hooks.
+        """
+        query = self._query(*criterion)
+
+        if action == "count":
+            query = self._where(query, **kwargs).subquery()
+            return select(func.count(query.c.id))
+
+        query = self._order_by(query, **kwargs)
+        query = self._where(query, **kwargs)
+        # NB: pagination must go last
+        return self._paginate(query, **kwargs)
+
+    def _build_parameterized_statement(self, action, filters, pagination):
+        """
+        Build the `bindparam` equivalent of `_build_statement` for the default query hooks.
+        """
+        if action == "retrieve":
+            return self._query(self.model_class.id == bindparam("identifier"))
+
+        query = self._query(*[
+            self.auto_filters[key] == bindparam(f"filter_{key}")
+            for key in sorted(filters)
+        ])
+
+        if action == "count":
+            query = query.subquery()
+            return select(func.count(query.c.id))
+
+        if "offset" in pagination:
+            query = query.offset(bindparam("offset"))
+        if "limit" in pagination:
+            query = query.limit(bindparam("limit"))
+
+        return query
+
+    def _record_statement_cache(self, action, hit):
+        """
+        Count statement cache hits and misses alongside the other store metrics.
+        """
+        store_metrics = self.postgres_store_metrics
+        if not getattr(store_metrics, "enabled", False) or not self.model_name:
+            return
+
+        store_metrics.metrics.increment(   # type: ignore
+            "store.statement_cache",
+            tags=[
+                "source:microcosm-postgres",
+                f"result:{'hit' if hit else 'miss'}",
+                f"action:{action}",
+                f"model_name:{self.model_name}",
+            ],
+        )
+
+    def _new_updated_at(self):
+        """
+        Database-side `updated_at` value for set-based updates.
+        """
+        column = inspect(self.model_class).c.updated_at
+        if isinstance(column.type, Float):
+            # `UnixTimestampEntityMixin` stores seconds since the epoch
+            return func.extract("epoch", func.now())
+        return func.timezone("utc", func.now())
+
+    async def _update_rows(self, *criterion, values, session: AsyncSession | None = None):
+        """
+        Issue a single `UPDATE ... WHERE ... RETURNING` and hydrate the updated models.
+        """
+        values = dict(values)
+        if "updated_at" not in values and "updated_at" in inspect(self.model_class).c:
+            values["updated_at"] = self._new_updated_at()
+
+        statement = update(self.model_class).where(*criterion).values(values)
+        async with self.with_maybe_transactional_flushing_session(session) as session:
+            results = await session.scalars(   # type: ignore
+                statement.returning(self.model_class),
+                execution_options=dict(populate_existing=True),
+            )
+            instances = results.all()
+
+        self.invalidate_retrieve_cache([instance.id for instance in instances], session)
+        return instances
+
+    def _to_row(self, instance):
+        """
+        Convert a model instance into a dictionary of column values for a bulk statement.
+        """
+        if instance.id is None:
+            instance.id = self.new_object_id()
+
+        columns = inspect(self.model_class).c
+        return {
+            key: value
+            for key, value in instance.__dict__.items()
+            if key in columns
+        }
+
+    async def _insert_many(
+        self,
+        statement,
+        instances,
+        action: str,
+        session: AsyncSession | None = None,
+        batch_size: int | None = None,
+    ):
+        """
+        Insert instances in batches of multi-row INSERT statements.
+
+        Each batch holds rows setting the same columns; results are returned in input order.
+
+        :param statement: an insert statement or a callable building one from a batch of rows
+        """
+        rows = [self._to_row(instance) for instance in instances]
+        batch_size = batch_size or self.bulk_batch_size
+        results: list = [None] * len(rows)
+
+        if not rows:
+            return results
+
+        indexes_by_columns: dict[frozenset, list[int]] = {}
+        for index, row in enumerate(rows):
+            indexes_by_columns.setdefault(frozenset(row), []).append(index)
+        batches = [
+            indexes[offset: offset + batch_size]
+            for indexes in indexes_by_columns.values()
+            for offset in range(0, len(indexes), batch_size)
+        ]
+
+        async with self.with_maybe_transactional_flushing_session(session) as session:
+            for batch_indexes in batches:
+                batch = [rows[index] for index in batch_indexes]
+                batch_statement = statement(batch) if callable(statement) else statement
+                batch_statement = batch_statement.returning(
+                    self.model_class,
+                    sort_by_parameter_order=True,
+                )
+                with self.batch_metric_timing(action):
+                    batch_results = await session.scalars(   # type: ignore
+                        batch_statement,
+                        batch,
+                        execution_options=dict(populate_existing=True),
+                    )
+                    for index, instance in zip(batch_indexes, batch_results.all()):
+                        results[index] = instance
+
+        self.invalidate_retrieve_cache([instance.id for instance in results], session)
+        return results
+
     def _query(self, *criterion):
         """
         Construct a query for the model.
@@ -1,31 +1,58 @@
 import traceback
-from collections.abc import Awaitable, Callable
-from typing import Any
 
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from microcosm.object_graph import ObjectGraph
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
 
 from microcosm_fastapi.errors import ParsedException
 from microcosm_fastapi.utils import bind_to_request_state
 
 
-async def global_exception_handler(
-    request: Request, call_next: Callable[[Request], Awaitable[Any]]
-) -> JSONResponse:
+class GlobalExceptionMiddleware:
     """
     Catches exceptions and converts them into JSON responses that can be returned back to the client
     to fit in with existing microcosm conventions
 
+    Exceptions raised after the response has started are re-raised.
+
     """
-    try:
-        return await call_next(request)
-    except Exception as error:
-        bind_to_request_state(request, error=error, traceback=traceback.format_exc(limit=10))
-        parsed_exception = ParsedException(error)
-        return JSONResponse(
-            status_code=parsed_exception.status_code, content=parsed_exception.to_dict()
-        )
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as error:
+            if response_started:
+                raise
+
+            request = Request(scope, receive)
+            bind_to_request_state(request, error=error, traceback=traceback.format_exc(limit=10))
+            parsed_exception = ParsedException(error)
+            response = JSONResponse(
+                status_code=parsed_exception.status_code, content=parsed_exception.to_dict()
+            )
+            await response(scope, receive, send)
 
 
 def configure_global_exception_handler(graph: ObjectGraph) -> None:
@@ -33,4 +60,4 @@ def configure_global_exception_handler(graph: ObjectGraph) -> None:
     Configure global exception middleware - i.e this middleware will catch all exceptions
 
     """
-    graph.app.middleware("http")(global_exception_handler)   # type: ignore
+    graph.app.add_middleware(GlobalExceptionMiddleware)   # type: ignore
@@ -1,7 +1,26 @@
 from fastapi import FastAPI
+from fastapi.routing import APIRoute
 from fastapi.testclient import TestClient
 from microcosm.api import defaults, typed
 
+from microcosm_fastapi.timing import ROUTE, timed
+
+
+class TimedAPIRoute(APIRoute):
+    """
+    Time the route (dependencies, handler and response serialization) for phase timing.
+
+    """
+
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def timed_route_handler(request):
+            with timed(ROUTE):
+                return await route_handler(request)
+
+        return timed_route_handler
+
 
 class FastAPIWrapper(FastAPI):
     """
@@ -114,6 +133,7 @@ def configure_fastapi(graph):
         docs_url=None,
         redoc_url=None,
     )
+    app.router.route_class = TimedAPIRoute
 
     # Request_context is used for logging purposes
     graph.use("request_context")
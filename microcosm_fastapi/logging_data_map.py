@@ -2,13 +2,17 @@
 Used to store information that useful for audit logging purposes
 
 """
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any
 
 from microcosm_fastapi.namespaces import Namespace
 from microcosm_fastapi.operations import OperationInfo
 
 
+# Number of raw request paths whose lookups are remembered
+DEFAULT_PATH_CACHE_SIZE = 1024
+
+
 @dataclass(frozen=True)
 class LoggingInfo:
     operation_name: str | None = None
@@ -18,78 +22,117 @@ class LoggingInfo:
         return self.operation_name is None and self.function_name is None
 
 
-class LoggingDataMap:
+EMPTY_LOGGING_INFO = LoggingInfo()
+
+
+class RouteNode:
+    """
+    Node of a radix tree over path segments; `{parameter}` segments match any segment.
+
+    """
+    __slots__ = ("children", "wildcard", "entries")
+
     def __init__(self):
-        self.data_map = {}
+        self.children: dict[str, RouteNode] = {}
+        self.wildcard: RouteNode | None = None
+        self.entries: dict[str, LoggingInfo] = {}
+
+    def insert(self, segments: list[str]) -> "RouteNode":
+        node = self
+        for segment in segments:
+            if segment.startswith("{") and segment.endswith("}"):
+                if node.wildcard is None:
+                    node.wildcard = RouteNode()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(segment, RouteNode())
+        return node
+
+    def match(self, segments: list[str], index: int, method: str) -> LoggingInfo | None:
+        if index == len(segments):
+            return self.entries.get(method)
+
+        # Literal segments take precedence over parameters, e.g. /pizza/search over /pizza/{id}
+        child = self.children.get(segments[index])
+        if child is not None:
+            logging_info = child.match(segments, index + 1, method)
+            if logging_info is not None:
+                return logging_info
+
+        if self.wildcard is not None:
+            return self.wildcard.match(segments, index + 1, method)
+
+        return None
+
+
+def split_path(path: str) -> list[str]:
+    # e.g "/api/v1/pizza?name=margherita" -> ["api", "v1", "pizza"]
+    return path.partition("?")[0].strip("/").split("/")
+
+
+class LoggingDataMap:
+    """
+    Index of logging information by route.
+
+    Each registered operation's path template is compiled into a radix tree, so that a
+    lookup walks the request path's segments once. Lookups reuse the matched route's
+    template when the router has already resolved it, and remember recent raw paths.
+
+    """
+
+    def __init__(self, path_cache_size: int = DEFAULT_PATH_CACHE_SIZE):
+        # (path template, method) -> LoggingInfo
+        self.data_map: dict[tuple[str, str], LoggingInfo] = {}
+        self.root = RouteNode()
+        self.path_cache: OrderedDict[tuple[str, str], LoggingInfo] = OrderedDict()
+        self.path_cache_size = path_cache_size
 
     def add_entry(self, namespace: Namespace, operation: OperationInfo, function_name: str):
         operation_name = namespace.generate_operation_name_for_logging(operation)
-        key = self._generate_key_from_namespace_and_operation(namespace, operation)
-        self.data_map[key] = LoggingInfo(operation_name, function_name)
-
-    def get_entry(self, url_path: str, operation_method: str) -> LoggingInfo:
-        key = self._generate_key_from_path_url(url_path, operation_method)
-        try:
-            return self.data_map[key]
-        except KeyError:
-            # Return empty LoggingInfo
-            return LoggingInfo()
-
-    def _generate_key_from_path_url(
-        self, path: str, operation_method: str
-    ) -> tuple[str, str, str | None, str, str | None] | None:
-        # single subject -> key = ("v1", "pizza", None, "GET", None)
-        # subject + object -> key = ("v1", "pizza", "order", "GET", None)
-
-        # We only care about paths that start with "api/v"
-        if not path.startswith("/api/v"):
-            return None
-
-        path_parts = path.split("/")
-        if len(path_parts) == 6:
-            # Must be an edge pattern
-            return (path_parts[2], path_parts[3], path_parts[5], operation_method, None)
-
-        resource_name = self._extract_resource_name(path_parts[3])
-        if operation_method == "GET":
-            # "GET" is a special case as both retrieve and search have similar keys
-            if len(path_parts) == 5:
-                # we know that we have a Retrieve operation if there are 5 path_parts
-                # e.g ["", "api", "v1", "pizza", "1234"]
-                return (path_parts[2], resource_name, None, operation_method, "retrieve")
-            elif len(path_parts) == 4:
-                return (path_parts[2], resource_name, None, operation_method, "search")
-
-        # Must be a node pattern
-        return (path_parts[2], resource_name, None, operation_method, None)
-
-    def _generate_key_from_namespace_and_operation(
-        self, namespace: Namespace, operation: OperationInfo
-    ) -> tuple[str | None, Any, Any, str, str | None]:
-        # single subject -> key = ("v1", "pizza", None, "GET", None)
-        # subject + object -> key = ("v1", "pizza", "order", "GET", None)
-        optional_identifier = self._get_optional_identifier(operation)
-        return (
-            namespace.version,
-            namespace.subject_name,
-            namespace.object_name,
+        self.add_path(
+            namespace.path_for_operation(operation),
             operation.method,
-            optional_identifier,
+            LoggingInfo(operation_name, function_name),
         )
 
-    def _get_optional_identifier(self, operation: OperationInfo) -> str | None:
+    def add_path(self, path_template: str, method: str, logging_info: LoggingInfo):
+        """
+        Register logging information for a path template such as `/api/v1/pizza/{pizza_id}`.
+
         """
-        There is a potential clash between search and retrieve so we use an extra identifier
-        inside to distinguish between these two methods
+        self.data_map[(path_template, method)] = logging_info
+        self.root.insert(split_path(path_template)).entries[method] = logging_info
+        self.path_cache.clear()
+
+    def get_entry(self, url_path: str, operation_method: str, route=None) -> LoggingInfo:
+        """
+        Look up logging information for a request.
+
+        :param route: the route matched by the router (`request.scope["route"]`), if any
+
         """
-        if operation.method == "GET" and operation.name in ["search", "retrieve"]:
-            return operation.name
-        else:
-            return None
-
-    def _extract_resource_name(self, url_path_part: str) -> str:
-        # e.g url_path_part -> "pizza?name=margherita"
-        return url_path_part.split("?")[0]
+        path_template = getattr(route, "path", None)
+        if path_template is not None:
+            logging_info = self.data_map.get((path_template, operation_method))
+            if logging_info is not None:
+                return logging_info
+
+        key = (url_path, operation_method)
+        logging_info = self.path_cache.get(key)
+        if logging_info is not None:
+            self.path_cache.move_to_end(key)
+            return logging_info
+
+        logging_info = (
+            self.root.match(split_path(url_path), 0, operation_method)
+            or EMPTY_LOGGING_INFO
+        )
+
+        self.path_cache[key] = logging_info
+        if len(self.path_cache) > self.path_cache_size:
+            self.path_cache.popitem(last=False)
+
+        return logging_info
 
 
 def configure_logging_data_map(graph):
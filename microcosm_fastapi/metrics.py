@@ -2,15 +2,21 @@
 Metrics extensions for routes.
 
 """
-from functools import partial
-
-from fastapi import Request
 from microcosm.api import defaults, typed
 from microcosm.config.types import boolean
 from microcosm.errors import NotBoundError
 from microcosm_metrics.naming import name_for
+from starlette.types import (
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+)
 
 from microcosm_fastapi.audit import RequestInfo
+from microcosm_fastapi.metrics_buffer import DEFAULT_MAX_SAMPLES, RouteMetricsBuffer
+from microcosm_fastapi.timing import phase_times
 
 
 def get_metrics(graph):
@@ -30,43 +36,88 @@ def normalize_status_code(status_code: int) -> str:
     return str(status_code)[0] + "xx"
 
 
-def create_route_metrics(graph):
-    async def route_metrics(graph, request: Request, call_next):
-        response = await call_next(request)
-
-        if getattr(request.state, "request_info", None):
-            request_info: RequestInfo = request.state.request_info
-
-            key = "route"
-            tags = [
-                f"endpoint:{request_info.operation}",
-                "backend_type:microcosm_fastapi",
-            ]
-            if request_info.status_code is not None:
-                graph.metrics.increment(
-                    name_for(
-                        key,
-                        "call",
-                        "count",
-                    ),
-                    tags=tags + [f"classifier:{normalize_status_code(request_info.status_code)}"],
-                )
+class RouteMetricsMiddleware:
+    """
+    Publish call counts and latency per route once the response starts.
 
-            if request_info.timing.get("elapsed_time"):
-                elapsed_ms = request_info.timing["elapsed_time"]
-                graph.metrics.histogram(
-                    name_for(key),
-                    elapsed_ms,
-                    tags=tags,
-                )
+    Relies on the `RequestInfo` the audit middleware binds to the request state.
 
-        return response
+    Metrics are sent per request, or aggregated in a `RouteMetricsBuffer` if given.
 
-    return partial(route_metrics, graph)
+    """
+
+    def __init__(self, app: ASGIApp, graph, buffer: RouteMetricsBuffer | None = None):
+        self.app = app
+        self.metrics = graph.metrics
+        self.buffer = buffer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            await send(message)
+            if message["type"] == "http.response.start":
+                self.record(scope)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def record(self, scope: Scope) -> None:
+        request_info: RequestInfo | None = scope.get("state", {}).get("request_info")
+        if request_info is None:
+            return
+
+        if self.buffer is not None:
+            self.buffer.record(
+                request_info.operation,
+                normalize_status_code(request_info.status_code)
+                if request_info.status_code is not None
+                else None,
+                request_info.timing.get("elapsed_time"),
+                phase_times(request_info.timing),
+            )
+            return
+
+        key = "route"
+        tags = [
+            f"endpoint:{request_info.operation}",
+            "backend_type:microcosm_fastapi",
+        ]
+        if request_info.status_code is not None:
+            self.metrics.increment(
+                name_for(
+                    key,
+                    "call",
+                    "count",
+                ),
+                tags=tags + [f"classifier:{normalize_status_code(request_info.status_code)}"],
+            )
+
+        if request_info.timing.get("elapsed_time"):
+            elapsed_ms = request_info.timing["elapsed_time"]
+            self.metrics.histogram(
+                name_for(key),
+                elapsed_ms,
+                tags=tags,
+            )
+
+        phases = phase_times(request_info.timing)
+        if phases:
+            for phase, phase_ms in phases.items():
+                self.metrics.histogram(
+                    name_for(key, "phase"),
+                    phase_ms,
+                    tags=tags + [f"phase:{phase}"],
+                )
 
 
 @defaults(
     enabled=typed(boolean, default_value=True),
+    # aggregate metrics in process and send them every this many seconds; 0 sends per request
+    flush_interval=typed(float, default_value=0.0),
+    # cap on latency samples sent per endpoint and phase per flush; 0 sends one per request
+    max_samples=typed(int, default_value=DEFAULT_MAX_SAMPLES),
 )
 def configure_route_metrics(graph):
     """
@@ -75,5 +126,16 @@ def configure_route_metrics(graph):
     """
     metrics = get_metrics(graph)
     enabled = bool(metrics and metrics.host != "localhost" and graph.config.route_metrics.enabled)
-    if enabled:
-        graph.app.middleware("http")(create_route_metrics(graph))
+    if not enabled:
+        return None
+
+    buffer = None
+    if graph.config.route_metrics.flush_interval:
+        buffer = RouteMetricsBuffer(
+            metrics,
+            flush_interval=graph.config.route_metrics.flush_interval,
+            max_samples=graph.config.route_metrics.max_samples,
+        )
+
+    graph.app.add_middleware(RouteMetricsMiddleware, graph=graph, buffer=buffer)
+    return buffer
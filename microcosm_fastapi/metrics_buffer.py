@@ -0,0 +1,195 @@
+"""
+Buffered route metrics.
+
+Aggregates route call counts and latencies in process, keyed on endpoint and
+classifier, and flushes them to the metrics client on an interval from a background
+task; the request path only updates a counter and a histogram bucket.
+
+Latencies per phase (see `microcosm_fastapi.timing`) are buffered the same way.
+
+Counters flush as a single increment of the aggregated count. Latencies are kept in
+fixed log-spaced buckets with a bounded relative error, and flush as at most
+`max_samples` histogram samples per endpoint and phase, at evenly spaced quantiles of
+the bucket values, so the percentiles and max the statsd server derives match those of
+unbuffered metrics within that error (and the quantile spacing), however busy the
+endpoint.
+
+"""
+from asyncio import (
+    CancelledError,
+    Task,
+    get_running_loop,
+    sleep,
+)
+from atexit import register
+from math import ceil, log
+
+from microcosm_metrics.naming import name_for
+
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_SAMPLES = 100
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket histogram, with buckets growing geometrically (as in DDSketch).
+
+    Every value is represented within `relative_accuracy` of its true value.
+
+    """
+
+    __slots__ = ("gamma", "log_gamma", "buckets", "count", "max")
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = log(self.gamma)
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        index = ceil(log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def value_for(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def samples(self, max_samples: int = DEFAULT_MAX_SAMPLES) -> list[float]:
+        """
+        Values to report for this histogram, ending with the exact max.
+
+        Reports one value per observation, or `max_samples` values at evenly spaced
+        quantiles if there are more observations than that; 0 reports every observation.
+
+        """
+        if not self.count:
+            return []
+
+        size = self.count if not max_samples else min(self.count, max_samples)
+        samples = []
+        # the rank of each sample among the observations, in order
+        ranks = iter([(position * self.count) // size for position in range(size)])
+        rank = next(ranks)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            value = self.value_for(index)
+            while rank < seen:
+                samples.append(value)
+                rank = next(ranks, self.count)
+
+        samples[-1] = self.max
+        return samples
+
+
+class RouteMetricsBuffer:
+    """
+    Aggregate route metrics and flush them on an interval.
+
+    """
+
+    def __init__(
+        self,
+        metrics,
+        flush_interval: float,
+        max_samples: int = DEFAULT_MAX_SAMPLES,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+    ):
+        self.metrics = metrics
+        self.flush_interval = flush_interval
+        self.max_samples = max_samples
+        self.relative_accuracy = relative_accuracy
+
+        self.counts: dict[tuple[str | None, str], int] = {}
+        # keyed on endpoint and phase, or `None` for the whole request
+        self.latencies: dict[tuple[str | None, str | None], LatencyHistogram] = {}
+        self.tags: dict[str | None, list[str]] = {}
+        self.extra_tags: dict[tuple[str | None, str], list[str]] = {}
+
+        self.task: Task | None = None
+        register(self.flush)
+
+    def record(
+        self,
+        endpoint: str | None,
+        classifier: str | None,
+        elapsed_ms: float | None,
+        phases: dict[str, float] | None = None,
+    ) -> None:
+        if self.task is None or self.task.done():
+            # start flushing from the loop serving requests
+            self.task = get_running_loop().create_task(self.run())
+
+        if classifier is not None:
+            key = (endpoint, classifier)
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+        if elapsed_ms:
+            self.add_latency(endpoint, None, elapsed_ms)
+
+        if phases:
+            for phase, phase_ms in phases.items():
+                if phase_ms > 0:
+                    self.add_latency(endpoint, phase, phase_ms)
+
+    def add_latency(self, endpoint: str | None, phase: str | None, elapsed_ms: float) -> None:
+        key = (endpoint, phase)
+        histogram = self.latencies.get(key)
+        if histogram is None:
+            histogram = self.latencies[key] = LatencyHistogram(self.relative_accuracy)
+        histogram.add(elapsed_ms)
+
+    def tags_for(self, endpoint: str | None) -> list[str]:
+        tags = self.tags.get(endpoint)
+        if tags is None:
+            tags = self.tags[endpoint] = [
+                f"endpoint:{endpoint}",
+                "backend_type:microcosm_fastapi",
+            ]
+        return tags
+
+    def extra_tags_for(self, endpoint: str | None, tag: str) -> list[str]:
+        key = (endpoint, tag)
+        tags = self.extra_tags.get(key)
+        if tags is None:
+            tags = self.extra_tags[key] = self.tags_for(endpoint) + [tag]
+        return tags
+
+    def flush(self) -> None:
+        counts, self.counts = self.counts, {}
+        latencies, self.latencies = self.latencies, {}
+
+        for (endpoint, classifier), count in counts.items():
+            self.metrics.increment(
+                name_for("route", "call", "count"),
+                value=count,
+                tags=self.extra_tags_for(endpoint, f"classifier:{classifier}"),
+            )
+
+        for (endpoint, phase), histogram in latencies.items():
+            if phase is None:
+                name, tags = name_for("route"), self.tags_for(endpoint)
+            else:
+                name, tags = name_for("route", "phase"), self.extra_tags_for(endpoint, f"phase:{phase}")
+
+            for value in histogram.samples(self.max_samples):
+                self.metrics.histogram(name, value, tags=tags)
+
+    async def run(self) -> None:
+        try:
+            while True:
+                await sleep(self.flush_interval)
+                self.flush()
+        except CancelledError:
+            self.flush()
+            raise
+
+    def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self.flush()
@@ -0,0 +1,209 @@
+"""
+Deferred message acknowledgement.
+
+Handling a message decides whether to delete it from the queue (ack) or to change its
+visibility so that it is retried (nack). Rather than calling SQS from the handling path,
+resolutions are collected and flushed together; when batched, with one
+`DeleteMessageBatch` and one `ChangeMessageVisibilityBatch` call per ten messages.
+
+Messages being handled can also be kept invisible for as long as they take, by
+periodically extending the visibility of those nearing their deadline.
+
+"""
+from asyncio import get_running_loop, sleep
+from copy import copy
+from time import time
+
+from microcosm_pubsub.message import SQSMessage
+from microcosm_pubsub.result import MessageHandlingResult
+
+
+Resolution = tuple[MessageHandlingResult, SQSMessage]
+
+# SQS acts on at most ten messages per batch request
+ACK_BATCH_SIZE = 10
+
+
+def chunks(entries: list[dict], size: int = ACK_BATCH_SIZE):
+    for index in range(0, len(entries), size):
+        yield entries[index:index + size]
+
+
+class RecordingSQSClient:
+    """
+    Record the acks and nacks of messages, rather than sending them to SQS.
+
+    Resolving messages against a consumer using this client keeps the consumer's own
+    rules (e.g. for backing off retries) while allowing the calls to be batched.
+
+    """
+
+    def __init__(self):
+        self.deletes: list[dict] = []
+        self.visibility_changes: list[dict] = []
+
+    def delete_message(self, ReceiptHandle, QueueUrl=None, **kwargs):
+        self.deletes.append(dict(
+            Id=str(len(self.deletes)),
+            ReceiptHandle=ReceiptHandle,
+        ))
+        return dict()
+
+    def change_message_visibility(self, ReceiptHandle, VisibilityTimeout, QueueUrl=None, **kwargs):
+        self.visibility_changes.append(dict(
+            Id=str(len(self.visibility_changes)),
+            ReceiptHandle=ReceiptHandle,
+            VisibilityTimeout=VisibilityTimeout,
+        ))
+        return dict()
+
+
+class AcknowledgementBuffer:
+    """
+    Message resolutions pending a flush to SQS.
+
+    """
+
+    def __init__(self, consumer, logger, batched: bool = False):
+        self.consumer = consumer
+        self.logger = logger
+        self.batched = batched
+        self.pending: list[Resolution] = []
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def add(self, instance: MessageHandlingResult, message: SQSMessage) -> None:
+        self.pending.append((instance, message))
+
+    def take(self) -> list[Resolution]:
+        pending, self.pending = self.pending, []
+        return pending
+
+    def flush(self, resolutions: list[Resolution]) -> None:
+        """
+        Resolve messages with SQS; blocks on the SQS client.
+
+        """
+        if not self.batched:
+            for instance, message in resolutions:
+                instance.resolve(message)
+            return
+
+        recorder = RecordingSQSClient()
+        consumer = copy(self.consumer)
+        consumer.sqs_client = recorder
+        for instance, message in resolutions:
+            message = copy(message)
+            message.consumer = consumer
+            instance.resolve(message)
+
+        for entries in chunks(recorder.deletes):
+            self.send(self.consumer.sqs_client.delete_message_batch, entries)
+        for entries in chunks(recorder.visibility_changes):
+            self.send(self.consumer.sqs_client.change_message_visibility_batch, entries)
+
+    def send(self, operation, entries: list[dict]) -> None:
+        try:
+            response = operation(QueueUrl=self.consumer.sqs_queue_url, Entries=entries)
+        except Exception:
+            # unresolved messages become visible again, and are retried
+            self.logger.warning("Failed to resolve messages", exc_info=True)
+            return
+
+        for failure in response.get("Failed", []):
+            self.logger.warning(
+                "Failed to resolve message: {code}: {message}".format(
+                    code=failure.get("Code"),
+                    message=failure.get("Message"),
+                ),
+            )
+
+
+class VisibilityHeartbeat:
+    """
+    Extend the visibility of received messages until they are resolved.
+
+    A message is tracked from when it is received, and its visibility extended by the
+    full timeout once less than half of it remains.
+
+    """
+
+    def __init__(self, consumer, logger, visibility_timeout: float, clock=time):
+        self.consumer = consumer
+        self.logger = logger
+        self.visibility_timeout = visibility_timeout
+        self.clock = clock
+        # deadlines of the tracked messages, by receipt handle
+        self.deadlines: dict[str, float] = {}
+
+    @property
+    def interval(self) -> float:
+        return self.visibility_timeout / 4
+
+    def track(self, messages: list[SQSMessage]) -> None:
+        deadline = self.clock() + self.visibility_timeout
+        for message in messages:
+            self.deadlines[message.receipt_handle] = deadline
+
+    def release(self, message: SQSMessage) -> None:
+        self.deadlines.pop(message.receipt_handle, None)
+
+    def due(self) -> list[str]:
+        threshold = self.clock() + self.visibility_timeout / 2
+        return [
+            receipt_handle
+            for receipt_handle, deadline in self.deadlines.items()
+            if deadline <= threshold
+        ]
+
+    def extend(self, receipt_handles: list[str]) -> list[str]:
+        """
+        Extend the visibility of messages, returning those extended; blocks on the SQS client.
+
+        """
+        entries = [
+            dict(
+                Id=str(index),
+                ReceiptHandle=receipt_handle,
+                VisibilityTimeout=self.visibility_timeout,
+            )
+            for index, receipt_handle in enumerate(receipt_handles)
+        ]
+        extended: list[str] = []
+        for batch in chunks(entries):
+            try:
+                response = self.consumer.sqs_client.change_message_visibility_batch(
+                    QueueUrl=self.consumer.sqs_queue_url,
+                    Entries=batch,
+                )
+            except Exception:
+                self.logger.warning("Failed to extend message visibility", exc_info=True)
+                continue
+
+            # failures are most likely for messages resolved in the meantime
+            failed = {failure["Id"] for failure in response.get("Failed", [])}
+            extended.extend(
+                entry["ReceiptHandle"]
+                for entry in batch
+                if entry["Id"] not in failed
+            )
+        return extended
+
+    async def run(self) -> None:
+        """
+        Extend visibilities until cancelled.
+
+        """
+        while True:
+            await sleep(self.interval)
+            receipt_handles = self.due()
+            if not receipt_handles:
+                continue
+
+            start = self.clock()
+            extended = await get_running_loop().run_in_executor(None, self.extend, receipt_handles)
+            for receipt_handle in extended:
+                # messages resolved while extending stay released
+                if receipt_handle in self.deadlines:
+                    self.deadlines[receipt_handle] = start + self.visibility_timeout
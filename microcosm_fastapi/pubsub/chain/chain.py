@@ -1,5 +1,3 @@
-from inspect import iscoroutinefunction
-
 from microcosm_pubsub.chain.chain import Chain
 
 from microcosm_fastapi.pubsub.chain.context_decorators import (
@@ -8,6 +6,7 @@ from microcosm_fastapi.pubsub.chain.context_decorators import (
     save_to_context_by_func_name_async,
     temporarily_replace_context_keys_async,
 )
+from microcosm_fastapi.pubsub.executors import call
 
 
 class ChainAsync(Chain):
@@ -15,8 +14,8 @@ class ChainAsync(Chain):
     Chain handler that works with both non-async and async methods
     that are chained together.
 
-    The __call__ contract is therefore an async coroutine but blocking/async performance
-    will mirror the underlying called functions.
+    The __call__ contract is therefore an async coroutine; non-async links are run in
+    a thread pool so that they do not block the event loop.
 
     """
 
@@ -47,10 +46,6 @@ class ChainAsync(Chain):
 
         for link in self.links:
             func = self.apply_decorators(context, link)
-
-            if iscoroutinefunction(func):
-                res = await func()
-            else:
-                res = func()
+            res = await call(func)
 
         return res
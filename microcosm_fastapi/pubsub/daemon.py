@@ -15,8 +15,18 @@ class ConsumerDaemonAsync(ConsumerDaemon):
     def __call__(self, graph):
         """
         Implement daemon by sinking messages from the consumer to a dispatcher function.
+
+        When pipelined, messages are consumed until the daemon is interrupted.
         """
-        results = graph.sqs_message_dispatcher_async.handle_batch(self.bound_handlers)
+        dispatcher = graph.sqs_message_dispatcher_async
+        if dispatcher.pipeline_enabled:
+            dispatcher.run_pipeline(
+                self.bound_handlers,
+                should_stop=lambda: graph.signal_handler.interrupted,
+            )
+            return
+
+        results = dispatcher.handle_batch(self.bound_handlers)
         if not results:
             raise SleepNow()
 
@@ -1,13 +1,26 @@
-from asyncio import gather
+from asyncio import (
+    AbstractEventLoop,
+    Semaphore,
+    gather,
+    get_running_loop,
+    new_event_loop,
+)
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from time import time
-from typing import Any
+from typing import AsyncIterator, Callable
 
 from microcosm.api import defaults, typed
+from microcosm.config.types import boolean
 from microcosm_logging.decorators import logger
 from microcosm_logging.timing import elapsed_time
 from microcosm_pubsub.dispatcher import SQSMessageDispatcher
 from microcosm_pubsub.result import MessageHandlingResultType
 
+from microcosm_fastapi.pubsub.acknowledgements import AcknowledgementBuffer, VisibilityHeartbeat
+from microcosm_fastapi.pubsub.executors import use_executors
+from microcosm_fastapi.pubsub.lanes import Lane, LaneScheduler
+from microcosm_fastapi.pubsub.pipeline import MessagePipeline
 from microcosm_fastapi.pubsub.result import MessageHandlingResultAsync
 
 
@@ -18,8 +31,32 @@ PUBLISHED_KEY = "X-Request-Published"
 @defaults(
     # Number of failed attempts after which the message stops being processed
     message_max_processing_attempts=typed(int, default_value=None),
-    # Quantity of messages to parse within the same runloop
+    # Maximum number of messages handled at the same time
     message_max_concurrent_operations=typed(int, default_value=5),
+    # Seconds after which handling a message fails (and the message is retried); unbounded when 0
+    message_timeout_seconds=typed(float, default_value=0.0),
+    # Receive messages ahead of handling them, and acknowledge them in batches
+    message_pipeline=typed(boolean, default_value=False),
+    # Maximum number of messages received ahead of handling, when pipelined
+    message_buffer_size=typed(int, default_value=20),
+    # Maximum seconds between flushes of message acknowledgements, when pipelined
+    message_ack_interval_seconds=typed(float, default_value=0.1),
+    # Seconds to finish handling received messages for, when a pipeline stops
+    message_drain_timeout_seconds=typed(float, default_value=30.0),
+    # Resolve messages with batch calls to SQS (ten messages per call)
+    message_batch_acknowledgements=typed(boolean, default_value=False),
+    # Extend the visibility of received messages until they are resolved
+    message_visibility_heartbeat=typed(boolean, default_value=False),
+    # Seconds received messages stay invisible for; should match the queue's visibility timeout
+    message_visibility_timeout_seconds=typed(int, default_value=30),
+    # Lanes of media types handled with their own concurrency cap and priority weight, by name, e.g.
+    #   slow=dict(media_types=[...], max_concurrent_operations=1, weight=1)
+    # Other media types share a default lane of weight 1.
+    message_lanes=dict(),
+    # Threads running synchronous handlers and chain links; the event loop's default pool when 0
+    message_thread_pool_size=typed(int, default_value=0),
+    # Processes running handlers marked as @cpu_bound; these run in threads when 0
+    message_process_pool_size=typed(int, default_value=0),
 )
 class SQSMessageDispatcherAsync(SQSMessageDispatcher):
     def __init__(self, graph):
@@ -31,27 +68,122 @@ class SQSMessageDispatcherAsync(SQSMessageDispatcher):
         self.max_concurrent_operations = (
             graph.config.sqs_message_dispatcher_async.message_max_concurrent_operations
         )
+        self.message_timeout_seconds = (
+            graph.config.sqs_message_dispatcher_async.message_timeout_seconds or None
+        )
+        self.pipeline_enabled = graph.config.sqs_message_dispatcher_async.message_pipeline
+        self.buffer_size = graph.config.sqs_message_dispatcher_async.message_buffer_size
+        self.ack_interval = graph.config.sqs_message_dispatcher_async.message_ack_interval_seconds
+        self.drain_timeout = graph.config.sqs_message_dispatcher_async.message_drain_timeout_seconds
+        self.batch_acknowledgements = (
+            graph.config.sqs_message_dispatcher_async.message_batch_acknowledgements
+        )
+        self.visibility_heartbeat = graph.config.sqs_message_dispatcher_async.message_visibility_heartbeat
+        self.visibility_timeout = (
+            graph.config.sqs_message_dispatcher_async.message_visibility_timeout_seconds
+        )
+
+        self.lanes = graph.config.sqs_message_dispatcher_async.message_lanes
+        self.thread_pool_size = graph.config.sqs_message_dispatcher_async.message_thread_pool_size
+        self.process_pool_size = graph.config.sqs_message_dispatcher_async.message_process_pool_size
+        self.thread_pool: Executor | None = None
+        self.process_pool: Executor | None = None
+
+        self.loop: AbstractEventLoop | None = None
+        self.semaphore: Semaphore | None = None
+        self.scheduler: LaneScheduler | None = None
+
+    def get_loop(self) -> AbstractEventLoop:
+        """
+        The event loop handling messages.
+
+        Created once and reused for every batch, so that state bound to the loop (e.g. a
+        handler's connection pool) outlives a batch.
+
+        """
+        if self.loop is None or self.loop.is_closed():
+            self.loop = new_event_loop()
+            # asyncio primitives are bound to the loop first using them
+            self.semaphore = None
+            self.scheduler = None
+        return self.loop
+
+    def close(self) -> None:
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+        for pool in (self.thread_pool, self.process_pool):
+            if pool is not None:
+                pool.shutdown()
+        self.thread_pool = self.process_pool = None
+
+    def get_thread_pool(self) -> Executor | None:
+        if self.thread_pool is None and self.thread_pool_size:
+            self.thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_pool_size,
+                thread_name_prefix="message-handler",
+            )
+        return self.thread_pool
+
+    def get_process_pool(self) -> Executor | None:
+        if self.process_pool is None and self.process_pool_size:
+            self.process_pool = ProcessPoolExecutor(max_workers=self.process_pool_size)
+        return self.process_pool
+
+    def create_acknowledgements(self) -> AcknowledgementBuffer:
+        return AcknowledgementBuffer(
+            self.sqs_consumer,
+            self.logger,
+            batched=self.batch_acknowledgements,
+        )
+
+    def create_heartbeat(self) -> VisibilityHeartbeat | None:
+        if not self.visibility_heartbeat:
+            return None
+        return VisibilityHeartbeat(
+            self.sqs_consumer,
+            self.logger,
+            visibility_timeout=self.visibility_timeout,
+        )
 
     def handle_batch(self, bound_handlers) -> list[MessageHandlingResultAsync]:
         """
         Send a batch of messages to a function.
         """
+        return self.get_loop().run_until_complete(self.handle_batch_async(bound_handlers))
+
+    async def handle_batch_async(self, bound_handlers) -> list[MessageHandlingResultAsync]:
         start_time = time()
 
-        instances = []
+        messages = self.sqs_consumer.consume()
+
+        heartbeat = self.create_heartbeat()
+        if heartbeat is not None:
+            heartbeat.track(messages)
+            beat = get_running_loop().create_task(heartbeat.run())
 
-        # Consume a batch size of messages specified in the configuration. This allows us to get some
-        # async speed gains without saturating the local daemon with trying to parse through the
-        # entire message queue.
+        # Every message of the batch is handled as soon as fewer than the maximum number of
+        # concurrent operations are in progress, so a slow message only holds up its own slot.
         #
         # We don't anticipate any exceptions from this gather() run because `self.handle_message` already
         # wraps the handler with an exhaustive try/catch
-        for message_batch in self.iter_batch(
-            self.sqs_consumer.consume(), self.max_concurrent_operations
-        ):
-            instances += gather(  # type: ignore
-                [self.handle_message(message, bound_handlers) for message in message_batch]
-            )
+        try:
+            instances = await gather(*(
+                self.handle_message_bounded(
+                    message,
+                    bound_handlers,
+                    resolve=not self.batch_acknowledgements,
+                    heartbeat=heartbeat,
+                )
+                for message in messages
+            ))
+        finally:
+            if heartbeat is not None:
+                beat.cancel()
+
+        if self.batch_acknowledgements:
+            acknowledgements = self.create_acknowledgements()
+            acknowledgements.flush(list(zip(instances, messages)))
 
         batch_elapsed_time = (time() - start_time) * 1000
 
@@ -78,11 +210,80 @@ class SQSMessageDispatcherAsync(SQSMessageDispatcher):
 
         return instances
 
-    async def handle_message(self, message, bound_handlers) -> MessageHandlingResultAsync:
+    def run_pipeline(self, bound_handlers, should_stop: Callable[[], bool]) -> MessagePipeline:
+        """
+        Receive and handle messages continuously, until `should_stop` returns true.
+
+        """
+        pipeline = MessagePipeline(
+            self,
+            bound_handlers,
+            buffer_size=self.buffer_size,
+            ack_interval=self.ack_interval,
+            drain_timeout=self.drain_timeout,
+        )
+        self.get_loop().run_until_complete(pipeline.run(should_stop))
+        return pipeline
+
+    async def handle_message_bounded(
+        self,
+        message,
+        bound_handlers,
+        resolve: bool = True,
+        heartbeat: VisibilityHeartbeat | None = None,
+    ) -> MessageHandlingResultAsync:
+        async with self.concurrency_slot(message):
+            instance = await self.handle_message(message, bound_handlers, resolve=resolve)
+
+        if heartbeat is not None:
+            heartbeat.release(message)
+        return instance
+
+    @asynccontextmanager
+    async def concurrency_slot(self, message) -> AsyncIterator[None]:
+        """
+        Wait until the message may be handled, within its lane's and the total concurrency.
+
+        """
+        if not self.lanes:
+            if self.semaphore is None:
+                self.semaphore = Semaphore(self.max_concurrent_operations)
+            async with self.semaphore:
+                yield
+            return
+
+        scheduler = self.get_scheduler()
+        lane = self.find_lane(message)
+        await scheduler.acquire(lane)
+        try:
+            yield
+        finally:
+            scheduler.release(lane)
+
+    def get_scheduler(self) -> LaneScheduler:
+        if self.scheduler is None:
+            metrics = self.send_metrics
+            self.scheduler = LaneScheduler.from_config(
+                self.lanes,
+                max_concurrent_operations=self.max_concurrent_operations,
+                metrics=metrics.metrics if metrics.enabled else None,
+            )
+        return self.scheduler
+
+    def find_lane(self, message) -> Lane:
+        return self.get_scheduler().find_lane(message.media_type)
+
+    async def handle_message(self, message, bound_handlers, resolve: bool = True) -> MessageHandlingResultAsync:
         """
         Handle a message.
+
+        Unless `resolve` is false, the message is then acked or nacked.
         """
-        with self.opaque.initialize(self.sqs_message_context, message):
+        with self.opaque.initialize(self.sqs_message_context, message), use_executors(
+            self.get_thread_pool(),
+            self.get_process_pool(),
+            opaque=dict(self.opaque),
+        ):
             handler = None
 
             start_handle_time = time()
@@ -93,7 +294,9 @@ class SQSMessageDispatcherAsync(SQSMessageDispatcher):
                     handler = self.find_handler(message, bound_handlers)
                     instance = await MessageHandlingResultAsync.invoke(
                         handler=self.wrap_handler(handler),
+                        wrapped=handler,
                         message=message,
+                        timeout=self.message_timeout_seconds,
                     )
                 except Exception as error:
                     instance = MessageHandlingResultAsync.from_error(
@@ -113,13 +316,10 @@ class SQSMessageDispatcherAsync(SQSMessageDispatcher):
                 sentry_config=self.sentry_config,
                 opaque=self.opaque,
             )
-            instance.resolve(message)
+            if resolve:
+                instance.resolve(message)
             return instance
 
-    def iter_batch(self, batch: list[Any], k: int):
-        for i in range(0, len(batch), k):
-            yield batch[i: i + k]
-
 
 def configure_sqs_message(graph):
     pass
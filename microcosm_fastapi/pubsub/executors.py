@@ -0,0 +1,134 @@
+"""
+Run synchronous handlers and chain links off the event loop.
+
+A synchronous callable run on the event loop blocks every other message in flight.
+Instead, it is run in a thread pool, with the caller's context variables, or (when
+marked as `cpu_bound` and a process pool is configured) in a process pool; the
+dispatcher sets which executors to use while handling a message.
+
+Note that a timed out call to a synchronous callable cannot be interrupted: its
+thread or process keeps running until it returns.
+
+"""
+from asyncio import get_running_loop
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import partial
+from inspect import isawaitable, iscoroutinefunction
+from typing import Any, Callable, Iterator
+from weakref import WeakKeyDictionary
+
+
+CPU_BOUND = "_cpu_bound"
+
+# The executors of the message being handled; the loop's default executor when None
+thread_executor: ContextVar[Executor | None] = ContextVar("thread_executor", default=None)
+process_executor: ContextVar[Executor | None] = ContextVar("process_executor", default=None)
+
+# The opaque data of the message being handled, readable from synchronous callables
+message_opaque: ContextVar[dict | None] = ContextVar("message_opaque", default=None)
+
+ASYNC_CALLABLES: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def cpu_bound(func):
+    """
+    Mark a handler as CPU bound, to be run in a process pool when one is configured.
+
+    The handler, its arguments and its result must be picklable.
+
+    """
+    setattr(func, CPU_BOUND, True)
+    return func
+
+
+def is_cpu_bound(func) -> bool:
+    return getattr(func, CPU_BOUND, False)
+
+
+def is_async_callable(func) -> bool:
+    """
+    Whether calling `func` returns a coroutine, cached per callable where possible.
+
+    """
+    try:
+        return ASYNC_CALLABLES[func]
+    except (KeyError, TypeError):
+        pass
+
+    unwrapped = func
+    while isinstance(unwrapped, partial):
+        unwrapped = unwrapped.func
+    result = iscoroutinefunction(unwrapped) or iscoroutinefunction(getattr(unwrapped, "__call__", None))
+
+    try:
+        ASYNC_CALLABLES[func] = result
+    except TypeError:
+        pass
+    return result
+
+
+@contextmanager
+def use_executors(
+    threads: Executor | None,
+    processes: Executor | None = None,
+    opaque: dict | None = None,
+) -> Iterator[None]:
+    tokens = [
+        (thread_executor, thread_executor.set(threads)),
+        (process_executor, process_executor.set(processes)),
+        (message_opaque, message_opaque.set(opaque)),
+    ]
+    try:
+        yield
+    finally:
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+
+
+async def run_sync(func: Callable, *args, **kwargs) -> Any:
+    """
+    Call a synchronous callable in the thread pool, with the current context.
+
+    """
+    context = copy_context()
+    return await get_running_loop().run_in_executor(
+        thread_executor.get(),
+        partial(context.run, func, *args, **kwargs),
+    )
+
+
+async def call(
+    func: Callable,
+    *args,
+    wrapped: Callable | None = None,
+    processes: bool = False,
+    **kwargs,
+) -> Any:
+    """
+    Call `func`, awaiting it when asynchronous and otherwise running it off the loop.
+
+    :param wrapped: the callable `func` wraps, if any; a synchronous wrapper (such as the
+        dispatcher's context logger) is asynchronous when what it wraps is
+    :param processes: run a CPU bound callable in the process pool, if any (unwrapped, and
+        without the current context, which cannot be passed to another process)
+
+    """
+    target = func if wrapped is None else wrapped
+    processes_executor = process_executor.get() if processes and is_cpu_bound(target) else None
+
+    if is_async_callable(target):
+        result = func(*args, **kwargs)
+    elif processes_executor is not None:
+        return await get_running_loop().run_in_executor(
+            processes_executor,
+            partial(target, *args, **kwargs),
+        )
+    else:
+        result = await run_sync(func, *args, **kwargs)
+
+    # NB: an undetected asynchronous callable still returns an awaitable
+    if isawaitable(result):
+        return await result
+    return result
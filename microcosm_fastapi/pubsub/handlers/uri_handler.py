@@ -1,11 +1,12 @@
 from abc import ABCMeta
-from inspect import iscoroutinefunction
 
 from httpx import get
 from microcosm_pubsub.errors import Nack
 from microcosm_pubsub.handlers.uri_handler import URIHandler
 from requests import codes
 
+from microcosm_fastapi.pubsub.executors import call
+
 
 class URIHandlerAsync(URIHandler, metaclass=ABCMeta):
     async def __call__(self, message):
@@ -17,13 +18,7 @@ class URIHandlerAsync(URIHandler, metaclass=ABCMeta):
             self.on_skip(message, uri, skip_reason)
             return False
 
-        resource = None
-
-        if iscoroutinefunction(self.get_resource):
-            resource = await self.get_resource(message, uri)
-        else:
-            resource = self.get_resource(message, uri)
-
+        resource = await call(self.get_resource, message, uri)
         resource = self.convert_resource(resource)
 
         if await self.handle(message, uri, resource):
@@ -0,0 +1,153 @@
+"""
+Concurrency lanes for message handling.
+
+Messages are routed by media type into lanes. Each lane may cap how many of its
+messages are handled at the same time, so that expensive or rate limited handlers
+can be throttled without holding up others; all lanes share the dispatcher's
+`message_max_concurrent_operations`.
+
+When messages of several lanes are waiting, freed slots are shared between lanes
+in proportion to their weights (with smooth weighted round robin), so that a burst
+in one lane does not starve the others.
+
+"""
+from asyncio import CancelledError, Future, get_running_loop
+from collections import deque
+from dataclasses import dataclass, field
+from time import perf_counter
+
+
+DEFAULT_LANE = "default"
+
+METRIC_TAGS = ["source:microcosm-pubsub"]
+
+
+@dataclass
+class Lane:
+    name: str
+    media_types: frozenset[str] = frozenset()
+    # unbounded (but for the total) when None
+    max_concurrent_operations: int | None = None
+    weight: int = 1
+
+    in_flight: int = 0
+    waiters: deque[Future] = field(default_factory=deque)
+    # smooth weighted round robin state
+    current_weight: int = 0
+
+    @property
+    def has_room(self) -> bool:
+        return self.max_concurrent_operations is None or self.in_flight < self.max_concurrent_operations
+
+    @classmethod
+    def from_config(cls, name: str, config) -> "Lane":
+        max_concurrent_operations = config.get("max_concurrent_operations")
+        return cls(
+            name=name,
+            media_types=frozenset(config.get("media_types", ())),
+            max_concurrent_operations=(
+                int(max_concurrent_operations) if max_concurrent_operations else None
+            ),
+            weight=int(config.get("weight", 1)),
+        )
+
+
+class LaneScheduler:
+    """
+    Start handling messages as lanes and the total concurrency allow.
+
+    """
+
+    def __init__(self, lanes: list[Lane], max_concurrent_operations: int, metrics=None):
+        self.max_concurrent_operations = max_concurrent_operations
+        self.metrics = metrics
+        self.in_flight = 0
+
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.lanes.setdefault(DEFAULT_LANE, Lane(name=DEFAULT_LANE))
+        self.lanes_by_media_type = {
+            media_type: lane
+            for lane in lanes
+            for media_type in lane.media_types
+        }
+
+    @classmethod
+    def from_config(cls, lanes_config, max_concurrent_operations: int, metrics=None) -> "LaneScheduler":
+        return cls(
+            lanes=[
+                Lane.from_config(name, lane_config)
+                for name, lane_config in lanes_config.items()
+            ],
+            max_concurrent_operations=max_concurrent_operations,
+            metrics=metrics,
+        )
+
+    def find_lane(self, media_type: str | None) -> Lane:
+        if media_type is None:
+            return self.lanes[DEFAULT_LANE]
+        return self.lanes_by_media_type.get(media_type, self.lanes[DEFAULT_LANE])
+
+    async def acquire(self, lane: Lane) -> None:
+        start = perf_counter()
+        if self.in_flight < self.max_concurrent_operations and lane.has_room and not lane.waiters:
+            self.start(lane)
+        else:
+            waiter = get_running_loop().create_future()
+            lane.waiters.append(waiter)
+            try:
+                await waiter
+            except CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # started just as the wait was cancelled
+                    self.release(lane)
+                else:
+                    lane.waiters.remove(waiter)
+                raise
+
+        self.histogram("message_lane_wait", (perf_counter() - start) * 1000, lane)
+
+    def release(self, lane: Lane) -> None:
+        lane.in_flight -= 1
+        self.in_flight -= 1
+        self.gauge("message_lane_in_flight", lane.in_flight, lane)
+        self.wake()
+
+    def start(self, lane: Lane) -> None:
+        lane.in_flight += 1
+        self.in_flight += 1
+        self.gauge("message_lane_in_flight", lane.in_flight, lane)
+
+    def wake(self) -> None:
+        while self.in_flight < self.max_concurrent_operations:
+            lane = self.choose()
+            if lane is None:
+                return
+            self.start(lane)
+            lane.waiters.popleft().set_result(None)
+
+    def choose(self) -> Lane | None:
+        """
+        Choose the next lane to start a message of, by smooth weighted round robin.
+
+        """
+        ready = [
+            lane
+            for lane in self.lanes.values()
+            if lane.waiters and lane.has_room
+        ]
+        if not ready:
+            return None
+
+        for lane in ready:
+            lane.current_weight += lane.weight
+        chosen = max(ready, key=lambda lane: lane.current_weight)
+        chosen.current_weight -= sum(lane.weight for lane in ready)
+        return chosen
+
+    def gauge(self, name: str, value: float, lane: Lane) -> None:
+        if self.metrics is not None:
+            self.metrics.gauge(name, value, tags=METRIC_TAGS + [f"lane:{lane.name}"])
+
+    def histogram(self, name: str, value: float, lane: Lane) -> None:
+        if self.metrics is not None:
+            self.metrics.histogram(name, value, tags=METRIC_TAGS + [f"lane:{lane.name}"])
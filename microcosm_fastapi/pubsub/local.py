@@ -0,0 +1,164 @@
+"""
+In-memory stand-in for an SQS queue.
+
+Implements the parts of the SQS client API used by the consumer, with visibility
+timeouts, receive counts and long polling, and counts API calls so that tests and
+benchmarks can assert on (and simulate the latency of) round trips to SQS.
+
+"""
+from collections import Counter
+from dataclasses import dataclass
+from json import dumps
+from threading import Lock
+from time import sleep, time
+from uuid import uuid4
+
+
+# Seconds between checks for visible messages while long polling
+LONG_POLL_INTERVAL = 0.01
+
+
+@dataclass
+class LocalSQSMessage:
+    message_id: str
+    body: str
+    receipt_handle: str | None = None
+    visible_at: float = 0.0
+    receive_count: int = 0
+
+
+class LocalSQSClient:
+    """
+    An SQS client serving a single queue from memory.
+
+    Safe to call from several threads, as when calls are run in an executor.
+
+    """
+
+    def __init__(self, visibility_timeout: float = 30.0, latency: float = 0.0, clock=time):
+        self.visibility_timeout = visibility_timeout
+        # seconds each API call blocks for, as a round trip to SQS would
+        self.latency = latency
+        self.clock = clock
+        self.messages: dict[str, LocalSQSMessage] = {}
+        self.calls: Counter[str] = Counter()
+        self.lock = Lock()
+
+    def call(self, name: str) -> None:
+        with self.lock:
+            self.calls[name] += 1
+        if self.latency:
+            sleep(self.latency)
+
+    def send_message(self, MessageBody, QueueUrl=None, **kwargs):
+        self.call("send_message")
+        message_id = str(uuid4())
+        with self.lock:
+            self.messages[message_id] = LocalSQSMessage(message_id=message_id, body=MessageBody)
+        return dict(MessageId=message_id)
+
+    def publish(self, media_type: str, **content) -> str:
+        """
+        Send a message as published over SNS, i.e. for the default envelope.
+
+        """
+        body = dumps(dict(Message=dumps(dict(mediaType=media_type, **content))))
+        return self.send_message(MessageBody=body)["MessageId"]
+
+    def receive_message(
+        self,
+        MaxNumberOfMessages=1,
+        VisibilityTimeout=None,
+        WaitTimeSeconds=0,
+        QueueUrl=None,
+        **kwargs,
+    ):
+        self.call("receive_message")
+        deadline = self.clock() + WaitTimeSeconds
+        while True:
+            with self.lock:
+                received = self.receive(MaxNumberOfMessages, VisibilityTimeout)
+            if received or self.clock() >= deadline:
+                return dict(Messages=received)
+            sleep(LONG_POLL_INTERVAL)
+
+    def receive(self, max_messages, visibility_timeout):
+        now = self.clock()
+        received = []
+        for message in self.messages.values():
+            if len(received) >= max_messages:
+                break
+            if message.visible_at > now:
+                continue
+
+            message.receipt_handle = str(uuid4())
+            message.receive_count += 1
+            message.visible_at = now + (
+                self.visibility_timeout if visibility_timeout is None else visibility_timeout
+            )
+            received.append(dict(
+                MessageId=message.message_id,
+                ReceiptHandle=message.receipt_handle,
+                Body=message.body,
+                Attributes=dict(ApproximateReceiveCount=str(message.receive_count)),
+            ))
+        return received
+
+    def find(self, receipt_handle: str) -> LocalSQSMessage | None:
+        for message in self.messages.values():
+            if message.receipt_handle == receipt_handle:
+                return message
+        return None
+
+    def delete(self, receipt_handle: str) -> None:
+        with self.lock:
+            message = self.find(receipt_handle)
+            if message is not None:
+                del self.messages[message.message_id]
+
+    def change_visibility(self, receipt_handle: str, visibility_timeout: float) -> bool:
+        with self.lock:
+            message = self.find(receipt_handle)
+            if message is None:
+                return False
+            message.visible_at = self.clock() + visibility_timeout
+            return True
+
+    def delete_message(self, ReceiptHandle, QueueUrl=None):
+        self.call("delete_message")
+        self.delete(ReceiptHandle)
+        return dict()
+
+    def delete_message_batch(self, Entries, QueueUrl=None):
+        self.call("delete_message_batch")
+        for entry in Entries:
+            self.delete(entry["ReceiptHandle"])
+        return dict(
+            Successful=[dict(Id=entry["Id"]) for entry in Entries],
+            Failed=[],
+        )
+
+    def change_message_visibility(self, ReceiptHandle, VisibilityTimeout, QueueUrl=None):
+        self.call("change_message_visibility")
+        self.change_visibility(ReceiptHandle, VisibilityTimeout)
+        return dict()
+
+    def change_message_visibility_batch(self, Entries, QueueUrl=None):
+        """
+        Unlike a single change, fail for messages no longer on the queue (as SQS does once
+        a message is deleted).
+
+        """
+        self.call("change_message_visibility_batch")
+        successful, failed = [], []
+        for entry in Entries:
+            if self.change_visibility(entry["ReceiptHandle"], entry["VisibilityTimeout"]):
+                successful.append(dict(Id=entry["Id"]))
+            else:
+                failed.append(dict(
+                    Id=entry["Id"],
+                    SenderFault=True,
+                    Code="ReceiptHandleIsInvalid",
+                    Message="The receipt handle is not valid.",
+                ))
+        return dict(Successful=successful, Failed=failed)
@@ -0,0 +1,197 @@
+"""
+Pipelined message consumption.
+
+Receiving, handling and acknowledging messages run concurrently on the dispatcher's
+event loop, so that handlers stay busy across receives:
+
+ - a poller receives messages ahead of the workers into a bounded buffer, and stops
+   receiving while the buffer has no room for another full receive
+ - workers handle buffered messages, `message_max_concurrent_operations` at a time; with
+   lanes, enough workers take messages from the buffer for every lane to be kept busy,
+   and wait for their lane's turn
+ - resolutions are collected and flushed to SQS together, off the workers' path
+ - when enabled, a heartbeat extends the visibility of messages until they are resolved
+
+Calls to SQS block, so run in the loop's default executor.
+
+When stopped, the poller stops receiving, the workers handle the messages already
+received (for up to the drain timeout) and pending resolutions are flushed. Messages
+not handled in time are left to become visible again.
+
+"""
+from asyncio import (
+    Event,
+    Queue,
+    Task,
+    gather,
+    get_running_loop,
+    timeout,
+    wait,
+)
+from time import perf_counter
+from typing import Callable
+
+from microcosm_pubsub.message import SQSMessage
+
+from microcosm_fastapi.pubsub.acknowledgements import ACK_BATCH_SIZE
+
+
+# Seconds between checks of whether to stop, while the buffer is full
+STOP_CHECK_INTERVAL = 1.0
+
+METRIC_TAGS = ["source:microcosm-pubsub"]
+
+
+class MessagePipeline:
+    """
+    Receive, handle and acknowledge messages concurrently.
+
+    """
+
+    def __init__(
+        self,
+        dispatcher,
+        bound_handlers,
+        buffer_size: int,
+        ack_interval: float,
+        drain_timeout: float,
+    ):
+        self.dispatcher = dispatcher
+        self.bound_handlers = bound_handlers
+        self.consumer = dispatcher.sqs_consumer
+        # always leave room for a full receive
+        self.buffer_size = max(buffer_size, self.consumer.limit)
+        self.ack_interval = ack_interval
+        self.drain_timeout = drain_timeout
+
+        metrics = dispatcher.send_metrics
+        self.metrics = metrics.metrics if metrics.enabled else None
+
+        self.buffer: Queue[SQSMessage | None] = Queue()
+        self.room = Event()
+        self.acknowledgements = dispatcher.create_acknowledgements()
+        self.heartbeat = dispatcher.create_heartbeat()
+        self.acknowledgements_ready = Event()
+        self.stopping = Event()
+
+        # totals, in seconds, of time spent waiting for room in the buffer and for messages
+        self.poller_idle_time = 0.0
+        self.worker_idle_time = 0.0
+
+    @property
+    def worker_count(self) -> int:
+        if self.dispatcher.lanes:
+            return self.dispatcher.max_concurrent_operations + self.buffer_size
+        return self.dispatcher.max_concurrent_operations
+
+    def has_room(self) -> bool:
+        return self.buffer.qsize() + self.consumer.limit <= self.buffer_size
+
+    async def run(self, should_stop: Callable[[], bool]) -> None:
+        workers = [
+            get_running_loop().create_task(self.work())
+            for _ in range(self.worker_count)
+        ]
+        acknowledger = get_running_loop().create_task(self.acknowledge())
+        heartbeat = (
+            get_running_loop().create_task(self.heartbeat.run())
+            if self.heartbeat is not None
+            else None
+        )
+        try:
+            await self.poll(should_stop)
+        finally:
+            await self.drain(workers, acknowledger, heartbeat)
+
+    async def poll(self, should_stop: Callable[[], bool]) -> None:
+        loop = get_running_loop()
+        while not should_stop():
+            if not self.has_room():
+                start = perf_counter()
+                self.room.clear()
+                try:
+                    async with timeout(STOP_CHECK_INTERVAL):
+                        await self.room.wait()
+                except TimeoutError:
+                    pass
+                idle_time = perf_counter() - start
+                self.poller_idle_time += idle_time
+                self.histogram("message_poller_idle", idle_time * 1000)
+                continue
+
+            messages = await loop.run_in_executor(None, self.consumer.consume)
+            if self.heartbeat is not None:
+                self.heartbeat.track(messages)
+            for message in messages:
+                self.buffer.put_nowait(message)
+            self.gauge("message_buffer_size", self.buffer.qsize())
+
+    async def work(self) -> None:
+        while True:
+            start = perf_counter()
+            message = await self.buffer.get()
+            idle_time = perf_counter() - start
+            self.worker_idle_time += idle_time
+            self.histogram("message_worker_idle", idle_time * 1000)
+            if self.has_room():
+                self.room.set()
+            if message is None:
+                return
+
+            instance = await self.dispatcher.handle_message_bounded(
+                message,
+                self.bound_handlers,
+                resolve=False,
+            )
+            self.acknowledgements.add(instance, message)
+            if self.heartbeat is not None:
+                self.heartbeat.release(message)
+            if len(self.acknowledgements) >= ACK_BATCH_SIZE:
+                self.acknowledgements_ready.set()
+            self.dispatcher.send_metrics(instance)
+
+    async def acknowledge(self) -> None:
+        """
+        Flush resolutions as a batch fills up or the interval passes, until stopping.
+
+        """
+        while not self.stopping.is_set():
+            try:
+                async with timeout(self.ack_interval):
+                    await self.acknowledgements_ready.wait()
+            except TimeoutError:
+                pass
+            self.acknowledgements_ready.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        resolutions = self.acknowledgements.take()
+        if resolutions:
+            await get_running_loop().run_in_executor(None, self.acknowledgements.flush, resolutions)
+
+    async def drain(self, workers: list[Task], acknowledger: Task, heartbeat: Task | None) -> None:
+        for _ in workers:
+            self.buffer.put_nowait(None)
+
+        _, unfinished = await wait(workers, timeout=self.drain_timeout)
+        cancelled = list(unfinished)
+        if heartbeat is not None:
+            cancelled.append(heartbeat)
+        for task in cancelled:
+            task.cancel()
+        await gather(*cancelled, return_exceptions=True)
+
+        # NB: the acknowledger is stopped rather than cancelled, finishing its last flush
+        self.stopping.set()
+        self.acknowledgements_ready.set()
+        await acknowledger
+
+        await self.flush()
+
+    def gauge(self, name: str, value: float) -> None:
+        if self.metrics is not None:
+            self.metrics.gauge(name, value, tags=METRIC_TAGS)
+
+    def histogram(self, name: str, value: float) -> None:
+        if self.metrics is not None:
+            self.metrics.histogram(name, value, tags=METRIC_TAGS)
@@ -1,15 +1,33 @@
+from asyncio import wait_for
 from dataclasses import dataclass
 
 from microcosm_pubsub.message import SQSMessage
 from microcosm_pubsub.result import MessageHandlingResult
 
+from microcosm_fastapi.pubsub.executors import call
+
 
 @dataclass
 class MessageHandlingResultAsync(MessageHandlingResult):
     @classmethod
-    async def invoke(cls, handler, message: SQSMessage):
+    async def invoke(
+        cls,
+        handler,
+        message: SQSMessage,
+        timeout: float | None = None,
+        wrapped=None,
+    ):
+        """
+        Invoke a handler; synchronous handlers are run off the event loop.
+
+        :param wrapped: the handler that `handler` wraps, if any, e.g. with a context logger
+
+        """
         try:
-            success = await handler(message.content)
+            success = await wait_for(
+                call(handler, message.content, wrapped=wrapped, processes=True),
+                timeout,
+            )
             return cls.from_result(message, bool(success))
         except Exception as error:
             return cls.from_error(message, error)
@@ -12,13 +12,19 @@ from makefun import wraps
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from microcosm_fastapi.database.loader import enable_batched_retrieves
+from microcosm_fastapi.timing import HANDLER, SESSION, timed
+
 
 SESSION_PARAMETER_NAME = "db_session"
 
 
 @asynccontextmanager
 async def get_session(graph):
-    session: AsyncSession = graph.session_maker_async()
+    # Retrieves by primary key issued concurrently within a request share one query,
+    # for stores with `batch_retrieves`
+    with timed(SESSION):
+        session: AsyncSession = enable_batched_retrieves(graph.session_maker_async())
     try:
         yield session
         await session.commit()
@@ -67,7 +73,8 @@ def configure_session_injection(graph):
 
         @wraps(fn, new_sig=new_sig)
         async def decorator(*args, **kwargs):
-            return await fn(*args, **kwargs)
+            with timed(HANDLER):
+                return await fn(*args, **kwargs)
 
         return decorator
 
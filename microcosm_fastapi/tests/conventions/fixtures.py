@@ -1,9 +1,12 @@
 from copy import copy
 from uuid import UUID, uuid4
 
+from fastapi import Depends
 from microcosm_postgres.errors import ModelNotFoundError
 
-from microcosm_fastapi.conventions.schemas import BaseSchema, SearchSchema
+from microcosm_fastapi.conventions.parsers import CursorLinkProvider
+from microcosm_fastapi.conventions.schemas import BaseSchema, CursorSearchSchema, SearchSchema
+from microcosm_fastapi.database.pagination import encode_cursor
 
 
 PERSON_ID_1 = uuid4()
@@ -59,6 +62,27 @@ async def person_search(offset: int = 0, limit: int = 20) -> SearchSchema(Person
     return payload
 
 
+async def person_search_after(
+    limit: int = 20,
+    cursor: str | None = None,
+    link_provider=Depends(CursorLinkProvider),
+) -> CursorSearchSchema(PersonSchema):  # type: ignore
+    people = [PERSON_1, PERSON_2, PERSON_3]
+    if cursor is not None:
+        cursors = [encode_cursor([person.id]) for person in people]
+        people = people[cursors.index(cursor) + 1:]
+
+    next_cursor = encode_cursor([people[limit - 1].id]) if len(people) > limit else None
+
+    payload = dict(
+        items=people[:limit],
+        cursor=cursor,
+        limit=limit,
+        _links=link_provider(next_cursor),
+    )
+    return payload
+
+
 async def person_retrieve(person_id: UUID) -> PersonSchema:
     if person_id == PERSON_ID_1:
         return PERSON_1.to_dict()
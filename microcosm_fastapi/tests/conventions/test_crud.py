@@ -5,7 +5,9 @@ from hamcrest import (
     assert_that,
     equal_to,
     has_entries,
+    has_key,
     is_,
+    is_not,
 )
 
 from microcosm_fastapi.conventions.crud import configure_crud
@@ -15,11 +17,13 @@ from microcosm_fastapi.tests.conventions.fixtures import (
     PERSON_1,
     PERSON_ID_1,
     PERSON_ID_2,
+    PERSON_ID_3,
     Person,
     person_create,
     person_delete,
     person_retrieve,
     person_search,
+    person_search_after,
     person_update,
 )
 
@@ -142,3 +146,31 @@ class TestCRUD:
 
         response = await client.delete(uri)
         assert_that(response.status_code, is_(equal_to(204)))
+
+
+class TestCursorSearch:
+    @pytest.fixture
+    def base_fixture(self, test_graph):
+        person_ns = Namespace(subject=Person, version="v1")
+        configure_crud(test_graph, person_ns, {Operation.Search: person_search_after})
+        sn = SimpleNamespace(
+            base_url="/api/v1/person",
+        )
+        return sn
+
+    @pytest.mark.asyncio
+    async def test_search_walks_cursor_links(self, client, test_graph, base_fixture):
+        response = await client.get(f"{base_fixture.base_url}?limit=1")
+        assert_that(response.status_code, is_(equal_to(200)))
+        assert_that(response.json(), has_entries(cursor=None, limit=1))
+        assert_that(response.json()["items"][0], has_entries(id=str(PERSON_ID_1)))
+        assert_that(response.json()["_links"], is_not(has_key("prev")))
+
+        response = await client.get(response.json()["_links"]["next"]["href"])
+        assert_that(response.status_code, is_(equal_to(200)))
+        assert_that(response.json()["items"][0], has_entries(id=str(PERSON_ID_2)))
+
+        response = await client.get(response.json()["_links"]["next"]["href"])
+        assert_that(response.status_code, is_(equal_to(200)))
+        assert_that(response.json()["items"][0], has_entries(id=str(PERSON_ID_3)))
+        assert_that(response.json()["_links"], is_not(has_key("next")))
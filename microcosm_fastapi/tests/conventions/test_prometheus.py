@@ -0,0 +1,101 @@
+"""
+Prometheus convention tests.
+
+"""
+import pytest
+from hamcrest import (
+    assert_that,
+    contains_string,
+    equal_to,
+    is_,
+    not_,
+)
+
+from microcosm_fastapi.conventions.prometheus.models import MetricsRegistry, MultiProcessStore
+from microcosm_fastapi.logging_data_map import LoggingInfo
+
+
+# no process has this pid
+EXITED_PID = 2 ** 22 + 1
+
+
+def test_to_text():
+    registry = MetricsRegistry(buckets=(10.0, 100.0))
+    registry.increment("route.call.count", tags=["endpoint:pizza.search.v1", "classifier:2xx"])
+    registry.increment("route.call.count", tags=["endpoint:pizza.search.v1", "classifier:2xx"])
+    registry.gauge("postgres.pool.checked_out", 3, tags=["engine:primary"])
+    registry.histogram("route", 5.0, tags=["endpoint:pizza.search.v1"])
+    registry.histogram("route", 50.0, tags=["endpoint:pizza.search.v1"])
+    registry.histogram("route", 500.0, tags=["endpoint:pizza.search.v1"])
+
+    assert_that(registry.to_text(), is_(equal_to("\n".join([
+        "# TYPE route_call_count_total counter",
+        'route_call_count_total{endpoint="pizza.search.v1",classifier="2xx"} 2.0',
+        "# TYPE postgres_pool_checked_out gauge",
+        'postgres_pool_checked_out{engine="primary"} 3.0',
+        "# TYPE route histogram",
+        'route_bucket{endpoint="pizza.search.v1",le="10.0"} 1',
+        'route_bucket{endpoint="pizza.search.v1",le="100.0"} 2',
+        'route_bucket{endpoint="pizza.search.v1",le="+Inf"} 3',
+        'route_sum{endpoint="pizza.search.v1"} 555.0',
+        'route_count{endpoint="pizza.search.v1"} 3',
+    ]) + "\n")))
+
+
+def test_multiprocess_aggregation(tmp_path):
+    exited = MetricsRegistry()
+    exited.increment("consumed", 2)
+    exited.gauge("in_flight", 5)
+    exited.histogram("route", 3.0)
+    MultiProcessStore(str(tmp_path), exited, interval=1, pid=EXITED_PID).write()
+
+    registry = MetricsRegistry()
+    registry.increment("consumed", 1)
+    registry.gauge("in_flight", 1)
+    registry.histogram("route", 30.0)
+    store = MultiProcessStore(str(tmp_path), registry, interval=1)
+
+    aggregate = store.collect()
+    assert_that(aggregate.counters, is_(equal_to({("consumed", ()): 3})))
+    # gauges of exited workers are dropped
+    assert_that(aggregate.gauges, is_(equal_to({("in_flight", ()): 1})))
+    assert_that(aggregate.histograms[("route", ())][-2:], is_(equal_to([0, 33.0])))
+
+
+def test_restarted_pid_keeps_counters(tmp_path):
+    previous = MetricsRegistry()
+    previous.increment("consumed", 2)
+    MultiProcessStore(str(tmp_path), previous, interval=1, pid=EXITED_PID).write()
+
+    registry = MetricsRegistry()
+    MultiProcessStore(str(tmp_path), registry, interval=1, pid=EXITED_PID)
+
+    assert_that(registry.counters, is_(equal_to({("consumed", ()): 2})))
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client, test_graph):
+    test_graph.use("prometheus_convention", "audit_middleware", "route_metrics")
+
+    @test_graph.app.get("/api/v1/ping/{ping_id}")
+    async def ping_retrieve(ping_id: str):
+        return dict(id=ping_id)
+
+    test_graph.logging_data_map.add_path(
+        "/api/v1/ping/{ping_id}",
+        "GET",
+        LoggingInfo("ping.retrieve", "ping_retrieve"),
+    )
+
+    await client.get("/api/v1/ping/1")
+    response = await client.get("/metrics")
+
+    assert_that(response.status_code, is_(equal_to(200)))
+    assert_that(response.headers["content-type"], contains_string("text/plain"))
+    assert_that(response.text, contains_string(
+        'route_call_count_total{endpoint="ping.retrieve",'
+        'backend_type="microcosm_fastapi",classifier="2xx"} 1.0',
+    ))
+    assert_that(response.text, contains_string('route_count{endpoint="ping.retrieve"'))
+    # scrapes are not audited
+    assert_that(response.text, not_(contains_string("endpoint=\"None\"")))
@@ -0,0 +1,112 @@
+from unittest.mock import Mock
+
+from hamcrest import (
+    assert_that,
+    equal_to,
+    is_,
+    none,
+)
+from microcosm_postgres.identifiers import new_object_id
+from microcosm_postgres.models import EntityMixin, Model
+from sqlalchemy import Column, String
+from sqlalchemy.inspection import inspect
+
+from microcosm_fastapi.database.cache import (
+    DEFAULT_RETRIEVE_CACHE_SIZE,
+    LRUCacheBackend,
+    RetrieveCache,
+)
+from microcosm_fastapi.database.store import StoreAsync
+
+
+class Sauce(EntityMixin, Model):
+    __tablename__ = "test_cache_sauce"
+
+    name = Column(String(), nullable=False)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCacheBackend:
+    def test_evicts_least_recently_used(self):
+        backend = LRUCacheBackend(maxsize=2)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)
+
+        assert_that(backend.get("b"), is_(none()))
+        assert_that((backend.get("a"), backend.get("c")), is_(equal_to((1, 3))))
+
+    def test_expires_entries(self):
+        clock = Clock()
+        backend = LRUCacheBackend(clock=clock)
+        backend.set("a", 1, ttl=10)
+
+        clock.now = 9.0
+        assert_that(backend.get("a"), is_(equal_to(1)))
+
+        clock.now = 10.0
+        assert_that(backend.get("a"), is_(none()))
+
+
+class TestRetrieveCache:
+    def setup_method(self):
+        self.metrics = Mock()
+        self.cache = RetrieveCache("Sauce", LRUCacheBackend(), metrics=self.metrics)
+
+    def test_records_hits_and_misses(self):
+        self.cache.get("a")
+        self.cache.set("a", dict(name="tomato"), self.cache.ticket())
+
+        assert_that(self.cache.get("a"), is_(equal_to(dict(name="tomato"))))
+        assert_that(self.cache.hit_rate, is_(equal_to(0.5)))
+        self.metrics.increment.assert_called_with(
+            "store.retrieve_cache",
+            tags=["result:hit", "model_name:Sauce"],
+        )
+
+    def test_ignores_reads_that_race_an_invalidation(self):
+        ticket = self.cache.ticket()
+        self.cache.invalidate(["a"])
+        self.cache.set("a", dict(name="tomato"), ticket)
+
+        assert_that(self.cache.get("a"), is_(none()))
+
+        self.cache.set("a", dict(name="tomato"), self.cache.ticket())
+        assert_that(self.cache.get("a"), is_(equal_to(dict(name="tomato"))))
+
+    def test_ignores_reads_that_race_a_forgotten_invalidation(self):
+        ticket = self.cache.ticket()
+        self.cache.invalidate(["a"])
+        # Enough other writes to forget when "a" was invalidated
+        self.cache.invalidate(range(DEFAULT_RETRIEVE_CACHE_SIZE))
+        self.cache.set("a", dict(name="tomato"), ticket)
+
+        assert_that(self.cache.get("a"), is_(none()))
+
+        self.cache.set("a", dict(name="tomato"), self.cache.ticket())
+        assert_that(self.cache.get("a"), is_(equal_to(dict(name="tomato"))))
+
+
+class TestStoreRetrieveCache:
+    def test_disabled_by_default(self):
+        store = StoreAsync(None, Sauce)
+
+        assert_that(store.retrieve_cache, is_(none()))
+
+    def test_round_trips_detached_instances(self):
+        store = StoreAsync(None, Sauce, retrieve_cache_backend=LRUCacheBackend())
+        sauce = Sauce(id=new_object_id(), name="tomato")
+
+        instance = store._from_cached_values(store._to_cached_values(sauce))
+
+        assert_that(instance.id, is_(equal_to(sauce.id)))
+        assert_that(instance.name, is_(equal_to("tomato")))
+        assert_that(inspect(instance).detached, is_(equal_to(True)))
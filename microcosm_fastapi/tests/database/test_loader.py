@@ -0,0 +1,68 @@
+from asyncio import gather
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+from hamcrest import (
+    assert_that,
+    equal_to,
+    instance_of,
+    is_,
+    none,
+)
+from microcosm_postgres.errors import ModelNotFoundError
+
+from microcosm_fastapi.database.loader import enable_batched_retrieves, loader_for
+
+
+class FakeStore:
+    model_name = "Topping"
+    batch_retrieves = True
+
+    def __init__(self, *identifiers):
+        self.rows = {identifier: SimpleNamespace(id=identifier) for identifier in identifiers}
+        self.calls = []
+
+    async def retrieve_many(self, identifiers, session=None):
+        self.calls.append(identifiers)
+        return [self.rows[identifier] for identifier in identifiers if identifier in self.rows]
+
+
+class TestRetrieveLoader:
+    def setup_method(self):
+        self.store = FakeStore("a", "b")
+        self.session = Mock(sync_session=SimpleNamespace(info={}))
+
+    def test_disabled_by_default(self):
+        assert_that(loader_for(self.store, self.session), is_(none()))
+        assert_that(loader_for(self.store, None), is_(none()))
+
+    def test_disabled_for_stores_not_opting_in(self):
+        self.store.batch_retrieves = False
+
+        assert_that(loader_for(self.store, enable_batched_retrieves(self.session)), is_(none()))
+
+    @pytest.mark.asyncio
+    async def test_coalesces_retrieves(self):
+        loader = loader_for(self.store, enable_batched_retrieves(self.session))
+
+        results = await gather(
+            loader.load("a"),
+            loader.load("b"),
+            loader.load("a"),
+            loader.load("c"),
+            return_exceptions=True,
+        )
+
+        assert_that(self.store.calls, is_(equal_to([["a", "b", "c"]])))
+        assert_that([result.id for result in results[:3]], is_(equal_to(["a", "b", "a"])))
+        assert_that(results[3], is_(instance_of(ModelNotFoundError)))
+
+    @pytest.mark.asyncio
+    async def test_separate_ticks_are_separate_batches(self):
+        loader = loader_for(self.store, enable_batched_retrieves(self.session))
+
+        await loader.load("a")
+        await loader.load("b")
+
+        assert_that(self.store.calls, is_(equal_to([["a"], ["b"]])))
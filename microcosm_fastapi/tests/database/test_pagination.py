@@ -0,0 +1,35 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from dateutil.tz import tzutc
+from hamcrest import assert_that, equal_to, is_
+from microcosm_postgres.models import UTCDateTime
+from sqlalchemy import Column, Integer
+from sqlalchemy_utils import UUIDType
+
+from microcosm_fastapi.database.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+
+CREATED_AT = Column("created_at", UTCDateTime)
+ID = Column("id", UUIDType())
+RANK = Column("rank", Integer)
+
+
+class TestPagination:
+    def test_round_trip(self):
+        values = [datetime(2022, 1, 24, 12, 30, tzinfo=tzutc()), uuid4(), 3]
+
+        cursor = encode_cursor(values)
+
+        assert_that("=" in cursor, is_(equal_to(False)))
+        assert_that(decode_cursor(cursor, [CREATED_AT, ID, RANK]), is_(equal_to(values)))
+
+    @pytest.mark.parametrize("cursor", [
+        "not a cursor",
+        encode_cursor([1]),
+        encode_cursor(["2022-01-24", "not-a-uuid"]),
+    ])
+    def test_invalid_cursor(self, cursor):
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor, [CREATED_AT, ID])
@@ -0,0 +1,129 @@
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+from hamcrest import (
+    assert_that,
+    contains_string,
+    equal_to,
+    instance_of,
+    is_,
+)
+from microcosm.api import create_object_graph
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util import greenlet_spawn
+
+from microcosm_fastapi.database.health import check_pool
+from microcosm_fastapi.database.pool import (
+    CHECKOUT_WAIT,
+    InstrumentedAsyncAdaptedQueuePool,
+    PoolInstrumentation,
+    instrumentation_for,
+)
+
+
+class TestPoolInstrumentation:
+    def setup_method(self):
+        self.graph = create_object_graph("test", testing=True)
+        self.metrics = Mock()
+        self.instrumentation = PoolInstrumentation(
+            self.graph.postgres_async,
+            "primary",
+            metrics=self.metrics,
+        )
+
+    def test_uses_instrumented_pool(self):
+        assert_that(
+            self.graph.postgres_async.sync_engine.pool,
+            is_(instance_of(InstrumentedAsyncAdaptedQueuePool)),
+        )
+        assert_that(instrumentation_for(self.graph.postgres_async).name, is_(equal_to("primary")))
+
+    def test_records_checkout_wait(self):
+        record = SimpleNamespace(info={CHECKOUT_WAIT: 0.25})
+
+        self.instrumentation.on_checkout(None, record, None)
+
+        assert_that(record.info, is_(equal_to(dict())))
+        assert_that(self.instrumentation.checkout_wait.max, is_(equal_to(0.25)))
+        self.metrics.histogram.assert_called_once_with(
+            "postgres.pool.checkout_wait",
+            250.0,
+            tags=["engine:primary"],
+        )
+        self.metrics.gauge.assert_any_call("postgres.pool.checked_out", 0, tags=["engine:primary"])
+
+    def test_samples_usage(self):
+        for _ in range(3):
+            self.instrumentation.on_checkin(None, None)
+
+        self.metrics.gauge.assert_any_call("postgres.pool.checked_out", 0, tags=["engine:primary"])
+        assert_that(self.metrics.gauge.call_count, is_(equal_to(2)))
+
+    def test_counts_checkout_timeouts(self):
+        pool = self.graph.postgres_async.sync_engine.pool
+        pool.on_checkout_timeout = self.instrumentation.on_checkout_timeout
+
+        with patch.object(AsyncAdaptedQueuePool, "_do_get", side_effect=PoolTimeoutError("pool exhausted")):
+            with pytest.raises(PoolTimeoutError):
+                pool._do_get()
+
+        assert_that(self.instrumentation.checkout_timeouts, is_(equal_to(1)))
+        self.metrics.increment.assert_called_once_with(
+            "postgres.pool.checkout_timeout",
+            tags=["engine:primary"],
+        )
+
+    def test_counts_invalidations(self):
+        self.instrumentation.on_invalidate(None, None, None)
+
+        assert_that(self.instrumentation.invalidations, is_(equal_to(1)))
+        self.metrics.increment.assert_called_once_with(
+            "postgres.pool.invalidate",
+            tags=["engine:primary"],
+        )
+
+    def test_check_pool(self):
+        assert_that(check_pool(self.graph), contains_string("primary: checked_out=0"))
+
+
+class TestInstrumentedPool:
+    """
+    Check out connections of a real pool, as the instrumentation hooks into pool internals
+    (`_do_get` and `Dialect.do_ping`) that may change with SQLAlchemy.
+
+    """
+
+    def setup_method(self):
+        self.graph = create_object_graph("test", testing=True)
+        engine = self.graph.postgres_async.sync_engine
+        self.pool = engine.pool = InstrumentedAsyncAdaptedQueuePool(
+            creator=Mock,
+            pool_size=1,
+            max_overflow=0,
+            timeout=0.01,
+            pre_ping=True,
+            dialect=engine.dialect,
+        )
+        self.instrumentation = PoolInstrumentation(self.graph.postgres_async, "primary").instrument()
+
+    @pytest.mark.asyncio
+    async def test_records_checkout_wait_and_pre_ping(self):
+        for _ in range(2):
+            connection = await greenlet_spawn(self.pool.connect)
+            await greenlet_spawn(connection.close)
+
+        assert_that(self.instrumentation.checkout_wait.count, is_(equal_to(2)))
+        # only the returned connection is pinged
+        assert_that(self.instrumentation.pre_ping.count, is_(equal_to(1)))
+
+    @pytest.mark.asyncio
+    async def test_counts_checkout_timeouts(self):
+        connection = await greenlet_spawn(self.pool.connect)
+
+        with pytest.raises(PoolTimeoutError):
+            await greenlet_spawn(self.pool.connect)
+        await greenlet_spawn(connection.close)
+
+        assert_that(self.instrumentation.checkout_timeouts, is_(equal_to(1)))
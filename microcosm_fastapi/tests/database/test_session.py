@@ -0,0 +1,65 @@
+from contextvars import copy_context
+from unittest.mock import Mock
+
+from hamcrest import (
+    assert_that,
+    equal_to,
+    instance_of,
+    is_,
+)
+from microcosm.api import create_object_graph
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from microcosm_fastapi.database.session import PrimarySession, RoutingSessionMaker
+
+
+def loader(metadata):
+    return dict(
+        postgres_async_replicas=dict(
+            hosts="replica-1,replica-2",
+        ),
+    )
+
+
+class TestRoutingSessionMaker:
+    def setup_method(self):
+        self.primary = Mock(return_value="primary")
+        self.replicas = [Mock(return_value="replica-1"), Mock(return_value="replica-2")]
+        self.session_maker = RoutingSessionMaker(self.primary, self.replicas, sticky_seconds=60)
+
+    def test_writes_use_primary(self):
+        assert_that(self.session_maker(), is_(equal_to("primary")))
+
+    def test_reads_round_robin_replicas(self):
+        sessions = [self.session_maker.reader() for _ in range(3)]
+
+        assert_that(sessions, is_(equal_to(["replica-1", "replica-2", "replica-1"])))
+
+    def test_reads_follow_writes_in_same_context(self):
+        session = Mock(spec=PrimarySession, sticky_seconds=60)
+
+        def request():
+            PrimarySession.mark_write(session)
+            return self.session_maker.reader()
+
+        assert_that(copy_context().run(request), is_(equal_to("primary")))
+        assert_that(self.session_maker.reader(), is_(equal_to("replica-1")))
+
+    def test_delegates_to_primary(self):
+        primary = sessionmaker(class_=AsyncSession, expire_on_commit=False)
+        session_maker = RoutingSessionMaker(primary, self.replicas, sticky_seconds=60)
+
+        session_maker.configure(info=dict(role="primary"))
+
+        assert_that(session_maker.kw, is_(equal_to(primary.kw)))
+        assert_that(primary.kw["info"], is_(equal_to(dict(role="primary"))))
+        assert_that(session_maker.begin, is_(equal_to(primary.begin)))
+
+
+def test_configure_replicas():
+    graph = create_object_graph("test", testing=True, loader=loader)
+
+    assert_that(len(graph.postgres_async_replicas), is_(equal_to(2)))
+    assert_that(graph.session_maker_async, is_(instance_of(RoutingSessionMaker)))
+    assert_that(graph.session_maker_async.primary, is_(instance_of(sessionmaker)))
@@ -0,0 +1,88 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from hamcrest import (
+    assert_that,
+    equal_to,
+    is_,
+    none,
+    same_instance,
+)
+from microcosm_postgres.models import EntityMixin, Model
+from sqlalchemy import Column, String
+
+from microcosm_fastapi.database.statements import StatementCache
+from microcosm_fastapi.database.store import StoreAsync
+
+
+class Topping(EntityMixin, Model):
+    __tablename__ = "test_statements_topping"
+
+    name = Column(String(), nullable=False)
+
+
+class OrderedToppingStore(StoreAsync):
+    def _order_by(self, query, **kwargs):
+        return query.order_by(Topping.name)
+
+
+class NamedToppingStore(StoreAsync):
+    def _where(self, query, name=None):
+        if name is not None:
+            query = query.where(Topping.name == name)
+        return query
+
+
+class TestStatementCache:
+    def test_hits_and_misses(self):
+        cache = StatementCache(maxsize=1)
+
+        first, hit = cache.get("a", object)
+        assert_that(hit, is_(equal_to(False)))
+
+        second, hit = cache.get("a", object)
+        assert_that(hit, is_(equal_to(True)))
+        assert_that(second, is_(same_instance(first)))
+
+        # Full caches build without storing
+        cache.get("b", object)
+        assert_that(list(cache.statements), is_(equal_to(["a"])))
+        assert_that((cache.hits, cache.misses), is_(equal_to((1, 2))))
+
+
+class TestStoreStatements:
+    def setup_method(self):
+        self.store = StoreAsync(None, Topping, auto_filter_fields=(Topping.name,))
+
+    def test_reuses_statement_per_shape(self):
+        first, parameters = self.store._statement_for("search", name="cheese", offset=0, limit=20)
+        assert_that(parameters, is_(equal_to(dict(filter_name="cheese", offset=0, limit=20))))
+
+        second, parameters = self.store._statement_for("search", name="ham", offset=20, limit=20)
+        assert_that(second, is_(same_instance(first)))
+        assert_that(parameters, is_(equal_to(dict(filter_name="ham", offset=20, limit=20))))
+
+        # A different filter set is a different shape
+        third, parameters = self.store._statement_for("search", offset=20, limit=20)
+        assert_that(third is first, is_(equal_to(False)))
+        assert_that(parameters, is_(equal_to(dict(offset=20, limit=20))))
+
+    def test_criterion_bypasses_cache(self):
+        _, parameters = self.store._statement_for("search", Topping.name == "cheese")
+
+        assert_that(parameters, is_(none()))
+        assert_that(self.store.statement_cache.statements, is_(equal_to(dict())))
+
+    def test_overridden_hooks_disable_cache(self):
+        store = OrderedToppingStore(None, Topping)
+
+        assert_that(store.statement_cache, is_(none()))
+
+    @pytest.mark.asyncio
+    async def test_uncached_retrieve_builds_statement_once(self):
+        store = NamedToppingStore(None, Topping)
+        store._retrieve = AsyncMock(return_value=None)
+
+        await store.retrieve("topping-id")
+
+        assert_that(store._retrieve.await_count, is_(equal_to(1)))
@@ -0,0 +1,72 @@
+"""
+Shared fixtures for async pubsub tests.
+
+"""
+from asyncio import get_running_loop, sleep
+from logging import getLogger
+from unittest.mock import Mock
+
+from microcosm.api import create_object_graph, load_from_dict
+
+from microcosm_fastapi.pubsub.local import LocalSQSClient
+
+
+MEDIA_TYPE = "application/vnd.globality.pubsub._.created.pizza"
+OTHER_MEDIA_TYPE = "application/vnd.globality.pubsub._.created.topping"
+
+
+def create_dispatcher(**config):
+    graph = create_object_graph(
+        "example",
+        testing=True,
+        loader=load_from_dict(
+            sqs_consumer=dict(
+                sqs_queue_url="test",
+                sqs_event=None,
+            ),
+            sqs_message_dispatcher_async=config,
+        ),
+    )
+    graph.use(
+        "opaque",
+        "sqs_message_handler_registry",
+        "sqs_consumer",
+        "sqs_message_dispatcher_async",
+    )
+    graph.sqs_consumer.sqs_client = LocalSQSClient()
+    return graph.sqs_message_dispatcher_async
+
+
+def enable_metrics(dispatcher) -> Mock:
+    """
+    Send the dispatcher's metrics to a mock, as metrics are disabled when testing.
+
+    """
+    dispatcher.send_metrics = Mock(enabled=True)
+    return dispatcher.send_metrics.metrics
+
+
+class SleepingHandler:
+    """
+    Handle a message by sleeping for the delay of its URI, tracking concurrency.
+
+    """
+    logger = getLogger("sleeping_handler")
+
+    def __init__(self):
+        self.delays = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = []
+        self.loops = []
+
+    async def __call__(self, message):
+        self.loops.append(get_running_loop())
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await sleep(self.delays[message["uri"]])
+        finally:
+            self.in_flight -= 1
+        self.completed.append(message["uri"])
+        return True
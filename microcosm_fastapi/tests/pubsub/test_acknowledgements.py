@@ -0,0 +1,136 @@
+"""
+Batched acknowledgement and visibility heartbeat tests.
+
+"""
+from logging import getLogger
+from unittest.mock import Mock
+
+from hamcrest import (
+    assert_that,
+    contains_exactly,
+    empty,
+    equal_to,
+    greater_than_or_equal_to,
+    has_entries,
+    has_length,
+    is_,
+    less_than,
+)
+
+from microcosm_fastapi.pubsub.acknowledgements import VisibilityHeartbeat
+from microcosm_fastapi.tests.pubsub.fixtures import MEDIA_TYPE, SleepingHandler, create_dispatcher
+
+
+class TestBatchedAcknowledgements:
+
+    def setup_method(self):
+        self.handler = SleepingHandler()
+        self.bound_handlers = {MEDIA_TYPE: self.handler}
+
+    def publish(self, dispatcher, count, delay=0.001):
+        for index in range(count):
+            uri = f"http://pizza/{index}"
+            if delay is not None:
+                self.handler.delays[uri] = delay
+            dispatcher.sqs_consumer.sqs_client.publish(MEDIA_TYPE, uri=uri)
+
+    def test_acks_are_batched(self):
+        dispatcher = create_dispatcher(message_batch_acknowledgements=True)
+        self.publish(dispatcher, 10)
+
+        dispatcher.handle_batch(self.bound_handlers)
+
+        sqs_client = dispatcher.sqs_consumer.sqs_client
+        assert_that(sqs_client.messages, is_(empty()))
+        assert_that(sqs_client.calls["delete_message"], is_(equal_to(0)))
+        assert_that(sqs_client.calls["delete_message_batch"], is_(equal_to(1)))
+
+    def test_nacks_are_batched(self):
+        dispatcher = create_dispatcher(message_batch_acknowledgements=True)
+        # handling fails without a delay
+        self.publish(dispatcher, 3, delay=None)
+
+        dispatcher.handle_batch(self.bound_handlers)
+
+        sqs_client = dispatcher.sqs_consumer.sqs_client
+        assert_that(sqs_client.messages, has_length(3))
+        assert_that(sqs_client.calls["change_message_visibility"], is_(equal_to(0)))
+        assert_that(sqs_client.calls["change_message_visibility_batch"], is_(equal_to(1)))
+        assert_that(sqs_client.calls["delete_message_batch"], is_(equal_to(0)))
+
+    def test_pipeline_acks_are_batched(self):
+        dispatcher = create_dispatcher(
+            message_batch_acknowledgements=True,
+            message_pipeline=True,
+        )
+        self.publish(dispatcher, 25)
+        sqs_client = dispatcher.sqs_consumer.sqs_client
+
+        dispatcher.run_pipeline(self.bound_handlers, should_stop=lambda: not sqs_client.messages)
+
+        assert_that(self.handler.completed, has_length(25))
+        assert_that(sqs_client.calls["delete_message"], is_(equal_to(0)))
+        assert_that(sqs_client.calls["delete_message_batch"], is_(greater_than_or_equal_to(3)))
+        assert_that(sqs_client.calls["delete_message_batch"], is_(less_than(25)))
+
+    def test_heartbeat_extends_slow_messages(self):
+        dispatcher = create_dispatcher(message_visibility_heartbeat=True)
+        dispatcher.visibility_timeout = 0.2
+        sqs_client = dispatcher.sqs_consumer.sqs_client
+        sqs_client.visibility_timeout = 0.2
+        self.publish(dispatcher, 1, delay=0.5)
+
+        dispatcher.handle_batch(self.bound_handlers)
+
+        assert_that(self.handler.completed, has_length(1))
+        assert_that(sqs_client.messages, is_(empty()))
+        assert_that(sqs_client.calls["change_message_visibility_batch"], is_(greater_than_or_equal_to(2)))
+
+
+class TestVisibilityHeartbeat:
+
+    def setup_method(self):
+        self.now = 0.0
+        self.dispatcher = create_dispatcher()
+        self.sqs_client = self.dispatcher.sqs_consumer.sqs_client
+        self.heartbeat = VisibilityHeartbeat(
+            self.dispatcher.sqs_consumer,
+            getLogger("heartbeat"),
+            visibility_timeout=30,
+            clock=lambda: self.now,
+        )
+        for index in range(12):
+            self.sqs_client.publish(MEDIA_TYPE, uri=f"http://pizza/{index}")
+        self.messages = [
+            Mock(receipt_handle=message["ReceiptHandle"])
+            for message in self.sqs_client.receive_message(MaxNumberOfMessages=12)["Messages"]
+        ]
+
+    def test_due_once_half_the_timeout_remains(self):
+        self.heartbeat.track(self.messages)
+
+        self.now = 14.0
+        assert_that(self.heartbeat.due(), is_(empty()))
+
+        self.now = 15.0
+        assert_that(self.heartbeat.due(), has_length(12))
+
+    def test_released_messages_are_not_due(self):
+        self.heartbeat.track(self.messages)
+        for message in self.messages[1:]:
+            self.heartbeat.release(message)
+
+        self.now = 20.0
+        assert_that(self.heartbeat.due(), contains_exactly(self.messages[0].receipt_handle))
+
+    def test_extend_in_batches(self):
+        self.heartbeat.track(self.messages)
+        deleted = self.messages[0].receipt_handle
+        self.sqs_client.delete_message(ReceiptHandle=deleted)
+
+        self.now = 20.0
+        extended = self.heartbeat.extend(self.heartbeat.due())
+
+        assert_that(extended, has_length(11))
+        assert_that(deleted not in extended, is_(equal_to(True)))
+        assert_that(self.sqs_client.calls, has_entries(change_message_visibility_batch=2))
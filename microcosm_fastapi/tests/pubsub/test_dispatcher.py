@@ -0,0 +1,87 @@
+"""
+Async message dispatcher tests.
+
+"""
+from hamcrest import (
+    assert_that,
+    contains_exactly,
+    equal_to,
+    has_entries,
+    has_length,
+    is_,
+)
+from microcosm_pubsub.result import MessageHandlingResultType
+
+from microcosm_fastapi.tests.pubsub.fixtures import MEDIA_TYPE, SleepingHandler, create_dispatcher
+
+
+class TestSQSMessageDispatcherAsync:
+
+    def setup_method(self):
+        self.handler = SleepingHandler()
+        self.bound_handlers = {MEDIA_TYPE: self.handler}
+
+    def publish(self, dispatcher, uri, delay):
+        self.handler.delays[uri] = delay
+        dispatcher.sqs_consumer.sqs_client.publish(MEDIA_TYPE, uri=uri)
+
+    def test_handle_batch_concurrently(self):
+        dispatcher = create_dispatcher(message_max_concurrent_operations=3)
+        for index in range(6):
+            self.publish(dispatcher, f"http://pizza/{index}", 0.01)
+
+        instances = dispatcher.handle_batch(self.bound_handlers)
+
+        assert_that(instances, has_length(6))
+        for instance in instances:
+            assert_that(instance.result, is_(equal_to(MessageHandlingResultType.SUCCEEDED)))
+        assert_that(self.handler.max_in_flight, is_(equal_to(3)))
+        assert_that(dispatcher.sqs_consumer.sqs_client.messages, is_(equal_to({})))
+
+    def test_slow_message_does_not_hold_up_others(self):
+        dispatcher = create_dispatcher(message_max_concurrent_operations=2)
+        self.publish(dispatcher, "http://pizza/slow", 0.2)
+        for index in range(4):
+            self.publish(dispatcher, f"http://pizza/{index}", 0.01)
+
+        dispatcher.handle_batch(self.bound_handlers)
+
+        assert_that(self.handler.completed, contains_exactly(
+            "http://pizza/0",
+            "http://pizza/1",
+            "http://pizza/2",
+            "http://pizza/3",
+            "http://pizza/slow",
+        ))
+
+    def test_message_timeout(self):
+        dispatcher = create_dispatcher(message_timeout_seconds=0.05)
+        self.publish(dispatcher, "http://pizza/slow", 5)
+        self.publish(dispatcher, "http://pizza/fast", 0)
+
+        instances = dispatcher.handle_batch(self.bound_handlers)
+
+        assert_that(
+            [instance.result for instance in instances],
+            contains_exactly(MessageHandlingResultType.FAILED, MessageHandlingResultType.SUCCEEDED),
+        )
+        # the timed out message is left on the queue to be retried
+        assert_that(dispatcher.sqs_consumer.sqs_client.messages, has_length(1))
+        assert_that(dispatcher.sqs_consumer.sqs_client.calls, has_entries(
+            delete_message=1,
+            change_message_visibility=1,
+        ))
+
+    def test_loop_is_reused(self):
+        dispatcher = create_dispatcher()
+        for _ in range(2):
+            self.publish(dispatcher, "http://pizza/0", 0)
+            dispatcher.handle_batch(self.bound_handlers)
+
+        loops = self.handler.loops
+
+        assert_that(loops, has_length(2))
+        assert_that(loops[0], is_(loops[1]))
+
+        dispatcher.close()
+        assert_that(loops[0].is_closed(), is_(equal_to(True)))
@@ -0,0 +1,165 @@
+"""
+Tests for running synchronous handlers and chain links off the event loop.
+
+"""
+from asyncio import get_running_loop
+from contextvars import ContextVar
+from functools import partial
+from threading import current_thread, main_thread
+from time import sleep
+
+import pytest
+from hamcrest import (
+    assert_that,
+    contains_exactly,
+    equal_to,
+    has_length,
+    instance_of,
+    is_,
+    is_not,
+    starts_with,
+)
+from microcosm_pubsub.result import MessageHandlingResultType
+
+from microcosm_fastapi.pubsub.chain.chain import ChainAsync
+from microcosm_fastapi.pubsub.executors import (
+    call,
+    is_async_callable,
+    message_opaque,
+    run_sync,
+)
+from microcosm_fastapi.tests.pubsub.fixtures import (
+    MEDIA_TYPE,
+    OTHER_MEDIA_TYPE as SYNC_MEDIA_TYPE,
+    SleepingHandler,
+    create_dispatcher,
+)
+
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+class BlockingHandler:
+    """
+    Handle a message by blocking its thread.
+
+    """
+
+    def __init__(self, completed):
+        self.completed = completed
+        self.threads = []
+        self.opaques = []
+
+    def __call__(self, message):
+        self.threads.append(current_thread().name)
+        self.opaques.append(message_opaque.get())
+        sleep(0.2)
+        self.completed.append(message["uri"])
+        return True
+
+
+async def async_function():
+    pass
+
+
+class TestExecutors:
+
+    def test_is_async_callable(self):
+        assert_that(is_async_callable(async_function), is_(equal_to(True)))
+        assert_that(is_async_callable(partial(async_function)), is_(equal_to(True)))
+        assert_that(is_async_callable(SleepingHandler()), is_(equal_to(True)))
+        assert_that(is_async_callable(sleep), is_(equal_to(False)))
+        assert_that(is_async_callable(BlockingHandler([])), is_(equal_to(False)))
+
+    @pytest.mark.asyncio
+    async def test_run_sync_propagates_context(self):
+        request_id.set("request-id")
+
+        thread, value = await run_sync(lambda: (current_thread(), request_id.get()))
+
+        assert_that(thread, is_not(main_thread()))
+        assert_that(value, is_(equal_to("request-id")))
+
+    @pytest.mark.asyncio
+    async def test_chain_runs_sync_links_in_threads(self):
+        chain = ChainAsync(lambda: current_thread())
+
+        thread = await chain()
+
+        assert_that(thread, is_not(main_thread()))
+
+
+class TestDispatcherExecutors:
+
+    def setup_method(self):
+        self.dispatcher = create_dispatcher(message_thread_pool_size=2)
+        self.handler = SleepingHandler()
+        self.sync_handler = BlockingHandler(self.handler.completed)
+        self.bound_handlers = {
+            MEDIA_TYPE: self.handler,
+            SYNC_MEDIA_TYPE: self.sync_handler,
+        }
+
+    def teardown_method(self):
+        self.dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_wrapped_async_handler_runs_on_loop(self):
+        self.handler.delays["http://pizza/0"] = 0
+
+        result = await call(
+            self.dispatcher.wrap_handler(self.handler),
+            dict(uri="http://pizza/0"),
+            wrapped=self.handler,
+        )
+
+        assert_that(result, is_(equal_to(True)))
+        assert_that(self.handler.loops, contains_exactly(get_running_loop()))
+
+    @pytest.mark.asyncio
+    async def test_wrapped_sync_handler_runs_in_thread(self):
+        result = await call(
+            self.dispatcher.wrap_handler(self.sync_handler),
+            dict(uri="http://topping/0"),
+            wrapped=self.sync_handler,
+        )
+
+        assert_that(result, is_(equal_to(True)))
+        assert_that(self.sync_handler.threads, contains_exactly(is_not(main_thread().name)))
+
+    @pytest.mark.asyncio
+    async def test_undetected_async_handler_is_awaited(self):
+        self.handler.delays["http://pizza/0"] = 0
+
+        result = await call(self.dispatcher.wrap_handler(self.handler), dict(uri="http://pizza/0"))
+
+        assert_that(result, is_(equal_to(True)))
+        assert_that(self.handler.completed, contains_exactly("http://pizza/0"))
+
+    def test_async_handler_failure_is_reported(self):
+        # handling fails without a delay
+        self.dispatcher.sqs_consumer.sqs_client.publish(MEDIA_TYPE, uri="http://pizza/0")
+
+        instances = self.dispatcher.handle_batch(self.bound_handlers)
+
+        assert_that(
+            [instance.result for instance in instances],
+            contains_exactly(MessageHandlingResultType.FAILED),
+        )
+        assert_that(self.dispatcher.sqs_consumer.sqs_client.messages, has_length(1))
+
+    def test_sync_handler_does_not_block_loop(self):
+        sqs_client = self.dispatcher.sqs_consumer.sqs_client
+        sqs_client.publish(SYNC_MEDIA_TYPE, uri="http://topping/0")
+        self.handler.delays["http://pizza/0"] = 0.01
+        sqs_client.publish(MEDIA_TYPE, uri="http://pizza/0")
+
+        instances = self.dispatcher.handle_batch(self.bound_handlers)
+
+        assert_that(
+            [instance.result for instance in instances],
+            contains_exactly(MessageHandlingResultType.SUCCEEDED, MessageHandlingResultType.SUCCEEDED),
+        )
+        assert_that(self.handler.completed, contains_exactly("http://pizza/0", "http://topping/0"))
+        assert_that(self.sync_handler.threads, contains_exactly(starts_with("message-handler")))
+        assert_that(self.sync_handler.opaques[0], is_(instance_of(dict)))
@@ -0,0 +1,121 @@
+"""
+Concurrency lane tests.
+
+"""
+from asyncio import gather, get_running_loop, sleep
+
+import pytest
+from hamcrest import (
+    assert_that,
+    contains_exactly,
+    equal_to,
+    greater_than,
+    has_item,
+    has_length,
+    is_,
+)
+
+from microcosm_fastapi.pubsub.lanes import DEFAULT_LANE, Lane, LaneScheduler
+from microcosm_fastapi.tests.pubsub.fixtures import (
+    MEDIA_TYPE,
+    OTHER_MEDIA_TYPE as SLOW_MEDIA_TYPE,
+    SleepingHandler,
+    create_dispatcher,
+    enable_metrics,
+)
+
+
+class TestLaneScheduler:
+
+    def setup_method(self):
+        self.scheduler = LaneScheduler(
+            lanes=[
+                Lane(name="fast", media_types=frozenset([MEDIA_TYPE]), weight=3),
+                Lane(name="slow", media_types=frozenset([SLOW_MEDIA_TYPE]), weight=1),
+            ],
+            max_concurrent_operations=1,
+        )
+
+    def test_find_lane(self):
+        assert_that(self.scheduler.find_lane(SLOW_MEDIA_TYPE).name, is_(equal_to("slow")))
+        assert_that(self.scheduler.find_lane("text/plain").name, is_(equal_to(DEFAULT_LANE)))
+
+    @pytest.mark.asyncio
+    async def test_weighted_lanes(self):
+        order = []
+
+        async def handle(name):
+            lane = self.scheduler.lanes[name]
+            await self.scheduler.acquire(lane)
+            order.append(name)
+            await sleep(0)
+            self.scheduler.release(lane)
+
+        default_lane = self.scheduler.lanes[DEFAULT_LANE]
+        await self.scheduler.acquire(default_lane)
+        tasks = [
+            get_running_loop().create_task(handle(name))
+            for name in ["slow"] * 4 + ["fast"] * 4
+        ]
+        await sleep(0)
+        self.scheduler.release(default_lane)
+        await gather(*tasks)
+
+        assert_that(order, contains_exactly(
+            "fast", "fast", "slow", "fast", "fast", "slow", "slow", "slow",
+        ))
+        assert_that(self.scheduler.in_flight, is_(equal_to(0)))
+
+
+class TestDispatcherLanes:
+
+    def setup_method(self):
+        self.dispatcher = create_dispatcher(
+            message_max_concurrent_operations=3,
+            message_lanes=dict(
+                slow=dict(
+                    media_types=[SLOW_MEDIA_TYPE],
+                    max_concurrent_operations=1,
+                ),
+            ),
+        )
+        self.sqs_client = self.dispatcher.sqs_consumer.sqs_client
+        self.handler = SleepingHandler()
+        self.slow_handler = SleepingHandler()
+        self.bound_handlers = {
+            MEDIA_TYPE: self.handler,
+            SLOW_MEDIA_TYPE: self.slow_handler,
+        }
+
+    def publish(self, handler, media_type, count):
+        for index in range(count):
+            uri = f"http://{media_type}/{index}"
+            handler.delays[uri] = 0.01
+            self.sqs_client.publish(media_type, uri=uri)
+
+    def test_lane_concurrency_cap(self):
+        self.publish(self.slow_handler, SLOW_MEDIA_TYPE, 4)
+        self.publish(self.handler, MEDIA_TYPE, 4)
+
+        self.dispatcher.handle_batch(self.bound_handlers)
+
+        assert_that(self.slow_handler.completed, has_length(4))
+        assert_that(self.handler.completed, has_length(4))
+        assert_that(self.slow_handler.max_in_flight, is_(equal_to(1)))
+        # the rest of the total goes to other lanes
+        assert_that(self.handler.max_in_flight, is_(greater_than(1)))
+
+    def test_lane_metrics(self):
+        metrics = enable_metrics(self.dispatcher)
+        self.publish(self.slow_handler, SLOW_MEDIA_TYPE, 2)
+
+        self.dispatcher.handle_batch(self.bound_handlers)
+
+        assert_that(
+            [(call.args[0], call.kwargs["tags"][-1]) for call in metrics.histogram.call_args_list],
+            has_item(("message_lane_wait", "lane:slow")),
+        )
+        assert_that(
+            [(call.args[0], call.kwargs["tags"][-1]) for call in metrics.gauge.call_args_list],
+            has_item(("message_lane_in_flight", "lane:slow")),
+        )
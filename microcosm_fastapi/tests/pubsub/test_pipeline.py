@@ -0,0 +1,132 @@
+"""
+Pipelined message consumption tests.
+
+"""
+from hamcrest import (
+    assert_that,
+    contains_inanyorder,
+    equal_to,
+    greater_than,
+    has_entries,
+    has_item,
+    has_length,
+    is_,
+    less_than_or_equal_to,
+)
+
+from microcosm_fastapi.tests.pubsub.fixtures import (
+    MEDIA_TYPE,
+    SleepingHandler,
+    create_dispatcher,
+    enable_metrics,
+)
+
+
+class CountingHandler(SleepingHandler):
+    """
+    Also track how many messages have been received but not yet handled.
+
+    """
+
+    def __init__(self, sqs_client):
+        super().__init__()
+        self.sqs_client = sqs_client
+        self.max_outstanding = 0
+
+    async def __call__(self, message):
+        received = sum(
+            1 for sqs_message in self.sqs_client.messages.values()
+            if sqs_message.receive_count
+        )
+        self.max_outstanding = max(self.max_outstanding, received - len(self.completed))
+        return await super().__call__(message)
+
+
+class TestMessagePipeline:
+
+    def setup_method(self):
+        self.dispatcher = create_dispatcher(
+            message_max_concurrent_operations=2,
+            message_buffer_size=10,
+        )
+        self.sqs_client = self.dispatcher.sqs_consumer.sqs_client
+        self.handler = CountingHandler(self.sqs_client)
+        self.bound_handlers = {MEDIA_TYPE: self.handler}
+
+    def publish(self, count, delay=0.001):
+        uris = [f"http://pizza/{index}" for index in range(count)]
+        for uri in uris:
+            self.handler.delays[uri] = delay
+            self.sqs_client.publish(MEDIA_TYPE, uri=uri)
+        return uris
+
+    def until_empty(self):
+        return not self.sqs_client.messages
+
+    def test_handle_all_messages(self):
+        uris = self.publish(25)
+
+        pipeline = self.dispatcher.run_pipeline(self.bound_handlers, self.until_empty)
+
+        assert_that(self.handler.completed, contains_inanyorder(*uris))
+        assert_that(self.handler.max_in_flight, is_(equal_to(2)))
+        assert_that(self.sqs_client.calls, has_entries(delete_message=25))
+        assert_that(pipeline.worker_idle_time, is_(greater_than(0)))
+
+    def test_backpressure(self):
+        self.publish(40)
+
+        self.dispatcher.run_pipeline(self.bound_handlers, self.until_empty)
+
+        # no more than the buffer and the messages in flight are received ahead of handling
+        assert_that(self.handler.completed, has_length(40))
+        assert_that(self.handler.max_outstanding, is_(less_than_or_equal_to(10 + 2)))
+
+    def test_drain_on_stop(self):
+        self.publish(30)
+        polls = []
+
+        def after_one_receive():
+            polls.append(None)
+            return len(polls) > 1
+
+        self.dispatcher.run_pipeline(self.bound_handlers, after_one_receive)
+
+        # messages already received are handled and acknowledged
+        assert_that(self.handler.completed, has_length(10))
+        assert_that(self.sqs_client.messages, has_length(20))
+        assert_that(self.sqs_client.calls, has_entries(
+            receive_message=1,
+            delete_message=10,
+        ))
+
+    def test_drain_timeout(self):
+        self.dispatcher.drain_timeout = 0.05
+        self.publish(4, delay=5)
+        polls = []
+
+        def after_one_receive():
+            polls.append(None)
+            return len(polls) > 1
+
+        self.dispatcher.run_pipeline(self.bound_handlers, after_one_receive)
+
+        # unfinished messages are left to be received again
+        assert_that(self.handler.completed, has_length(0))
+        assert_that(self.sqs_client.messages, has_length(4))
+        assert_that(self.sqs_client.calls["delete_message"], is_(equal_to(0)))
+
+    def test_metrics(self):
+        metrics = enable_metrics(self.dispatcher)
+        self.publish(5)
+
+        self.dispatcher.run_pipeline(self.bound_handlers, self.until_empty)
+
+        assert_that(
+            [call.args[0] for call in metrics.gauge.call_args_list],
+            has_item("message_buffer_size"),
+        )
+        assert_that(
+            [call.args[0] for call in metrics.histogram.call_args_list],
+            has_item("message_worker_idle"),
+        )
@@ -6,9 +6,11 @@ import logging
 from types import SimpleNamespace
 
 import pytest
+from fastapi.responses import StreamingResponse
 
-from microcosm_fastapi.audit import AuditOptions
+from microcosm_fastapi.audit import AuditOptions, ResponseBodyTee, response_header_field
 from microcosm_fastapi.conventions.crud import configure_crud
+from microcosm_fastapi.logging_data_map import LoggingInfo
 from microcosm_fastapi.namespaces import Namespace
 from microcosm_fastapi.operations import Operation
 from microcosm_fastapi.tests.conventions.fixtures import (
@@ -69,3 +71,89 @@ class TestAudit:
 
         assert "X-Request-Id" in caplog.messages[0]
         assert "1234" in caplog.messages[0]
+
+    @pytest.mark.asyncio
+    async def test_skip_logging_header(self, client, test_graph, base_fixture, caplog):
+        caplog.set_level(logging.INFO, logger="audit")
+        uri = f"{base_fixture.base_url}/{base_fixture.person_id_1}"
+        await client.get(uri, headers={"X-Request-Nolog": "true"})
+
+        assert [record for record in caplog.records if record.name == "audit"] == []
+
+    @pytest.mark.asyncio
+    async def test_log_streaming_response(self, client, test_graph, base_fixture, caplog):
+        caplog.set_level(logging.INFO)
+
+        async def chunks():
+            yield b"first,"
+            yield b"second"
+
+        @test_graph.app.get("/api/v1/stream/{stream_id}")
+        async def stream_retrieve(stream_id: str):
+            return StreamingResponse(chunks())
+
+        test_graph.logging_data_map.add_path(
+            "/api/v1/stream/{stream_id}",
+            "GET",
+            LoggingInfo("stream.retrieve", "stream_retrieve"),
+        )
+        response = await client.get("/api/v1/stream/1")
+
+        assert response.content == b"first,second"
+        assert "'status_code': 200" in caplog.messages[0]
+
+    @pytest.mark.asyncio
+    async def test_phase_timing(self, client, test_graph, caplog):
+        test_graph.config.audit_middleware.include_phase_timing = True
+        test_graph.use("audit_middleware")
+        person_ns = Namespace(subject=Person, version="v1")
+        configure_crud(test_graph, person_ns, PERSON_MAPPINGS)
+        caplog.set_level(logging.INFO, logger="audit")
+
+        await client.get(f"/api/v1/person/{PERSON_ID_1}")
+
+        [record] = [record for record in caplog.records if record.name == "audit"]
+        assert record.msg["handler_time"] > 0
+        assert record.msg["middleware_time"] >= 0
+
+    @pytest.mark.asyncio
+    async def test_sampling_skips_success_but_logs_errors(self, client, test_graph, caplog):
+        test_graph.config.audit_middleware.sample_rate = 0.0
+        test_graph.use("audit_middleware")
+        person_ns = Namespace(subject=Person, version="v1")
+        configure_crud(test_graph, person_ns, PERSON_MAPPINGS)
+        caplog.set_level(logging.INFO, logger="audit")
+
+        await client.get(f"/api/v1/person/{PERSON_ID_1}")
+        assert [record for record in caplog.records if record.name == "audit"] == []
+
+        await client.get(f"/api/v1/person/{PERSON_ID_1}x")
+        [record] = [record for record in caplog.records if record.name == "audit"]
+        assert record.msg["status_code"] == 422
+        assert record.msg["sample_weight"] == 1.0
+
+
+class TestResponseBodyTee:
+    @pytest.mark.parametrize("limit, expected", [
+        (None, None),
+        (True, b"abcdef"),
+        (10, b"abcdef"),
+        (6, None),
+    ])
+    def test_retains_body_under_limit(self, limit, expected):
+        tee = ResponseBodyTee(limit)
+        tee.add(b"abc")
+        tee.add(b"def")
+
+        assert tee.body == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    (b"X-Request-Id", "request_id"),
+    (b"X-Trace-Id", "trace_id"),
+    (b"x-request-id", None),
+    (b"X-Request-Started-At", None),
+    (b"Content-Type", None),
+])
+def test_response_header_field(name, expected):
+    assert response_header_field(name) == expected
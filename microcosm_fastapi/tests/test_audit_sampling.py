@@ -0,0 +1,78 @@
+"""
+Audit sampling tests.
+
+"""
+import pytest
+from hamcrest import (
+    assert_that,
+    calling,
+    contains_exactly,
+    equal_to,
+    is_,
+    raises,
+)
+
+from microcosm_fastapi.audit_sampling import AuditSampler, TokenBucket, parse_operation_values
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_operation_values():
+    assert_that(
+        parse_operation_values(["pizza.search.v1:0.5", "health:0"]),
+        is_(equal_to({"pizza.search.v1": 0.5, "health": 0.0})),
+    )
+    assert_that(calling(parse_operation_values).with_args(["0.5"]), raises(ValueError))
+
+
+def test_token_bucket_refills():
+    clock = FakeClock()
+    bucket = TokenBucket(2, clock=clock)
+
+    assert_that([bucket.take() for _ in range(3)], contains_exactly(True, True, False))
+
+    clock.now += 0.5
+    assert_that([bucket.take() for _ in range(2)], contains_exactly(True, False))
+
+
+@pytest.mark.parametrize("status_code, draw, expected", [
+    (200, 0.2, 4.0),
+    (200, 0.3, None),
+    (404, 0.9, 1.0),
+    (500, 0.9, 1.0),
+])
+def test_sample_rate(status_code, draw, expected):
+    sampler = AuditSampler(
+        sample_rates={"pizza.search.v1": 0.25},
+        random=lambda: draw,
+    )
+
+    assert_that(sampler.sample("pizza.search.v1", status_code), is_(equal_to(expected)))
+
+
+def test_disabled_by_default():
+    sampler = AuditSampler()
+
+    assert_that(sampler.enabled, is_(equal_to(False)))
+    assert_that(sampler.sample("pizza.search.v1", 200), is_(equal_to(1.0)))
+
+
+def test_rate_limit_carries_suppressed_weight():
+    clock = FakeClock()
+    sampler = AuditSampler(rate_limits={"pizza.retrieve.v1": 1}, clock=clock)
+
+    weights = [sampler.sample("pizza.retrieve.v1", 200) for _ in range(4)]
+    assert_that(weights, contains_exactly(1.0, None, None, None))
+    # errors bypass the limit and don't consume tokens
+    assert_that(sampler.sample("pizza.retrieve.v1", 500), is_(equal_to(1.0)))
+    # other operations are unaffected
+    assert_that(sampler.sample("pizza.search.v1", 200), is_(equal_to(1.0)))
+
+    clock.now += 1.0
+    assert_that(sampler.sample("pizza.retrieve.v1", 200), is_(equal_to(4.0)))
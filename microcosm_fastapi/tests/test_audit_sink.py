@@ -0,0 +1,109 @@
+"""
+Audit sink tests.
+
+"""
+from logging import INFO, Handler, getLogger
+from threading import Event
+
+from hamcrest import (
+    assert_that,
+    contains_exactly,
+    equal_to,
+    is_,
+)
+
+from microcosm_fastapi.audit_sink import AuditSink, OverflowPolicy, QueuedAuditSink
+
+
+class Record:
+    def __init__(self, value):
+        self.value = value
+
+    def to_dict(self):
+        return dict(value=self.value)
+
+
+class StallingHandler(Handler):
+    """
+    Collect records, holding the writer on the first one until released.
+
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.started = Event()
+        self.released = Event()
+
+    def emit(self, record):
+        self.started.set()
+        self.released.wait()
+        self.records.append(record.msg["value"])
+
+
+class TestAuditSink:
+    def setup_method(self):
+        self.handler = StallingHandler()
+        self.logger = getLogger("test_audit_sink")
+        self.logger.handlers = [self.handler]
+        self.logger.setLevel(INFO)
+        self.logger.propagate = False
+
+    def test_logs_inline(self):
+        self.handler.released.set()
+
+        AuditSink(self.logger).emit(INFO, Record(1))
+
+        assert_that(self.handler.records, contains_exactly(1))
+
+    def test_writes_in_background(self):
+        self.handler.released.set()
+        sink = QueuedAuditSink(self.logger, max_size=10)
+
+        for value in range(3):
+            sink.emit(INFO, Record(value))
+        sink.close()
+
+        assert_that(self.handler.records, contains_exactly(0, 1, 2))
+        assert_that((sink.queued, sink.dropped), is_(equal_to((3, 0))))
+
+    def test_drops_when_full(self):
+        sink = QueuedAuditSink(self.logger, max_size=1, overflow_policy=OverflowPolicy.DROP)
+
+        sink.emit(INFO, Record(0))
+        self.handler.started.wait()
+        sink.emit(INFO, Record(1))
+        sink.emit(INFO, Record(2))
+        self.handler.released.set()
+        sink.close()
+
+        assert_that(self.handler.records, contains_exactly(0, 1))
+        assert_that((sink.queued, sink.dropped), is_(equal_to((2, 1))))
+
+    def test_samples_when_filling(self):
+        sink = QueuedAuditSink(
+            self.logger,
+            max_size=2,
+            overflow_policy=OverflowPolicy.SAMPLE,
+            sample_rate=0.0,
+        )
+
+        sink.emit(INFO, Record(0))
+        self.handler.started.wait()
+        # Half full: sampled out at a zero rate
+        sink.emit(INFO, Record(1))
+        sink.emit(INFO, Record(2))
+        self.handler.released.set()
+        sink.close()
+
+        assert_that(self.handler.records, contains_exactly(0, 1))
+        assert_that(sink.dropped, is_(equal_to(1)))
+
+    def test_skips_disabled_levels(self):
+        self.logger.setLevel(INFO + 10)
+        sink = QueuedAuditSink(self.logger, max_size=1)
+
+        sink.emit(INFO, Record(0))
+        sink.close()
+
+        assert_that(sink.queued, is_(equal_to(0)))
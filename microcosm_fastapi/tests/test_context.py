@@ -0,0 +1,33 @@
+"""
+Request context tests.
+
+"""
+from fastapi import Request
+from hamcrest import assert_that, equal_to, is_
+
+from microcosm_fastapi.context import capitalise_context, context_wrapper
+
+
+def test_retrieve_context():
+    retrieve_context = context_wrapper(["X-Request", "X-Client"])
+    request = Request(dict(
+        type="http",
+        headers=[
+            (b"host", b"localhost"),
+            (b"x-request-id", b"1234"),
+            (b"x-client-version", b"1.0"),
+            (b"x-other", b"ignored"),
+        ],
+    ))
+
+    assert_that(
+        retrieve_context(request),
+        is_(equal_to({"x-request-id": "1234", "x-client-version": "1.0"})),
+    )
+
+
+def test_capitalise_context():
+    assert_that(
+        capitalise_context({"x-request-id": "1234", "host": "localhost"}),
+        is_(equal_to({"X-Request-Id": "1234", "Host": "localhost"})),
+    )
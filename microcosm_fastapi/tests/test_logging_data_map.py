@@ -1,3 +1,5 @@
+from types import SimpleNamespace
+
 from microcosm_fastapi.logging_data_map import LoggingDataMap, LoggingInfo
 from microcosm_fastapi.namespaces import Namespace
 from microcosm_fastapi.operations import Operation
@@ -99,3 +101,33 @@ class TestLoggingDataMap:
             example_path, example_operation_method
         )
         assert logging_info.operation_name == expected_operation_name
+
+    def test_operation_name_for_custom_path(self):
+        self.logging_data_map.add_path(
+            "/api/v1/pizza/{pizza_id}/order/{order_id}/topping",
+            "GET",
+            LoggingInfo("topping.search", "search_toppings"),
+        )
+        self.logging_data_map.add_path(
+            "/api/v1/pizza/special",
+            "GET",
+            LoggingInfo("pizza.special", "special"),
+        )
+
+        assert self.logging_data_map.get_entry(
+            "/api/v1/pizza/1234/order/5678/topping", "GET",
+        ).operation_name == "topping.search"
+        # Literal segments win over parameters
+        assert self.logging_data_map.get_entry(
+            "/api/v1/pizza/special", "GET",
+        ).operation_name == "pizza.special"
+        assert self.logging_data_map.get_entry(
+            "/api/v1/pizza/1234/order/5678", "GET",
+        ).is_empty()
+
+    def test_operation_name_for_matched_route(self):
+        route = SimpleNamespace(path="/api/v1/pizza/{pizza_id}/order")
+
+        logging_info = self.logging_data_map.get_entry("/ignored", "GET", route)
+
+        assert logging_info.operation_name == "pizza.retrieve_for.order.v1"
@@ -0,0 +1,97 @@
+"""
+Buffered route metrics tests.
+
+"""
+from unittest.mock import MagicMock, call
+
+import pytest
+from hamcrest import (
+    assert_that,
+    close_to,
+    contains_exactly,
+    contains_inanyorder,
+    equal_to,
+    has_length,
+    is_,
+    less_than_or_equal_to,
+)
+
+from microcosm_fastapi.metrics_buffer import LatencyHistogram, RouteMetricsBuffer
+
+
+class TestLatencyHistogram:
+
+    def test_samples_within_accuracy(self):
+        histogram = LatencyHistogram(relative_accuracy=0.01)
+        values = [0.5, 1.0, 1.0, 7.3, 120.0, 45.25]
+        for value in values:
+            histogram.add(value)
+
+        samples = histogram.samples(max_samples=0)
+        assert_that(samples, has_length(len(values)))
+        for sample, value in zip(samples, sorted(values)):
+            assert_that(sample, is_(close_to(value, value * 0.01)))
+        assert_that(samples[-1], is_(equal_to(120.0)))
+
+    def test_max_samples_at_quantiles(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 1001):
+            histogram.add(value)
+
+        samples = histogram.samples(max_samples=10)
+        assert_that(samples, has_length(10))
+        assert_that(samples[0], is_(close_to(1, 0.01)))
+        assert_that(samples[4], is_(close_to(401, 4.01)))
+        assert_that(samples[-1], is_(equal_to(1000)))
+
+
+class TestRouteMetricsBuffer:
+
+    @pytest.mark.asyncio
+    async def test_flush_aggregates(self):
+        metrics = MagicMock()
+        buffer = RouteMetricsBuffer(metrics, flush_interval=60)
+
+        buffer.record("pizza.retrieve.v1", "2xx", 2.0)
+        buffer.record("pizza.retrieve.v1", "2xx", 2.0)
+        buffer.record("pizza.retrieve.v1", "4xx", None)
+        buffer.record("pizza.search.v1", "2xx", 10.0)
+        assert_that(metrics.mock_calls, is_(equal_to([])))
+
+        buffer.close()
+
+        tags = ["endpoint:pizza.retrieve.v1", "backend_type:microcosm_fastapi"]
+        search_tags = ["endpoint:pizza.search.v1", "backend_type:microcosm_fastapi"]
+        assert_that(metrics.increment.call_args_list, contains_inanyorder(
+            call("route.call.count", value=2, tags=tags + ["classifier:2xx"]),
+            call("route.call.count", value=1, tags=tags + ["classifier:4xx"]),
+            call("route.call.count", value=1, tags=search_tags + ["classifier:2xx"]),
+        ))
+        assert_that(
+            [(args[1], kwargs["tags"]) for args, kwargs in metrics.histogram.call_args_list],
+            contains_exactly(
+                contains_exactly(close_to(2.0, 0.02), tags),
+                contains_exactly(2.0, tags),
+                contains_exactly(10.0, search_tags),
+            ),
+        )
+
+        # nothing left to send
+        metrics.reset_mock()
+        buffer.flush()
+        assert_that(metrics.mock_calls, is_(equal_to([])))
+
+    @pytest.mark.asyncio
+    async def test_flush_sends_bounded_samples(self):
+        metrics = MagicMock()
+        buffer = RouteMetricsBuffer(metrics, flush_interval=60, max_samples=10)
+
+        for index in range(1, 1001):
+            buffer.record("pizza.retrieve.v1", "2xx", float(index), phases=dict(handler=index / 2))
+
+        buffer.close()
+
+        assert_that(metrics.increment.call_count, is_(equal_to(1)))
+        # one histogram for the request and one for its phase
+        assert_that(metrics.histogram.call_count, is_(less_than_or_equal_to(2 * 10)))
+        assert_that(metrics.histogram.call_args_list[9].args[1], is_(equal_to(1000.0)))
@@ -0,0 +1,56 @@
+"""
+Phase timing tests.
+
+"""
+from hamcrest import (
+    assert_that,
+    contains_inanyorder,
+    equal_to,
+    greater_than,
+    has_entries,
+    is_,
+)
+
+from microcosm_fastapi.timing import (
+    HANDLER,
+    NULL_TIMER,
+    SQL,
+    RequestTiming,
+    phase_times,
+    record_phase,
+    request_timing,
+    timed,
+)
+
+
+def test_disabled_by_default():
+    assert_that(timed(HANDLER), is_(NULL_TIMER))
+
+    with timed(HANDLER):
+        record_phase(SQL, 1.0)
+
+    assert_that(request_timing.get(), is_(equal_to(None)))
+
+
+def test_phases_accumulate_once_when_nested():
+    timing = RequestTiming()
+    token = request_timing.set(timing)
+    try:
+        with timed(HANDLER):
+            with timed(HANDLER):
+                record_phase(SQL, 1.5)
+            record_phase(SQL, 2.5)
+    finally:
+        request_timing.reset(token)
+
+    assert_that(timing.phases.keys(), contains_inanyorder(HANDLER, SQL))
+    assert_that(timing.phases, has_entries(sql=4.0, handler=greater_than(0.0)))
+    assert_that(timing.active, is_(equal_to(set())))
+
+
+def test_phase_times():
+    assert_that(phase_times(dict(elapsed_time=1.0)), is_(equal_to(None)))
+    assert_that(
+        phase_times(dict(elapsed_time=3.0, sql_time=1.0, handler_time=2.0)),
+        is_(equal_to(dict(sql=1.0, handler=2.0))),
+    )
@@ -0,0 +1,145 @@
+"""
+Request-scoped latency breakdown.
+
+When phase timing is enabled, the audit middleware opens a `RequestTiming` for each
+request and the layers serving it add the time spent in their phase:
+
+ - `session`: creating the database session and checking out its pooled connection
+ - `sql`: executing statements
+ - `handler`: running convention (e.g. CRUD) route handlers, including their `sql`
+ - `pydantic`: validating and serializing `BaseSchema` models
+ - `middleware`: time outside of the route, derived by the audit middleware
+
+Phases are wall clock time in milliseconds, summed over the request; a phase that is
+entered again while in progress (e.g. nested models) is only counted once. When timing
+is disabled, recording a phase costs a context variable lookup.
+
+"""
+from contextvars import ContextVar
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+SESSION = "session"
+SQL = "sql"
+HANDLER = "handler"
+PYDANTIC = "pydantic"
+MIDDLEWARE = "middleware"
+# time spent in the route; only used to derive `middleware`
+ROUTE = "route"
+
+# Phases reported, and their audit record fields
+PHASE_FIELDS = {
+    phase: f"{phase}_time"
+    for phase in (SESSION, SQL, HANDLER, PYDANTIC, MIDDLEWARE)
+}
+
+# Attribute of a SQLAlchemy `ExecutionContext` holding when its statement started
+STATEMENT_START = "_microcosm_phase_start"
+
+
+class RequestTiming:
+    """
+    Time spent per phase of a request.
+
+    """
+
+    __slots__ = ("phases", "active")
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.active: set[str] = set()
+
+    def add(self, phase: str, elapsed_ms: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed_ms
+
+
+request_timing: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+class PhaseTimer:
+    """
+    Time a block into a phase of the current request.
+
+    """
+
+    __slots__ = ("timing", "phase", "start")
+
+    def __init__(self, timing: RequestTiming, phase: str):
+        self.timing = timing
+        self.phase = phase
+        self.start: float | None = None
+
+    def __enter__(self):
+        if self.phase not in self.timing.active:
+            self.timing.active.add(self.phase)
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            self.timing.active.discard(self.phase)
+            self.timing.add(self.phase, (perf_counter() - self.start) * 1000)
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def timed(phase: str) -> PhaseTimer | NullTimer:
+    """
+    Context manager timing a block into `phase`, if the request is being timed.
+
+    """
+    timing = request_timing.get()
+    if timing is None:
+        return NULL_TIMER
+    return PhaseTimer(timing, phase)
+
+
+def record_phase(phase: str, elapsed_ms: float) -> None:
+    timing = request_timing.get()
+    if timing is not None:
+        timing.add(phase, elapsed_ms)
+
+
+def phase_times(fields: dict) -> dict[str, float] | None:
+    """
+    The time per phase in a request's timing fields, if any.
+
+    """
+    phases = {
+        phase: fields[field]
+        for phase, field in PHASE_FIELDS.items()
+        if field in fields
+    }
+    return phases or None
+
+
+def time_statements(engine: AsyncEngine) -> None:
+    """
+    Time statements executed on an engine into the `sql` phase.
+
+    """
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if request_timing.get() is not None:
+            setattr(context, STATEMENT_START, perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, STATEMENT_START, None)
+        if start is not None:
+            record_phase(SQL, (perf_counter() - start) * 1000)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
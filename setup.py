@@ -25,7 +25,8 @@ setup(
         "fastapi",
         "uvicorn",
         "aiofiles",
-        "SQLAlchemy[asyncio]>=1.4.0",
+        # pool instrumentation relies on pool internals; see tests/database/test_pool.py
+        "SQLAlchemy[asyncio]>=2.0.10,<2.2",
         "httpx",
         "h11<0.13", # @pierce 01-24-2022 pin because of httpx conflict
         "click",
@@ -50,12 +51,14 @@ setup(
             "app = microcosm_fastapi.factories.fastapi:configure_fastapi",
             "postgres_async = microcosm_fastapi.database.postgres:configure_postgres",
             "session_maker_async = microcosm_fastapi.database.session:configure_session_maker",
+            "postgres_async_replicas = microcosm_fastapi.database.postgres:configure_postgres_replicas",
             "sqs_message_dispatcher_async = microcosm_fastapi.pubsub.dispatcher:SQSMessageDispatcherAsync",
             # Conventions
             "documentation_convention = microcosm_fastapi.factories.docs:configure_docs",
             "build_info_convention = microcosm_fastapi.conventions.build_info.route:configure_build_info",
             "health_convention = microcosm_fastapi.conventions.health.route:configure_health",
             "config_convention = microcosm_fastapi.conventions.config.route:configure_config",
+            "prometheus_convention = microcosm_fastapi.conventions.prometheus.route:configure_prometheus",
             "landing_convention = microcosm_fastapi.conventions.landing.route:configure_landing",
             "audit_middleware = microcosm_fastapi.audit:configure_audit_middleware",
             "request_context = microcosm_fastapi.context:configure_request_context",
@@ -13,4 +13,5 @@ class PizzaStore(StoreAsync):
         super().__init__(
             graph,
             Pizza,
+            keyset_columns=(Pizza.created_at, Pizza.id),
         )
@@ -1,13 +1,20 @@
+from asyncio import gather
 from unittest.mock import patch
 
 import pytest
 from microcosm_postgres.context import transaction, SessionContext
-from microcosm_postgres.errors import ModelNotFoundError
+from microcosm_postgres.errors import DuplicateModelError, ModelNotFoundError
 from microcosm_postgres.identifiers import new_object_id
 from microcosm_postgres.operations import recreate_all
+from sqlalchemy import true
 from test_project.app import create_app
 from test_project.pizza_model import Pizza
 
+from microcosm_fastapi.database.cache import LRUCacheBackend
+from microcosm_fastapi.database.loader import enable_batched_retrieves
+from microcosm_fastapi.database.pagination import InvalidCursorError
+from microcosm_fastapi.database.store import CountMode, MissingCriterionError, StoreAsync
+
 
 class TestStore:
     def setup_method(self):
@@ -80,3 +87,286 @@ class TestStore:
 
         with pytest.raises(ModelNotFoundError):
             await self.graph.pizza_store.retrieve(self.pizza_id)
+
+    @pytest.mark.asyncio
+    async def test_retrieve_cache(self):
+        store = StoreAsync(self.graph, Pizza, retrieve_cache_backend=LRUCacheBackend())
+        pizza = await store.create(Pizza(toppings="cheese"))
+
+        await store.retrieve(pizza.id)
+        cached = await store.retrieve(pizza.id)
+        assert cached.toppings == "cheese"
+        assert (store.retrieve_cache.hits, store.retrieve_cache.misses) == (1, 1)
+
+        async with store.session_maker() as session:
+            await store.update(pizza.id, Pizza(id=pizza.id, toppings="ham"), session=session)
+            # Uncommitted changes are neither visible nor cached
+            assert (await store.retrieve(pizza.id)).toppings == "cheese"
+            await session.commit()
+
+        assert (await store.retrieve(pizza.id)).toppings == "ham"
+
+        await store.delete(pizza.id)
+        with pytest.raises(ModelNotFoundError):
+            await store.retrieve(pizza.id)
+
+    @pytest.mark.asyncio
+    async def test_retrieve_batched(self):
+        store = self.graph.pizza_store
+        cheese, ham = await store.create_many([Pizza(toppings="cheese"), Pizza(toppings="ham")])
+
+        async with store.session_maker() as session:
+            enable_batched_retrieves(session)
+            with (
+                patch.object(store, "batch_retrieves", True),
+                patch.object(store, "retrieve_many", wraps=store.retrieve_many) as retrieve_many,
+            ):
+                results = await gather(
+                    store.retrieve(ham.id, session=session),
+                    store.retrieve(cheese.id, session=session),
+                    store.retrieve(ham.id, session=session),
+                    store.retrieve(new_object_id(), session=session),
+                    return_exceptions=True,
+                )
+
+        assert retrieve_many.call_count == 1
+        assert [pizza.toppings for pizza in results[:3]] == ["ham", "cheese", "ham"]
+        assert isinstance(results[3], ModelNotFoundError)
+
+    @pytest.mark.asyncio
+    async def test_retrieve_not_batched_without_opt_in(self):
+        store = self.graph.pizza_store
+        cheese, ham = await store.create_many([Pizza(toppings="cheese"), Pizza(toppings="ham")])
+
+        async with store.session_maker() as session:
+            enable_batched_retrieves(session)
+            with patch.object(store, "retrieve_many", wraps=store.retrieve_many) as retrieve_many:
+                await store.retrieve(ham.id, session=session)
+                await store.retrieve(cheese.id, session=session)
+
+        assert retrieve_many.call_count == 0
+
+    @pytest.mark.asyncio
+    async def test_create_many(self):
+        pizzas = await self.graph.pizza_store.create_many([
+            Pizza(toppings="cheese"),
+            Pizza(toppings="pepperoni"),
+            Pizza(toppings="mushroom"),
+        ], batch_size=2)
+
+        assert [pizza.toppings for pizza in pizzas] == ["cheese", "pepperoni", "mushroom"]
+        assert all(pizza.id is not None for pizza in pizzas)
+        assert await self.graph.pizza_store.count() == 3
+
+    @pytest.mark.asyncio
+    async def test_create_many_duplicate(self):
+        await self.graph.pizza_store.create(Pizza(id=self.pizza_id, toppings="cheese"))
+
+        with pytest.raises(DuplicateModelError):
+            await self.graph.pizza_store.create_many([
+                Pizza(id=self.pizza_id, toppings="pepperoni"),
+            ])
+
+    @pytest.mark.asyncio
+    async def test_upsert_many(self):
+        await self.graph.pizza_store.create(Pizza(id=self.pizza_id, toppings="cheese"))
+
+        pizzas = await self.graph.pizza_store.upsert_many([
+            Pizza(id=self.pizza_id, toppings="pepperoni"),
+            Pizza(toppings="mushroom"),
+        ])
+
+        assert [pizza.toppings for pizza in pizzas] == ["pepperoni", "mushroom"]
+        assert await self.graph.pizza_store.count() == 2
+
+        pizza_object = await self.graph.pizza_store.retrieve(self.pizza_id)
+        assert pizza_object.toppings == "pepperoni"
+
+    @pytest.mark.asyncio
+    async def test_upsert_many_keeps_unset_columns(self):
+        pizza = await self.graph.pizza_store.create(Pizza(id=self.pizza_id, toppings="cheese"))
+        updated_at = pizza.updated_at
+
+        await self.graph.pizza_store.upsert_many([
+            Pizza(id=self.pizza_id),
+            Pizza(toppings="mushroom"),
+        ])
+
+        pizza_object = await self.graph.pizza_store.retrieve(self.pizza_id)
+        assert pizza_object.toppings == "cheese"
+        assert pizza_object.updated_at > updated_at
+
+    @pytest.mark.asyncio
+    async def test_delete_not_found(self):
+        with pytest.raises(ModelNotFoundError):
+            await self.graph.pizza_store.delete(self.pizza_id)
+
+    @pytest.mark.asyncio
+    async def test_delete_many(self):
+        await self.graph.pizza_store.create_many([
+            Pizza(toppings="cheese"),
+            Pizza(toppings="cheese"),
+            Pizza(toppings="pepperoni"),
+        ])
+
+        assert self.graph.pizza_store.use_set_based_delete
+        assert await self.graph.pizza_store.delete_many(Pizza.toppings == "cheese") == 2
+        assert await self.graph.pizza_store.delete_many(Pizza.toppings == "cheese") == 0
+        assert await self.graph.pizza_store.count() == 1
+
+    @pytest.mark.asyncio
+    async def test_delete_many_requires_criterion(self):
+        await self.graph.pizza_store.create(Pizza(toppings="cheese"))
+
+        with pytest.raises(MissingCriterionError):
+            await self.graph.pizza_store.delete_many()
+        with pytest.raises(MissingCriterionError):
+            await self.graph.pizza_store.delete_many(toppings=None)
+
+        assert await self.graph.pizza_store.count() == 1
+
+    @pytest.mark.asyncio
+    async def test_update_by_ids(self):
+        cheese_pizza, pepperoni_pizza, mushroom_pizza = await self.graph.pizza_store.create_many([
+            Pizza(toppings="cheese"),
+            Pizza(toppings="pepperoni"),
+            Pizza(toppings="mushroom"),
+        ])
+
+        pizzas = await self.graph.pizza_store.update_by_ids(
+            [cheese_pizza.id, pepperoni_pizza.id],
+            dict(toppings="pineapple"),
+        )
+
+        assert {pizza.id for pizza in pizzas} == {cheese_pizza.id, pepperoni_pizza.id}
+        assert all(pizza.toppings == "pineapple" for pizza in pizzas)
+        assert all(pizza.updated_at >= cheese_pizza.updated_at for pizza in pizzas)
+
+        pizza_object = await self.graph.pizza_store.retrieve(mushroom_pizza.id)
+        assert pizza_object.toppings == "mushroom"
+
+    @pytest.mark.asyncio
+    async def test_update_many(self):
+        await self.graph.pizza_store.create_many([
+            Pizza(toppings="cheese"),
+            Pizza(toppings="cheese"),
+            Pizza(toppings="pepperoni"),
+        ])
+
+        pizzas = await self.graph.pizza_store.update_many(
+            Pizza.toppings == "cheese",
+            values=dict(toppings="mozzarella"),
+        )
+
+        assert [pizza.toppings for pizza in pizzas] == ["mozzarella", "mozzarella"]
+
+    @pytest.mark.asyncio
+    async def test_update_many_requires_criterion(self):
+        await self.graph.pizza_store.create_many([
+            Pizza(toppings="cheese"),
+            Pizza(toppings="pepperoni"),
+        ])
+
+        with pytest.raises(MissingCriterionError):
+            await self.graph.pizza_store.update_many(values=dict(toppings="mozzarella"))
+
+        pizzas = await self.graph.pizza_store.update_many(true(), values=dict(toppings="mozzarella"))
+        assert [pizza.toppings for pizza in pizzas] == ["mozzarella", "mozzarella"]
+
+    @pytest.mark.parametrize("count_mode", [
+        CountMode.SERIAL,
+        CountMode.WINDOW,
+        CountMode.CONCURRENT,
+    ])
+    @pytest.mark.asyncio
+    async def test_search_with_count(self, count_mode):
+        await self.graph.pizza_store.create_many([
+            Pizza(toppings=f"topping-{index}")
+            for index in range(5)
+        ])
+
+        pizzas, count = await self.graph.pizza_store.search_with_count(
+            offset=2,
+            limit=2,
+            count_mode=count_mode,
+        )
+        assert len(pizzas) == 2
+        assert count == 5
+
+        pizzas, count = await self.graph.pizza_store.search_with_count(
+            offset=10,
+            limit=2,
+            count_mode=count_mode,
+        )
+        assert pizzas == []
+        assert count == 5
+
+    @pytest.mark.asyncio
+    async def test_search_with_probe_count(self):
+        await self.graph.pizza_store.create_many([
+            Pizza(toppings=f"topping-{index}")
+            for index in range(5)
+        ])
+
+        pizzas, count = await self.graph.pizza_store.search_with_count(
+            offset=0,
+            limit=2,
+            count_mode=CountMode.PROBE,
+        )
+        assert len(pizzas) == 2
+        assert count == 3
+
+        pizzas, count = await self.graph.pizza_store.search_with_count(
+            offset=4,
+            limit=2,
+            count_mode=CountMode.PROBE,
+        )
+        assert len(pizzas) == 1
+        assert count == 5
+
+    @pytest.mark.asyncio
+    async def test_search_after(self):
+        created = await self.graph.pizza_store.create_many([
+            Pizza(toppings=f"topping-{index}")
+            for index in range(5)
+        ])
+        expected_ids = [
+            pizza.id
+            for pizza in sorted(created, key=lambda pizza: (pizza.created_at, pizza.id))
+        ]
+
+        pizza_ids, cursor = [], None
+        while True:
+            pizzas, cursor = await self.graph.pizza_store.search_after(cursor=cursor, limit=2)
+            pizza_ids.extend(pizza.id for pizza in pizzas)
+            if cursor is None:
+                break
+
+        assert pizza_ids == expected_ids
+
+    @pytest.mark.asyncio
+    async def test_search_after_replaces_custom_order(self):
+        created = await self.graph.pizza_store.create_many([
+            Pizza(toppings=f"topping-{index}")
+            for index in range(5)
+        ])
+        expected_ids = [
+            pizza.id
+            for pizza in sorted(created, key=lambda pizza: (pizza.created_at, pizza.id))
+        ]
+
+        store = self.graph.pizza_store
+        with patch.object(store, "_order_by", lambda query, **kwargs: query.order_by(Pizza.toppings.desc())):
+            pizza_ids, cursor = [], None
+            while True:
+                pizzas, cursor = await store.search_after(cursor=cursor, limit=2)
+                pizza_ids.extend(pizza.id for pizza in pizzas)
+                if cursor is None:
+                    break
+
+        assert pizza_ids == expected_ids
+
+    @pytest.mark.asyncio
+    async def test_search_after_invalid_cursor(self):
+        with pytest.raises(InvalidCursorError):
+            await self.graph.pizza_store.search_after(cursor="not-a-cursor", limit=2)